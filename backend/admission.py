@@ -0,0 +1,246 @@
+"""
+Admission control for LLM-backed endpoints.
+
+Every request that will talk to Gemini takes a ticket from the admission
+controller first. At most ADMISSION_MAX_ACTIVE requests hold a ticket at a
+time; the rest wait in a bounded queue per lane (endpoint class). When a
+slot frees up it goes to the waiter with the best lane priority, so chat
+turns overtake cold-email polishing during a spike.
+
+A request is shed with a fast 503 + Retry-After instead of queuing forever
+when its lane's queue is full or it has waited longer than the lane allows.
+Retry-After is estimated from the recent ticket hold time and queue depth.
+
+Metrics:
+- admission.active (gauge), admission.<lane>.queue_depth (gauge)
+- admission.<lane>.wait_ms (histogram)
+- admission.<lane>.admitted / .rejected.queue_full / .rejected.timeout (counters)
+
+Configuration:
+- ADMISSION_MAX_ACTIVE: concurrent LLM-backed requests (default GEMINI_MAX_CONCURRENCY)
+"""
+
+import os
+import math
+import time
+import heapq
+import asyncio
+import itertools
+import logging
+import weakref
+from typing import Dict, List, NamedTuple
+
+from fastapi import Depends, HTTPException
+
+from auth import get_token_user_id
+from llm_client import MAX_CONCURRENCY
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Assumed ticket hold time before any request has finished
+DEFAULT_SERVICE_SECONDS = 3.0
+SERVICE_TIME_SMOOTHING = 0.2
+
+
+class Lane(NamedTuple):
+    priority: int  # lower is served first
+    max_queue: int
+    max_wait_seconds: float
+
+
+LANES: Dict[str, Lane] = {
+    "chat": Lane(priority=0, max_queue=64, max_wait_seconds=20.0),
+    "voice": Lane(priority=0, max_queue=32, max_wait_seconds=20.0),
+    "sop": Lane(priority=1, max_queue=16, max_wait_seconds=30.0),
+    "cold_email": Lane(priority=2, max_queue=16, max_wait_seconds=30.0),
+}
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, lane: str, reason: str, retry_after: int):
+        super().__init__(f"{lane} admission rejected ({reason}), retry after {retry_after}s")
+        self.lane = lane
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """A held admission slot. `release` is idempotent."""
+
+    def __init__(self, controller: "AdmissionController", state: "_LoopState", lane: str):
+        self._controller = controller
+        self._state = state
+        self.lane = lane
+        self.admitted_at = time.perf_counter()
+        self.released = False
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self._controller._release(self._state, time.perf_counter() - self.admitted_at)
+
+
+class _LoopState:
+    def __init__(self, lanes):
+        self.active = 0
+        self.waiters: List[list] = []  # heap of [priority, seq, future, lane]
+        self.queued = {lane: 0 for lane in lanes}
+
+
+class AdmissionController:
+    """Priority admission with bounded per-lane queues and load shedding."""
+
+    def __init__(self, max_active: int, lanes: Dict[str, Lane]):
+        self.max_active = max(1, max_active)
+        self.lanes = lanes
+        self.service_seconds = DEFAULT_SERVICE_SECONDS
+        self._seq = itertools.count()
+        # Futures are bound to their loop, so keep state per loop like llm_client's semaphore
+        self._states: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopState]" = weakref.WeakKeyDictionary()
+
+    def _state(self) -> _LoopState:
+        loop = asyncio.get_running_loop()
+        state = self._states.get(loop)
+        if state is None:
+            state = _LoopState(self.lanes)
+            self._states[loop] = state
+        return state
+
+    def retry_after(self, state: _LoopState) -> int:
+        waiting = sum(state.queued.values())
+        return max(1, math.ceil(self.service_seconds * (waiting + 1) / self.max_active))
+
+    def _reject(self, state: _LoopState, lane: str, reason: str):
+        metrics.inc(f"admission.{lane}.rejected.{reason}")
+        retry_after = self.retry_after(state)
+        logger.warning(f"Shedding {lane} request ({reason}); active={state.active} queued={state.queued}")
+        raise AdmissionRejected(lane, reason, retry_after)
+
+    def _publish(self, state: _LoopState, lane: str):
+        metrics.set_gauge("admission.active", state.active)
+        metrics.set_gauge(f"admission.{lane}.queue_depth", state.queued[lane])
+
+    async def acquire(self, lane: str) -> Ticket:
+        """Wait for a slot in `lane`; raises AdmissionRejected when shedding."""
+        config = self.lanes[lane]
+        state = self._state()
+        started = time.perf_counter()
+
+        if state.active < self.max_active and not any(state.queued.values()):
+            state.active += 1
+        else:
+            if state.queued[lane] >= config.max_queue:
+                self._reject(state, lane, "queue_full")
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(state.waiters, [config.priority, next(self._seq), future, lane])
+            state.queued[lane] += 1
+            self._publish(state, lane)
+            try:
+                await asyncio.wait_for(future, config.max_wait_seconds)
+            except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+                if future.done() and not future.cancelled():
+                    # Granted just as the caller gave up: hand the slot on
+                    self._release(state, None)
+                else:
+                    state.queued[lane] -= 1
+                    self._publish(state, lane)
+                if isinstance(e, asyncio.TimeoutError):
+                    self._reject(state, lane, "timeout")
+                raise
+
+        metrics.inc(f"admission.{lane}.admitted")
+        metrics.observe(f"admission.{lane}.wait_ms", (time.perf_counter() - started) * 1000)
+        self._publish(state, lane)
+        return Ticket(self, state, lane)
+
+    def _release(self, state: _LoopState, held_seconds):
+        if held_seconds is not None:
+            self.service_seconds += SERVICE_TIME_SMOOTHING * (held_seconds - self.service_seconds)
+        state.active -= 1
+        while state.waiters:
+            _, _, future, lane = heapq.heappop(state.waiters)
+            if not future.done():
+                # The slot passes straight to the waiter, so nobody can jump the queue
+                state.active += 1
+                state.queued[lane] -= 1
+                future.set_result(None)
+                metrics.set_gauge(f"admission.{lane}.queue_depth", state.queued[lane])
+                break
+        metrics.set_gauge("admission.active", state.active)
+
+    def stats(self) -> dict:
+        states = list(self._states.values())
+        return {
+            "max_active": self.max_active,
+            "active": sum(s.active for s in states),
+            "queued": {lane: sum(s.queued[lane] for s in states) for lane in self.lanes},
+            "service_seconds": round(self.service_seconds, 3),
+        }
+
+
+def _read_max_active() -> int:
+    try:
+        return max(1, int(os.environ.get("ADMISSION_MAX_ACTIVE", MAX_CONCURRENCY)))
+    except ValueError:
+        logger.warning("Invalid ADMISSION_MAX_ACTIVE, falling back to %s", MAX_CONCURRENCY)
+        return MAX_CONCURRENCY
+
+
+admission = AdmissionController(_read_max_active(), LANES)
+
+
+def overloaded_error(error: AdmissionRejected) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail={
+            "error": "OVERLOADED",
+            "message": "The counsellor is busy right now. Please try again shortly.",
+            "retry_after": error.retry_after
+        },
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
+
+async def acquire_or_503(lane: str) -> Ticket:
+    try:
+        return await admission.acquire(lane)
+    except AdmissionRejected as e:
+        raise overloaded_error(e)
+
+
+def admit(lane: str):
+    """
+    FastAPI dependency holding an admission ticket for the whole request.
+
+    The bearer token is checked before queueing (a JWT decode, no database),
+    so requests that would fail auth never take a queue slot. Declare it
+    before the endpoint's other dependencies: FastAPI resolves them in order,
+    so the request waits in the queue before `get_current_user` or `get_db`
+    opens a database session; the user is loaded after admission, reusing
+    the decoded token.
+    """
+    async def dependency(_user_id: int = Depends(get_token_user_id)):
+        ticket = await acquire_or_503(lane)
+        try:
+            yield ticket
+        finally:
+            ticket.release()
+    return dependency
+
+
+def admit_for_stream(lane: str):
+    """
+    Like `admit`, but a ticket that outlives the request: the endpoint hands
+    it to its response stream, which releases it when the stream ends. It is
+    released here only if the request fails before that (e.g. a 401 for a
+    user that no longer exists, or the handler raising).
+    """
+    async def dependency(_user_id: int = Depends(get_token_user_id)):
+        ticket = await acquire_or_503(lane)
+        try:
+            yield ticket
+        except BaseException:
+            ticket.release()
+            raise
+    return dependency
@@ -1,12 +1,21 @@
+import os
+import re
 import json
 import logging
-import asyncio
-import uuid
-import random
+import threading
+from collections import OrderedDict
+from typing import Any, NamedTuple, Optional
 
 from google.genai import types
 
+from category_engine import (
+    DEFAULT_ACCEPTANCE_RATE, DEFAULT_MIN_GPA, DEFAULT_TUITION, DEFAULT_USER_BUDGET, DEFAULT_USER_GPA,
+    CategoryEngine, category_reasons,
+)
 from gemini_key_manager import key_manager
+from llm_client import SingleFlight, generate_content, generate_content_stream, is_quota_error
+from prompt_budget import PromptBudget, estimate_tokens
+from prompt_cache import prefix_cache
 from recommendation_engine import detect_intent, filter_programs, check_query_delta
 
 logger = logging.getLogger(__name__)
@@ -104,29 +113,22 @@ def analyze_profile_strength(profile: dict) -> dict:
     }
 
 def categorize_university(university: dict, user_profile: dict) -> tuple:
-    user_gpa = user_profile.get('gpa') or 3.0
-    user_budget = user_profile.get('budget_per_year') or 50000
+    """(category, fit, risk, acceptance_chance, cost_level); CategoryEngine does many at once."""
+    user_gpa = user_profile.get('gpa') or DEFAULT_USER_GPA
+    user_budget = user_profile.get('budget_per_year') or DEFAULT_USER_BUDGET
     
-    uni_min_gpa = university.get('min_gpa') or 3.0
-    uni_tuition = university.get('tuition_per_year') or 30000
+    uni_min_gpa = university.get('min_gpa') or DEFAULT_MIN_GPA
+    uni_tuition = university.get('tuition_per_year') or DEFAULT_TUITION
     
     if uni_min_gpa > user_gpa + 0.3 or uni_tuition > user_budget * 1.2:
         category = 'DREAM'
-        if uni_min_gpa > user_gpa + 0.3:
-            risk = f"GPA requirement ({uni_min_gpa}) is higher than your current GPA ({user_gpa})"
-        else:
-            risk = f"Tuition (${uni_tuition:,}) exceeds your budget (${user_budget:,})"
-        fit = "Prestigious program aligned with your goals"
     elif uni_min_gpa <= user_gpa - 0.2 and uni_tuition <= user_budget:
         category = 'SAFE'
-        risk = "Lower competition may mean less networking opportunities"
-        fit = f"Your GPA ({user_gpa}) exceeds requirements ({uni_min_gpa}) and fits budget"
     else:
         category = 'TARGET'
-        risk = "Competitive admission with moderate acceptance chances"
-        fit = "Good match - your profile meets requirements and budget"
+    fit, risk = category_reasons(category, uni_min_gpa, uni_tuition, user_gpa, user_budget)
     
-    acceptance_rate = university.get('acceptance_rate') or 0.5  # Default to 0.5 if None
+    acceptance_rate = university.get('acceptance_rate') or DEFAULT_ACCEPTANCE_RATE
     if acceptance_rate < 0.1:
         acceptance_chance = 'Low'
     elif acceptance_rate < 0.4:
@@ -143,7 +145,309 @@ def categorize_university(university: dict, user_profile: dict) -> tuple:
     
     return category, fit, risk, acceptance_chance, cost_level
 
-def build_context(user_data: dict, profile: dict, universities: list, shortlisted: list, tasks: list) -> str:
+class RenderCache:
+    """
+    Bounded LRU of rendered prompt fragments for `build_context`.
+    
+    Catalog fragments are keyed by catalog version plus university/program
+    ids; `catalog.invalidate()` clears it whenever the catalog is re-seeded.
+    """
+    
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[tuple, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key: tuple):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+    
+    def set(self, key: tuple, value):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+    
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "catalog_version": _catalog_version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            }
+
+
+context_render_cache = RenderCache(int(os.environ.get("CONTEXT_RENDER_CACHE_SIZE", "8192")))
+_catalog_version = 0
+
+
+def invalidate_context_cache():
+    """Drop cached catalog renders; call after the university catalog changes."""
+    global _catalog_version
+    _catalog_version += 1
+    context_render_cache.clear()
+
+
+def _university_render_key(uni: dict) -> Optional[tuple]:
+    """
+    Cache key for a university block: catalog version, university id and the
+    ids of the (possibly intent-filtered) programs it shows. None when the
+    dict carries no ids (ad-hoc data), which renders uncached.
+    """
+    uni_id = uni.get('id')
+    if uni_id is None:
+        return None
+    program_ids = tuple(p.get('id') for p in uni.get('programs', [])[:3])
+    if None in program_ids:
+        return None
+    return (_catalog_version, uni_id, program_ids)
+
+
+def _render_university_static(uni: dict) -> tuple:
+    """Profile-independent lines of a university block: (header, program lines, source line)."""
+    header = (
+        f"- [ID: {uni.get('id', 'N/A')}] {uni.get('name', 'Unknown University')} ({uni.get('country', 'Unknown')}, {uni.get('city', 'Unknown')})\n"
+        f"  Rank: #{uni.get('qs_ranking', 'NR')} (QS), Status: {'Public' if uni.get('is_public') else 'Private'}\n"
+    )
+    program_lines = []
+    for p in uni.get('programs', [])[:3]:
+        tags = f"Category: {p.get('program_category', 'STEM')}"
+        program_lines.append(
+            f"\n  - {p.get('name')} ({p.get('degree_level')}): ${p.get('tuition_per_year_usd', 0):,}/yr, Min GPA: {p.get('min_gpa', 'N/A')}, {tags}"
+        )
+    source = f"  Source: {uni.get('data_source', 'Verified Internal DB')}\n"
+    return header, tuple(program_lines), source
+
+
+def _ineligibility_reasons(p: dict, user_work_exp, user_gmat: bool) -> list:
+    # Eligibility Validation
+    reasons = []
+    if p.get('requires_work_experience') and user_work_exp < p.get('min_work_experience_years', 0):
+        reasons.append(f"Requires {p.get('min_work_experience_years')}y Work Exp (User: {user_work_exp}y)")
+    
+    if p.get('gmat_required') and not user_gmat:
+        reasons.append("Requires GMAT")
+    return reasons
+
+
+def _render_university_block(uni: dict, categorized: tuple, user_work_exp, user_gmat: bool) -> str:
+    header, program_lines, source = _render_university_static_cached(uni)
+    cat, fit, risk, acc, cost = categorized
+    
+    # Format programs with eligibility check
+    parts = [header, f"  Category: {cat} | Acceptance: {acc} | Cost: {cost}\n", "  Programs:"]
+    for p, eligible_line in zip(uni.get('programs', [])[:3], program_lines):
+        reasons = _ineligibility_reasons(p, user_work_exp, user_gmat)
+        
+        # Premium Gating Logic - DISABLED
+        # user_plan = user_data.get('subscription_plan', 'FREE')
+        # is_tier_2 = p.get('program_category') in ['BUSINESS', 'MBA', 'MANAGEMENT'] or p.get('program_discipline') in ['MBA', 'Management']
+
+        # if is_tier_2 and user_plan == 'FREE':
+        #     programs_str += f"\n  - [PREMIUM_LOCKED] {p.get('name')} (Tier 2)"
+        #     continue
+        
+        if reasons:
+            parts.append(f"\n  - [INELIGIBLE] {p.get('name')} ({p.get('degree_level')}): {', '.join(reasons)}")
+        else:
+            parts.append(eligible_line)
+    parts.append("\n")
+    parts.append(source)
+    return "".join(parts)
+
+
+def _render_university_fit(uni: dict, categorized: tuple, user_work_exp, user_gmat: bool) -> str:
+    """
+    Per-turn line for a matching university: how it fits this user. Facts
+    (tuition, GPA, source) live in the catalog reference of the stable prefix.
+    """
+    cat, fit, risk, acc, cost = categorized
+    parts = [f"- [ID: {uni.get('id', 'N/A')}] {uni.get('name', 'Unknown University')}: Category: {cat} | Acceptance: {acc} | Cost: {cost}\n"]
+    for p in uni.get('programs', [])[:3]:
+        reasons = _ineligibility_reasons(p, user_work_exp, user_gmat)
+        if reasons:
+            parts.append(f"  - [INELIGIBLE] {p.get('name')} ({p.get('degree_level')}): {', '.join(reasons)}\n")
+        else:
+            parts.append(f"  - {p.get('name')} ({p.get('degree_level')})\n")
+    return "".join(parts)
+
+
+def _render_university_static_cached(uni: dict) -> tuple:
+    uni_key = _university_render_key(uni)
+    if uni_key is None:
+        return _render_university_static(uni)
+    key = ("static", uni_key)
+    rendered = context_render_cache.get(key)
+    if rendered is None:
+        rendered = _render_university_static(uni)
+        context_render_cache.set(key, rendered)
+    return rendered
+
+
+def _categorize_misses(universities: list, profile: dict) -> list:
+    """
+    Category rows for `universities`. Records of the current catalog snapshot
+    are read from its engine; anything else gets an engine of its own.
+    """
+    from catalog import catalog  # catalog imports this module
+    snapshot = catalog.current()
+    if snapshot is not None and all(snapshot.get(uni.get('id')) is uni for uni in universities):
+        categories = snapshot.categories.categorize(profile)
+        return [categories.for_id(uni['id']) for uni in universities]
+    categories = CategoryEngine(universities).categorize(profile)
+    return [categories.row(i) for i in range(len(universities))]
+
+
+def _memoized_blocks(kind: str, renderer, universities: list, profile: dict) -> list:
+    # Calculate user specs
+    user_work_exp = profile.get('work_experience_years', 0)
+    user_gmat = profile.get('gre_gmat_status') == 'COMPLETED' # Simple check from status
+    profile_key = (profile.get('gpa'), profile.get('budget_per_year'), user_work_exp, user_gmat)
+    
+    universities = universities[:100]  # Increased context window to cover full seed data
+    blocks = []
+    misses = []
+    for i, uni in enumerate(universities):
+        uni_key = _university_render_key(uni)
+        key = (kind, uni_key, profile_key) if uni_key is not None else None
+        block = context_render_cache.get(key) if key is not None else None
+        if block is None:
+            misses.append((i, key))
+        blocks.append(block)
+    
+    if misses:
+        # Categorize every block still to render in one pass
+        categorized = _categorize_misses([universities[i] for i, _ in misses], profile)
+        for (i, key), row in zip(misses, categorized):
+            block = renderer(universities[i], row, user_work_exp, user_gmat)
+            if key is not None:
+                context_render_cache.set(key, block)
+            blocks[i] = block
+    return blocks
+
+
+def render_university_blocks(universities: list, profile: dict) -> list:
+    """
+    Render the "Available Universities" section as a list of blocks.
+    
+    Each block is memoized on its catalog values plus the profile fields that
+    change it (GPA and budget for the category, work experience and GMAT
+    status for eligibility tags), so repeat turns mostly join cached strings.
+    """
+    return _memoized_blocks("block", _render_university_block, universities, profile)
+
+
+def render_university_fits(universities: list, profile: dict, referenced: Optional[frozenset] = None) -> list:
+    """
+    Per-turn lines for the matching universities, memoized like the full blocks.
+
+    Universities in `referenced` (ids whose facts the catalog reference carries;
+    None means all of them) get a fit line. The rest were left out of the
+    reference by its token ceiling, so they get their full block instead.
+    """
+    universities = universities[:100]
+    if referenced is None:
+        return _memoized_blocks("fit", _render_university_fit, universities, profile)
+    blocks = [None] * len(universities)
+    inline = [i for i, uni in enumerate(universities) if uni.get('id') not in referenced]
+    fits = [i for i, uni in enumerate(universities) if uni.get('id') in referenced]
+    for kind, renderer, positions in (("block", _render_university_block, inline), ("fit", _render_university_fit, fits)):
+        rendered = _memoized_blocks(kind, renderer, [universities[i] for i in positions], profile)
+        for i, block in zip(positions, rendered):
+            blocks[i] = block
+    return blocks
+
+
+CATALOG_REFERENCE_HEADER = """
+
+## University Catalog Reference (READ-ONLY SOURCE)
+Facts for the catalog's universities. Which of them match the current request, and how they fit this user, is listed each turn under "Available Universities"; matches not in this reference are listed there with their facts.
+"""
+
+
+def _render_catalog_entry(uni: dict) -> str:
+    header, _, source = _render_university_static_cached(uni)
+    parts = [header, "  Programs:"]
+    for p in uni.get('programs', []):
+        parts.append(
+            f"\n  - {p.get('name')} ({p.get('degree_level')}): ${p.get('tuition_per_year_usd', 0):,}/yr, Min GPA: {p.get('min_gpa', 'N/A')}, Category: {p.get('program_category', 'STEM')}"
+        )
+    parts.append("\n")
+    parts.append(source)
+    return "".join(parts)
+
+
+class StablePrefix(NamedTuple):
+    """The counsellor's system instruction and the universities it carries facts for."""
+    text: str
+    university_ids: frozenset
+
+
+def render_stable_prefix(universities: list, token_ceiling: int) -> StablePrefix:
+    """
+    System instruction for the counsellor: SYSTEM_PROMPT plus the
+    profile-independent catalog reference.
+    
+    Depends only on the catalog version and ceiling, never on the user or the
+    turn, so it is byte-identical across turns and can be cached provider-side.
+    Catalog entries past `token_ceiling` are left out; `university_ids` says
+    which made it in, so the per-turn matches can inline the others' facts.
+    """
+    ids = tuple(uni.get('id') for uni in universities)
+    key = ("prefix", _catalog_version, token_ceiling, ids) if None not in ids else None
+    if key is not None:
+        cached = context_render_cache.get(key)
+        if cached is not None:
+            return cached
+    
+    parts = [SYSTEM_PROMPT, CATALOG_REFERENCE_HEADER]
+    used = estimate_tokens(SYSTEM_PROMPT) + estimate_tokens(CATALOG_REFERENCE_HEADER)
+    included = []
+    for uni in universities:
+        entry = _render_catalog_entry(uni)
+        tokens = estimate_tokens(entry)
+        if used + tokens > token_ceiling:
+            break
+        parts.append(entry)
+        included.append(uni.get('id'))
+        used += tokens
+    prefix = StablePrefix("".join(parts), frozenset(included))
+    
+    if key is not None:
+        context_render_cache.set(key, prefix)
+    return prefix
+
+
+CATALOG_HEADER = "\n### Available Universities (READ-ONLY SOURCE)\n"
+MATCHES_HEADER = "\n### Available Universities (matching this request; facts in the catalog reference unless listed here)\n"
+
+# Trimming never drops the catalog below this many entries before it has
+# tried trimming tasks and program detail.
+MIN_CATALOG_ENTRIES = 10
+
+
+def render_profile_section(user_data: dict, profile: dict, shortlisted: list) -> str:
+    """User info, profile, profile strength and shortlist."""
     profile_strength = analyze_profile_strength(profile) if profile else {}
     
     budget = profile.get('budget_per_year')
@@ -151,7 +455,7 @@ def build_context(user_data: dict, profile: dict, universities: list, shortliste
     countries = profile.get('preferred_countries', []) or []
     countries_str = ', '.join(countries) if countries else 'Not specified'
     
-    context = f"""
+    parts = [f"""
 ## Current User Context
 
 ### User Info
@@ -177,61 +481,122 @@ def build_context(user_data: dict, profile: dict, universities: list, shortliste
 - SOP: {profile_strength.get('sop', 'Unknown')}
 
 ### Shortlisted Universities ({len(shortlisted)})
-"""
+"""]
     for s in shortlisted:
         uni = s.get('university', {})
-        context += f"- {uni.get('name', 'Unknown')} ({s.get('category', 'Unknown')}) - {'LOCKED' if s.get('is_locked') else 'Not Locked'}\n"
+        parts.append(f"- {uni.get('name', 'Unknown')} ({s.get('category', 'Unknown')}) - {'LOCKED' if s.get('is_locked') else 'Not Locked'}\n")
+    return "".join(parts)
+
+
+def render_task_section(tasks: list) -> tuple:
+    """Returns (header, task lines); lines are oldest first."""
+    header = f"\n### Pending Tasks ({len([t for t in tasks if t.get('status') == 'PENDING'])})\n"
+    lines = [f"- {t.get('title', 'Unknown')} ({t.get('status', 'Unknown')})\n" for t in tasks[:5]]
+    return header, lines
+
+
+def build_context(user_data: dict, profile: dict, universities: list, shortlisted: list, tasks: list) -> str:
+    task_header, task_lines = render_task_section(tasks)
+    parts = [render_profile_section(user_data, profile, shortlisted), task_header]
+    parts.extend(task_lines)
+    parts.append(CATALOG_HEADER)
+    parts.extend(render_university_blocks(universities, profile))
+    return "".join(parts)
+
+
+def build_budgeted_context(
+    user_data: dict,
+    profile: dict,
+    universities: list,
+    shortlisted: list,
+    tasks: list,
+    budget: PromptBudget,
+    referenced: Optional[frozenset] = None
+) -> str:
+    """
+    Per-turn counsellor context, trimmed to what is left of `budget`.
     
-    context += f"\n### Pending Tasks ({len([t for t in tasks if t.get('status') == 'PENDING'])})\n"
-    for t in tasks[:5]:
-        context += f"- {t.get('title', 'Unknown')} ({t.get('status', 'Unknown')})\n"
+    Like `build_context`, but matching universities are listed as fit lines
+    (category, eligibility); their facts are in the stable catalog prefix.
+    Matches outside `referenced` (see `render_university_fits`) are listed
+    with their facts.
+    Trims in priority order until the context fits: catalog tail (down to
+    MIN_CATALOG_ENTRIES), older tasks, program detail, then the remaining
+    catalog tail. Universities arrive ranked, so the tail is least relevant.
+    """
+    profile_section = render_profile_section(user_data, profile, shortlisted)
+    task_header, task_lines = render_task_section(tasks)
+    budget.add("profile", profile_section)
+    budget.add("tasks", task_header)
+    budget.add("catalog", MATCHES_HEADER)
     
-    context += "\n### Available Universities (READ-ONLY SOURCE)\n"
+    blocks = render_university_fits(universities, profile, referenced)
+    block_tokens = [estimate_tokens(b) for b in blocks]
+    task_tokens = [estimate_tokens(t) for t in task_lines]
+    excess = sum(block_tokens) + sum(task_tokens) - budget.remaining()
     
-    # Calculate user specs
-    user_work_exp = profile.get('work_experience_years', 0)
-    user_gmat = profile.get('gre_gmat_status') == 'COMPLETED' # Simple check from status
+    # 1. Catalog tail
+    keep = len(blocks)
+    while excess > 0 and keep > MIN_CATALOG_ENTRIES:
+        keep -= 1
+        excess -= block_tokens[keep]
+    if keep < len(blocks):
+        budget.record_trim("catalog_tail", len(blocks) - keep, sum(block_tokens[keep:]))
+        blocks, block_tokens = blocks[:keep], block_tokens[:keep]
     
-    for uni in universities[:100]:  # Increased context window to cover full seed data
-        cat, fit, risk, acc, cost = categorize_university(uni, profile)
-        
-        # Format programs with eligibility check
-        programs_str = ""
-        programs = uni.get('programs', [])
-        
-        for p in programs[:3]: # Top 3 programs
-            # Eligibility Validation
-            reasons = []
-            if p.get('requires_work_experience') and user_work_exp < p.get('min_work_experience_years', 0):
-                reasons.append(f"Requires {p.get('min_work_experience_years')}y Work Exp (User: {user_work_exp}y)")
-            
-            if p.get('gmat_required') and not user_gmat:
-                reasons.append("Requires GMAT")
-            
-            tags = f"Category: {p.get('program_category', 'STEM')}"
-            
-            # Premium Gating Logic - DISABLED
-            # user_plan = user_data.get('subscription_plan', 'FREE')
-            # is_tier_2 = p.get('program_category') in ['BUSINESS', 'MBA', 'MANAGEMENT'] or p.get('program_discipline') in ['MBA', 'Management']
-
-            # if is_tier_2 and user_plan == 'FREE':
-            #     programs_str += f"\n  - [PREMIUM_LOCKED] {p.get('name')} (Tier 2)"
-            #     continue
-            
-            if reasons:
-                programs_str += f"\n  - [INELIGIBLE] {p.get('name')} ({p.get('degree_level')}): {', '.join(reasons)}"
-            else:
-                programs_str += f"\n  - {p.get('name')} ({p.get('degree_level')}): ${p.get('tuition_per_year_usd', 0):,}/yr, Min GPA: {p.get('min_gpa', 'N/A')}, {tags}"
-        
-        context += f"- [ID: {uni.get('id', 'N/A')}] {uni.get('name', 'Unknown University')} ({uni.get('country', 'Unknown')}, {uni.get('city', 'Unknown')})\n"
-        context += f"  Rank: #{uni.get('qs_ranking', 'NR')} (QS), Status: {'Public' if uni.get('is_public') else 'Private'}\n"
-        context += f"  Category: {cat} | Acceptance: {acc} | Cost: {cost}\n"
-        context += f"  Programs:{programs_str}\n"
-        context += f"  Source: {uni.get('data_source', 'Verified Internal DB')}\n"
+    # 2. Older tasks
+    dropped = dropped_tokens = 0
+    while excess > 0 and task_lines:
+        task_lines.pop(0)
+        tokens = task_tokens.pop(0)
+        excess -= tokens
+        dropped += 1
+        dropped_tokens += tokens
+    if dropped:
+        budget.record_trim("older_tasks", dropped, dropped_tokens)
     
-    return context
-
-    return context
+    # 3. Program detail
+    if excess > 0 and blocks:
+        compact = [block[:block.index("\n") + 1] for block in blocks]
+        compact_tokens = [estimate_tokens(b) for b in compact]
+        saved = sum(block_tokens) - sum(compact_tokens)
+        budget.record_trim("program_detail", len(blocks), saved)
+        excess -= saved
+        blocks, block_tokens = compact, compact_tokens
+    
+    # 4. Whatever catalog is left
+    keep = len(blocks)
+    while excess > 0 and keep > 0:
+        keep -= 1
+        excess -= block_tokens[keep]
+    if keep < len(blocks):
+        budget.record_trim("catalog_tail", len(blocks) - keep, sum(block_tokens[keep:]))
+        blocks = blocks[:keep]
+    
+    budget.add("tasks", "".join(task_lines))
+    budget.add("catalog", "".join(blocks))
+    return "".join([profile_section, task_header, *task_lines, MATCHES_HEADER, *blocks])
+
+# Recent messages are cut to this length in the prompt
+HISTORY_MESSAGE_CHARS = 600
+ROLE_LABELS = {"user": "Student", "assistant": "Counsellor", "model": "Counsellor"}
+
+
+def render_conversation_section(summary: Optional[str], history: list) -> str:
+    """Rolling summary of the session plus its most recent messages (oldest first)."""
+    if not summary and not history:
+        return ""
+    s = "\n### Conversation So Far\n"
+    if summary:
+        s += f"Summary of earlier messages: {summary}\n"
+    if history:
+        s += "Recent messages:\n"
+        for h in history:
+            content = (h.get('content') or '').replace("\n", " ")
+            if len(content) > HISTORY_MESSAGE_CHARS:
+                content = content[:HISTORY_MESSAGE_CHARS] + "..."
+            s += f"- {ROLE_LABELS.get(h.get('role'), h.get('role'))}: {content}\n"
+    return s
 
 def build_search_context(intent: dict, delta: dict) -> str:
     s = "### Active Search Constraints\n"
@@ -252,19 +617,27 @@ def build_search_context(intent: dict, delta: dict) -> str:
         
     return s
 
-async def get_counsellor_response(
-    message: str,
-    user_data: dict,
-    profile: dict,
-    universities: list,
-    shortlisted: list,
-    tasks: list,
-    history: list = []
-) -> dict:
-    """Get AI counsellor response with automatic API key rotation."""
-    
-    # 0. Fingerprint History for Anti-Repetition
-    # We collect hashes of the last 3 assistant messages to block duplicates
+NOT_CONFIGURED_MESSAGE = "AI Counsellor is not configured. Please set GEMINI_API_KEY or GEMINI_API_KEYS environment variable."
+
+
+def connection_error_message(error: Exception) -> str:
+    return f"I apologize, but I'm having trouble connecting to the AI service. ({str(error)[:50]}...)"
+
+
+def quota_exhausted_message(attempts: int) -> str:
+    return f"AI Service is temporarily unavailable due to high traffic (Quota exceeded after {attempts} attempts). Please try again in a few minutes."
+
+
+def _fallback_response(message: str) -> dict:
+    return {
+        "message": message,
+        "actions": [],
+        "suggested_universities": []
+    }
+
+
+def history_fingerprints(history: list) -> set:
+    """Hashes of past assistant messages, used to reject repeated responses."""
     past_hashes = set()
     for h in history:
         if h.get('role') == 'model' or h.get('role') == 'assistant': # Handle both formats
@@ -274,17 +647,41 @@ async def get_counsellor_response(
              if len(content) > 20: 
                  intro_hash = f"{content[:50].strip()}_{len(content)}"
                  past_hashes.add(intro_hash)
-                 
-    # Check if any keys are available
-    if not key_manager.has_keys():
-        return {
-            "message": "AI Counsellor is not configured. Please set GEMINI_API_KEY or GEMINI_API_KEYS environment variable.",
-            "actions": [],
-            "suggested_universities": []
-        }
+    return past_hashes
+
+
+class CounsellorPrompt(NamedTuple):
+    """Stable system instruction (cacheable prefix) plus the per-turn contents."""
+    system_instruction: str
+    contents: str
+
+
+# Share of the prompt budget the stable catalog prefix may take
+PREFIX_BUDGET_SHARE = 0.5
+
+
+async def build_counsellor_prompt(
+    message: str,
+    user_data: dict,
+    profile: dict,
+    universities: list,
+    shortlisted: list,
+    tasks: list,
+    history: list,
+    intent: dict = None,
+    summary: str = None
+) -> CounsellorPrompt:
+    """
+    Run the intent/filter pipeline and assemble the counsellor prompt.
     
-    # 1. Detect Intent
-    intent = await detect_intent(message, profile or {})
+    The system instruction depends only on the catalog, so it stays
+    byte-identical across turns; everything user- or turn-specific goes in
+    the contents. The conversation is the session's rolling `summary` plus
+    the recent `history`, so its size does not grow with the session.
+    """
+    # 1. Detect Intent (unless the caller already pipelined it)
+    if intent is None:
+        intent = await detect_intent(message, profile or {})
     logger.info(f"Detected Intent: {intent}")
     
     # 2. Check Delta (History Comparison)
@@ -293,10 +690,26 @@ async def get_counsellor_response(
     # 3. Filter Universities based on Intent
     filtered_universities = filter_programs(universities, intent, profile or {})
     
-    # 4. Build Context
-    base_context = build_context(user_data, profile or {}, filtered_universities, shortlisted, tasks)
+    # 4. Build Context, fitted to the prompt token budget
+    budget = PromptBudget()
+    prefix = render_stable_prefix(universities, int(budget.ceiling * PREFIX_BUDGET_SHARE))
+    system_instruction = prefix.text
+    budget.add("prefix", system_instruction)
     search_context = build_search_context(intent, delta)
+    budget.add("fixed", _assemble_turn_prompt("", search_context, message))
+    conversation = render_conversation_section(summary, history)
+    budget.add("conversation", conversation)
+    base_context = build_budgeted_context(
+        user_data, profile or {}, filtered_universities, shortlisted, tasks, budget, prefix.university_ids
+    )
+    contents = _assemble_turn_prompt(base_context + conversation, search_context, message)
     
+    tokens = budget.publish("counsellor", system_instruction + contents)
+    logger.info(f"Counsellor prompt ~{tokens} tokens (budget {budget.ceiling}, trimmed: {budget.trimmed})")
+    return CounsellorPrompt(system_instruction, contents)
+
+
+def _assemble_turn_prompt(base_context: str, search_context: str, message: str) -> str:
     full_context = f"{base_context}\n{search_context}\n"
     
     # 5. Anti-Repetition Rules
@@ -307,20 +720,88 @@ async def get_counsellor_response(
     3. If 'Available Universities' is empty for this specific field, say so. Do NOT fallback to generic lists.
     """
     
-    full_prompt = f"""{SYSTEM_PROMPT}
-
-{full_context}
+    return f"""{full_context}
 
 ## User Message
 {message}
 
 Respond with valid JSON only. Include a helpful message and any actions to take based on the user's stage and request.
-
-## SYSTEM ENTROPY / SALT
-Current Session ID: {str(uuid.uuid4())}
-RNG Seed: {random.randint(1, 10000)}
-Goal: Ensure this response is unique from any previous output.
 """
+
+
+def _counsellor_config(prefix: dict) -> types.GenerateContentConfig:
+    return types.GenerateContentConfig(response_mime_type="application/json", **prefix)
+
+
+async def _generate_counsellor(client, key_index: int, prompt: CounsellorPrompt, contents: str, attempt: int = 1):
+    """Non-streaming counsellor call with the prefix served from cached content when possible."""
+    prefix = await prefix_cache.resolve(client, key_index, prompt.system_instruction)
+    try:
+        return await generate_content(
+            client, contents=contents, config=_counsellor_config(prefix),
+            key_index=key_index, site="counsellor", attempt=attempt
+        )
+    except Exception as e:
+        if "cached_content" not in prefix or is_quota_error(e):
+            raise
+        # The handle expired or was deleted server-side: drop it and resend the prefix inline
+        logger.warning(f"Cached prefix rejected on key #{key_index + 1}, retrying inline: {str(e)[:100]}")
+        prefix_cache.forget(key_index, prompt.system_instruction)
+        inline = {"system_instruction": prompt.system_instruction}
+        return await generate_content(
+            client, contents=contents, config=_counsellor_config(inline),
+            key_index=key_index, site="counsellor", attempt=attempt
+        )
+
+
+def parse_counsellor_output(response_text: str) -> dict:
+    """Parse the model's JSON output, filling in any missing fields."""
+    try:
+        result = json.loads(response_text)
+    except json.JSONDecodeError:
+        result = _fallback_response(response_text)
+    
+    if "message" not in result:
+        result["message"] = "I'm here to help you with your study abroad journey."
+    if "actions" not in result:
+        result["actions"] = []
+    if "suggested_universities" not in result:
+        result["suggested_universities"] = []
+    if "suggested_next_questions" not in result:
+        result["suggested_next_questions"] = []
+    return result
+
+
+async def get_counsellor_response(
+    message: str,
+    user_data: dict,
+    profile: dict,
+    universities: list,
+    shortlisted: list,
+    tasks: list,
+    history: list = [],
+    intent: dict = None,
+    summary: str = None
+) -> dict:
+    """
+    Get AI counsellor response with automatic API key rotation.
+    
+    `intent` may be passed in when the caller already ran `detect_intent`
+    (e.g. concurrently with loading context); otherwise it is detected here.
+    """
+    
+    # 0. Fingerprint History for Anti-Repetition
+    # We collect hashes of the last 3 assistant messages to block duplicates
+    past_hashes = history_fingerprints(history)
+                 
+    # Check if any keys are available
+    if not key_manager.has_keys():
+        return _fallback_response(NOT_CONFIGURED_MESSAGE)
+    
+    prompt = await build_counsellor_prompt(
+        message, user_data, profile, universities, shortlisted, tasks, history, intent, summary
+    )
+    contents = prompt.contents
     
     # Track which keys we've tried (for retry with different key)
     tried_key_indices = []
@@ -337,32 +818,9 @@ Goal: Ensure this response is unique from any previous output.
         tried_key_indices.append(key_index)
         
         try:
-            response = client.models.generate_content(
-                model=key_manager.get_model_name(),
-                contents=full_prompt,
-                config=types.GenerateContentConfig(
-                    response_mime_type="application/json"
-                )
-            )
+            response = await _generate_counsellor(client, key_index, prompt, contents, attempt + 1)
             
-            response_text = response.text or "{}"
-            try:
-                result = json.loads(response_text)
-            except json.JSONDecodeError:
-                result = {
-                    "message": response_text,
-                    "actions": [],
-                    "suggested_universities": []
-                }
-            
-            if "message" not in result:
-                result["message"] = "I'm here to help you with your study abroad journey."
-            if "actions" not in result:
-                result["actions"] = []
-            if "suggested_universities" not in result:
-                result["suggested_universities"] = []
-            if "suggested_next_questions" not in result:
-                result["suggested_next_questions"] = []
+            result = parse_counsellor_output(response.text or "{}")
             
             # --- FINGERPRINT CHECK ---
             new_msg = result.get("message", "")
@@ -372,7 +830,7 @@ Goal: Ensure this response is unique from any previous output.
             if new_hash in past_hashes and len(new_msg) > 20 and attempt < max_attempts - 1:
                 logger.warning(f"DUPLICATE RESPONSE DETECTED via fingerprint: {new_hash}. Retrying...")
                 # Add explicit penalty to prompt for next attempt
-                full_prompt += "\n\nSYSTEM ALERT: You just generated a duplicate response. DO NOT repeat yourself. Write a completely different opening."
+                contents += "\n\nSYSTEM ALERT: You just generated a duplicate response. DO NOT repeat yourself. Write a completely different opening."
                 continue 
                 
             return result
@@ -380,32 +838,168 @@ Goal: Ensure this response is unique from any previous output.
         except Exception as e:
             error_str = str(e)
             # Check if it's a rate limit / quota error
-            is_quota_error = "429" in error_str or "RESOURCE_EXHAUSTED" in error_str or "quota" in error_str.lower()
-            
-            if is_quota_error:
+            if is_quota_error(e):
                 logger.warning(f"Quota error on key #{key_index + 1}: {error_str[:100]}")
                 
-                # If we have more keys to try, continue to next iteration
+                # The key is now cooling down, so the next pick skips it without a pause
                 if attempt < max_attempts - 1:
                     logger.info("Retrying with a different API key...")
-                    await asyncio.sleep(1)  # Brief pause before retry
                     continue
-                else:
-                    # All keys exhausted
-                    return {
-                        "message": f"AI Service is temporarily unavailable due to high traffic (Quota exceeded after {len(tried_key_indices)} attempts). Please try again in a few minutes.",
-                        "actions": [],
-                        "suggested_universities": []
-                    }
+                break
             
             # For non-rate-limit errors, return error immediately
             logger.error(f"AI service error: {error_str}")
-            return {
-                "message": f"I apologize, but I'm having trouble connecting to the AI service. ({str(e)[:50]}...)",
-                "actions": [],
-                "suggested_universities": []
-            }
+            return _fallback_response(connection_error_message(e))
     
+    # Every key failed with a quota error or is still cooling down from one
+    return _fallback_response(quota_exhausted_message(len(tried_key_indices)))
+
+
+class JsonStringFieldStreamer:
+    """
+    Incrementally decodes one string field from JSON text that arrives in chunks.
+    
+    `feed()` returns the newly decoded characters of the field's value, so the
+    counsellor `message` can be forwarded while the rest of the JSON object
+    (actions, suggestions) is still being generated.
+    """
+    
+    _ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+    
+    def __init__(self, field: str):
+        self._start = re.compile(r'"%s"\s*:\s*"' % re.escape(field))
+        self.buffer = ""
+        self.done = False
+        self._pos = None  # Index of the next undecoded character of the value
+    
+    def feed(self, chunk: str) -> str:
+        self.buffer += chunk
+        if self.done:
+            return ""
+        if self._pos is None:
+            match = self._start.search(self.buffer)
+            if not match:
+                return ""
+            self._pos = match.end()
+        
+        buf, i, out = self.buffer, self._pos, []
+        while i < len(buf):
+            ch = buf[i]
+            if ch == '"':
+                self.done = True
+                i += 1
+                break
+            if ch != '\\':
+                out.append(ch)
+                i += 1
+                continue
+            # Escape sequence - wait for more input if it is cut off mid-chunk
+            if i + 1 >= len(buf):
+                break
+            esc = buf[i + 1]
+            if esc != 'u':
+                out.append(self._ESCAPES.get(esc, esc))
+                i += 2
+                continue
+            if i + 6 > len(buf):
+                break
+            code = int(buf[i + 2:i + 6], 16)
+            if 0xD800 <= code < 0xDC00:
+                # Surrogate pair: needs the following \uXXXX as well
+                if i + 12 > len(buf):
+                    break
+                if buf[i + 6:i + 8] == '\\u':
+                    low = int(buf[i + 8:i + 12], 16)
+                    out.append(chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)))
+                    i += 12
+                    continue
+            out.append(chr(code))
+            i += 6
+        
+        self._pos = i
+        return "".join(out)
+
+
+async def stream_counsellor_response(
+    message: str,
+    user_data: dict,
+    profile: dict,
+    universities: list,
+    shortlisted: list,
+    tasks: list,
+    history: list = [],
+    intent: dict = None,
+    summary: str = None
+):
+    """
+    Streaming variant of `get_counsellor_response`.
+    
+    Yields ("delta", text) while the model writes the `message` field, then
+    exactly one ("result", dict) with the parsed response. A key is only
+    retried on quota errors raised before any text was streamed; the
+    duplicate-intro retry is skipped since streamed text cannot be taken back.
+    """
+    if not key_manager.has_keys():
+        yield ("result", _fallback_response(NOT_CONFIGURED_MESSAGE))
+        return
+    
+    prompt = await build_counsellor_prompt(
+        message, user_data, profile, universities, shortlisted, tasks, history, intent, summary
+    )
+    
+    tried_key_indices = []
+    for attempt in range(len(key_manager.keys)):
+        client, key_index = key_manager.create_client(exclude_indices=tried_key_indices)
+        if client is None:
+            break
+        tried_key_indices.append(key_index)
+        
+        prefix = await prefix_cache.resolve(client, key_index, prompt.system_instruction)
+        while True:
+            streamer = JsonStringFieldStreamer("message")
+            streamed_any = False
+            error = None
+            try:
+                async for chunk in generate_content_stream(
+                    client,
+                    contents=prompt.contents,
+                    config=_counsellor_config(prefix),
+                    key_index=key_index,
+                    site="counsellor_stream",
+                    attempt=attempt + 1
+                ):
+                    delta = streamer.feed(chunk)
+                    if delta:
+                        streamed_any = True
+                        yield ("delta", delta)
+            except Exception as e:
+                error = e
+            
+            if error is not None and "cached_content" in prefix and not streamed_any and not is_quota_error(error):
+                # The handle expired or was deleted server-side: resend the prefix inline
+                logger.warning(f"Cached prefix rejected on key #{key_index + 1}, retrying inline: {str(error)[:100]}")
+                prefix_cache.forget(key_index, prompt.system_instruction)
+                prefix = {"system_instruction": prompt.system_instruction}
+                continue
+            break
+        
+        if error is not None:
+            if is_quota_error(error) and not streamed_any:
+                logger.warning(f"Quota error on key #{key_index + 1}: {str(error)[:100]}")
+                continue
+            logger.error(f"AI service error: {error}")
+            yield ("result", _fallback_response(connection_error_message(error)))
+            return
+        
+        yield ("result", parse_counsellor_output(streamer.buffer or "{}"))
+        return
+    
+    yield ("result", _fallback_response(quota_exhausted_message(len(tried_key_indices))))
+
+
+sop_flight = SingleFlight("sop_review")
+checklist_flight = SingleFlight("checklist")
+
 
 SOP_SYSTEM_PROMPT = """You are an expert Admissions Committee Officer at a top-tier university.
 Your task is to review a Statement of Purpose (SOP) and provide structured, critical, and constructive feedback.
@@ -440,8 +1034,6 @@ async def analyze_sop(sop_text: str, university_name: str = None, program_name:
             "ai_feedback": "Please configure the API Key to use this feature."
         }
 
-    client, key_index = key_manager.create_client() # Simple client creation for now
-    
     context = ""
     if university_name:
         context += f"Target University: {university_name}\n"
@@ -458,13 +1050,22 @@ async def analyze_sop(sop_text: str, university_name: str = None, program_name:
 Analyze this SOP and provide feedback in JSON format.
 """
 
+    # Resubmitting the same SOP while a review is running shares that review
+    return await sop_flight.do(full_prompt, lambda: _review_sop(full_prompt))
+
+
+async def _review_sop(full_prompt: str) -> dict:
+    client, key_index = key_manager.create_client() # Simple client creation for now
+    
     try:
-        response = client.models.generate_content(
-            model=key_manager.get_model_name(),
+        response = await generate_content(
+            client,
             contents=full_prompt,
             config=types.GenerateContentConfig(
                 response_mime_type="application/json"
-            )
+            ),
+            key_index=key_index,
+            site="sop_review"
         )
         
         response_text = response.text or "{}"
@@ -517,8 +1118,6 @@ async def generate_application_checklist(university_name: str, country: str, pro
         # Fallback if no key
         return []
 
-    client, key_index = key_manager.create_client()
-    
     prompt = f"""{CHECKLIST_SYSTEM_PROMPT}
 
 Target University: {university_name}
@@ -528,13 +1127,22 @@ Program Level: {program_name}
 Generate the 5-7 most important application tasks/documents for this specific target.
 """
 
+    # Users locking the same university at the same time share one generation
+    return await checklist_flight.do(prompt, lambda: _generate_checklist(prompt))
+
+
+async def _generate_checklist(prompt: str) -> list:
+    client, key_index = key_manager.create_client()
+    
     try:
-        response = client.models.generate_content(
-            model=key_manager.get_model_name(),
+        response = await generate_content(
+            client,
             contents=prompt,
             config=types.GenerateContentConfig(
                 response_mime_type="application/json"
-            )
+            ),
+            key_index=key_index,
+            site="checklist"
         )
         
         response_text = response.text or "[]"
@@ -548,6 +1156,58 @@ Generate the 5-7 most important application tasks/documents for this specific ta
         logger.error(f"Checklist Generation Error: {str(e)}")
         return []
 
+SUMMARY_MAX_WORDS = 200
+# Hard cap on the stored summary, so it can never grow the counsellor prompt
+SUMMARY_MAX_CHARS = 2000
+# Longer messages are cut before being folded in
+SUMMARY_MESSAGE_CHARS = 2000
+
+SUMMARY_SYSTEM_PROMPT = f"""You keep a running summary of a conversation between a student and their study-abroad counsellor.
+Fold the new messages into the summary so far. Keep what later turns will need: the student's goals,
+fields, countries and budget, the universities discussed, shortlisted or locked, decisions made and
+open questions. Drop greetings, repetition and anything superseded. Write at most {SUMMARY_MAX_WORDS} words.
+
+## Output Format (Strict JSON)
+{{"summary": "<updated summary>"}}
+"""
+
+async def summarize_conversation(previous_summary: Optional[str], messages: list) -> Optional[str]:
+    """
+    Fold `messages` ({"role", "content"}, oldest first) into `previous_summary`.
+
+    Returns the updated summary, or None when generation fails.
+    """
+    if not key_manager.has_keys():
+        return None
+
+    transcript = "\n".join(
+        f"{ROLE_LABELS.get(m['role'], m['role'])}: {(m['content'] or '')[:SUMMARY_MESSAGE_CHARS]}" for m in messages
+    )
+    prompt = f"""{SUMMARY_SYSTEM_PROMPT}
+## Summary So Far
+{previous_summary or "(none yet)"}
+
+## New Messages
+{transcript}
+"""
+    client, key_index = key_manager.create_client()
+    try:
+        response = await generate_content(
+            client,
+            contents=prompt,
+            config=types.GenerateContentConfig(response_mime_type="application/json"),
+            key_index=key_index,
+            site="summary"
+        )
+        summary = json.loads(response.text or "{}").get("summary")
+    except Exception as e:
+        logger.error(f"Conversation Summary Error: {str(e)}")
+        return None
+
+    if not isinstance(summary, str) or not summary.strip():
+        return None
+    return summary.strip()[:SUMMARY_MAX_CHARS]
+
 async def generate_cold_email_content(profile_summary: str, professor_name: str, university_name: str, research_area: str, paper_title: str = None, tone: str = "Formal"):
     """Generate cold email draft using Gemini."""
     
@@ -592,12 +1252,14 @@ Draft the email now. Use the profile details intelligently.
 """
 
     try:
-        response = client.models.generate_content(
-            model=key_manager.get_model_name(),
+        response = await generate_content(
+            client,
             contents=system_prompt + "\n\n" + user_prompt,
             config=types.GenerateContentConfig(
                 response_mime_type="application/json"
-            )
+            ),
+            key_index=key_index,
+            site="cold_email"
         )
         
         response_text = response.text or "{}"
@@ -659,12 +1321,14 @@ Polish this email now. Use the profile to enhance it.
 """
 
     try:
-        response = client.models.generate_content(
-            model=key_manager.get_model_name(),
+        response = await generate_content(
+            client,
             contents=system_prompt + "\n\n" + user_prompt,
             config=types.GenerateContentConfig(
                 response_mime_type="application/json"
-            )
+            ),
+            key_index=key_index,
+            site="cold_email_polish"
         )
         
         response_text = response.text or "{}"
@@ -705,12 +1369,14 @@ Polish this email now.
 """
 
     try:
-        response = client.models.generate_content(
-            model=key_manager.get_model_name(),
+        response = await generate_content(
+            client,
             contents=system_prompt + "\n\n" + user_prompt,
             config=types.GenerateContentConfig(
                 response_mime_type="application/json"
-            )
+            ),
+            key_index=key_index,
+            site="cold_email_polish"
         )
         
         response_text = response.text or "{}"
@@ -746,12 +1412,14 @@ async def transcribe_audio(audio_data: bytes, mime_type: str = "audio/wav") -> s
     """
     
     try:
-        response = client.models.generate_content(
-            model=key_manager.get_model_name(),
+        response = await generate_content(
+            client,
             contents=[prompt, types.Part.from_bytes(data=audio_data, mime_type=mime_type)],
             config=types.GenerateContentConfig(
                 response_mime_type="text/plain"
-            )
+            ),
+            key_index=key_index,
+            site="transcribe"
         )
         text = response.text.strip() if response.text else ""
         
@@ -0,0 +1,187 @@
+"""
+Microbenchmark for build_context.
+
+Compares the original string-concatenation implementation (kept here as
+`legacy_build_context`) with the cached renderer in ai_counsellor, on a
+100-university / 3-program catalog:
+- byte-for-byte parity across several profiles
+- latency per call (cold cache and warm cache)
+- bytes allocated per call (tracemalloc peak)
+
+Usage: python bench_build_context.py
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from ai_counsellor import analyze_profile_strength, build_context, categorize_university, context_render_cache  # noqa: E402
+from real_universities_data import UNIVERSITIES_DATA  # noqa: E402
+
+ITERATIONS = 200
+
+
+def legacy_build_context(user_data: dict, profile: dict, universities: list, shortlisted: list, tasks: list) -> str:
+    profile_strength = analyze_profile_strength(profile) if profile else {}
+    
+    budget = profile.get('budget_per_year')
+    budget_str = f"${budget:,}/year" if budget else "Not specified"
+    countries = profile.get('preferred_countries', []) or []
+    countries_str = ', '.join(countries) if countries else 'Not specified'
+    
+    context = f"""
+## Current User Context
+
+### User Info
+- Name: {user_data.get('full_name', 'Unknown')}
+- Current Stage: {user_data.get('current_stage', 'ONBOARDING')}
+
+- Onboarding Completed: {user_data.get('onboarding_completed', False)}
+
+### Profile
+- Education: {profile.get('current_education_level') or 'Not provided'} in {profile.get('degree_major') or 'Not provided'}
+- GPA: {profile.get('gpa') or 'Not provided'}
+- Target Degree: {profile.get('intended_degree') or 'Not provided'} in {profile.get('field_of_study') or 'Not provided'}
+- Target Countries: {countries_str}
+- Budget: {budget_str}
+- Funding: {profile.get('funding_plan') or 'Not specified'}
+- IELTS/TOEFL: {profile.get('ielts_toefl_status') or 'NOT_STARTED'}
+- GRE/GMAT: {profile.get('gre_gmat_status') or 'NOT_STARTED'}
+- SOP Status: {profile.get('sop_status') or 'NOT_STARTED'}
+
+### Profile Strength
+- Academics: {profile_strength.get('academics', 'Unknown')}
+- Exams: {profile_strength.get('exams', 'Unknown')}
+- SOP: {profile_strength.get('sop', 'Unknown')}
+
+### Shortlisted Universities ({len(shortlisted)})
+"""
+    for s in shortlisted:
+        uni = s.get('university', {})
+        context += f"- {uni.get('name', 'Unknown')} ({s.get('category', 'Unknown')}) - {'LOCKED' if s.get('is_locked') else 'Not Locked'}\n"
+    
+    context += f"\n### Pending Tasks ({len([t for t in tasks if t.get('status') == 'PENDING'])})\n"
+    for t in tasks[:5]:
+        context += f"- {t.get('title', 'Unknown')} ({t.get('status', 'Unknown')})\n"
+    
+    context += "\n### Available Universities (READ-ONLY SOURCE)\n"
+    
+    user_work_exp = profile.get('work_experience_years', 0)
+    user_gmat = profile.get('gre_gmat_status') == 'COMPLETED'
+    
+    for uni in universities[:100]:
+        cat, fit, risk, acc, cost = categorize_university(uni, profile)
+        
+        programs_str = ""
+        programs = uni.get('programs', [])
+        
+        for p in programs[:3]:
+            reasons = []
+            if p.get('requires_work_experience') and user_work_exp < p.get('min_work_experience_years', 0):
+                reasons.append(f"Requires {p.get('min_work_experience_years')}y Work Exp (User: {user_work_exp}y)")
+            
+            if p.get('gmat_required') and not user_gmat:
+                reasons.append("Requires GMAT")
+            
+            tags = f"Category: {p.get('program_category', 'STEM')}"
+            
+            if reasons:
+                programs_str += f"\n  - [INELIGIBLE] {p.get('name')} ({p.get('degree_level')}): {', '.join(reasons)}"
+            else:
+                programs_str += f"\n  - {p.get('name')} ({p.get('degree_level')}): ${p.get('tuition_per_year_usd', 0):,}/yr, Min GPA: {p.get('min_gpa', 'N/A')}, {tags}"
+        
+        context += f"- [ID: {uni.get('id', 'N/A')}] {uni.get('name', 'Unknown University')} ({uni.get('country', 'Unknown')}, {uni.get('city', 'Unknown')})\n"
+        context += f"  Rank: #{uni.get('qs_ranking', 'NR')} (QS), Status: {'Public' if uni.get('is_public') else 'Private'}\n"
+        context += f"  Category: {cat} | Acceptance: {acc} | Cost: {cost}\n"
+        context += f"  Programs:{programs_str}\n"
+        context += f"  Source: {uni.get('data_source', 'Verified Internal DB')}\n"
+    
+    return context
+
+
+def make_catalog(size: int = 100) -> list:
+    """Seed-shaped university dicts with three programs each."""
+    catalog = []
+    for i in range(size):
+        base = UNIVERSITIES_DATA[i % len(UNIVERSITIES_DATA)]
+        programs = []
+        for j in range(3):
+            template = base["programs"][j % len(base["programs"])]
+            programs.append({
+                **template,
+                "id": i * 3 + j + 1,
+                "name": f"{template['name']} {j + 1}",
+                "program_category": ["STEM", "BUSINESS", "MBA"][j],
+                "requires_work_experience": j == 2,
+                "min_work_experience_years": 2 if j == 2 else 0,
+                "gmat_required": j == 2,
+            })
+        catalog.append({
+            **{k: v for k, v in base.items() if k != "programs"},
+            "id": i + 1,
+            "name": f"{base['name']} #{i + 1}",
+            "min_gpa": 2.8 + (i % 10) / 10,
+            "tuition_per_year": 12000 + (i % 12) * 4000,
+            "acceptance_rate": 0.05 + (i % 9) / 10,
+            "data_source": "Official Website",
+            "programs": programs,
+        })
+    return catalog
+
+
+PROFILES = [
+    {"gpa": 3.6, "budget_per_year": 40000, "work_experience_years": 0, "gre_gmat_status": "NOT_STARTED",
+     "preferred_countries": ["USA", "Canada"], "field_of_study": "Computer Science", "intended_degree": "Masters"},
+    {"gpa": 3.1, "budget_per_year": 25000, "work_experience_years": 3, "gre_gmat_status": "COMPLETED",
+     "preferred_countries": ["Germany"], "field_of_study": "MBA", "intended_degree": "Masters"},
+    {"gpa": None, "budget_per_year": None, "work_experience_years": 1},
+]
+USER = {"full_name": "Bench User", "current_stage": "DISCOVERY", "onboarding_completed": True}
+SHORTLIST = [{"university": {"name": "MIT"}, "category": "DREAM", "is_locked": False}]
+TASKS = [{"title": f"Task {i}", "status": "PENDING"} for i in range(8)]
+
+
+def measure(fn, *, clear_cache: bool) -> tuple:
+    """Returns (microseconds per call, allocated bytes per call)."""
+    catalog = make_catalog()
+    fn(USER, PROFILES[0], catalog, SHORTLIST, TASKS)  # Warm-up / populate cache
+
+    started = time.perf_counter()
+    for _ in range(ITERATIONS):
+        if clear_cache:
+            context_render_cache.clear()
+        fn(USER, PROFILES[0], catalog, SHORTLIST, TASKS)
+    per_call_us = (time.perf_counter() - started) / ITERATIONS * 1e6
+
+    if clear_cache:
+        context_render_cache.clear()
+    tracemalloc.start()
+    fn(USER, PROFILES[0], catalog, SHORTLIST, TASKS)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return per_call_us, peak
+
+
+def main():
+    catalog = make_catalog()
+    for profile in PROFILES:
+        context_render_cache.clear()
+        expected = legacy_build_context(USER, profile, catalog, SHORTLIST, TASKS)
+        assert build_context(USER, profile, catalog, SHORTLIST, TASKS) == expected, "cold cache output differs"
+        assert build_context(USER, profile, catalog, SHORTLIST, TASKS) == expected, "warm cache output differs"
+    print(f"Parity:  OK across {len(PROFILES)} profiles ({len(expected):,} chars)")
+
+    rows = [
+        ("legacy", measure(legacy_build_context, clear_cache=False)),
+        ("cached (cold)", measure(build_context, clear_cache=True)),
+        ("cached (warm)", measure(build_context, clear_cache=False)),
+    ]
+    print(f"{'variant':<15} {'us/call':>10} {'peak alloc':>12}")
+    for name, (per_call_us, peak) in rows:
+        print(f"{name:<15} {per_call_us:>10.1f} {peak / 1024:>10.1f}KB")
+
+
+if __name__ == "__main__":
+    main()
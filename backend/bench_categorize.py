@@ -0,0 +1,68 @@
+"""
+Benchmark for university categorization.
+
+Compares `categorize_university` called once per university with a
+CategoryEngine pass over the whole catalog, on seed-shaped catalogs of 100,
+5,000 and 50,000 universities:
+- parity: every row identical to the scalar function
+- one-off engine build time (once per catalog version in the app)
+- median time to categorize the catalog against a profile, reading 20 rows
+  (a page of results) or every row
+
+Usage: python bench_categorize.py
+"""
+import os
+import sys
+import time
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from ai_counsellor import categorize_university  # noqa: E402
+from bench_build_context import PROFILES, make_catalog  # noqa: E402
+from category_engine import CategoryEngine  # noqa: E402
+
+CATALOG_SIZES = [100, 5_000, 50_000]
+PAGE_ROWS = 20
+ITERATIONS = 10
+
+
+def median_ms(fn) -> float:
+    timings = []
+    for _ in range(ITERATIONS):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    print(f"{'universities':>12} {'build ms':>9} {'scalar ms':>10} {'page ms':>8} {'all rows ms':>12} {'speedup':>8}")
+    for size in CATALOG_SIZES:
+        catalog = make_catalog(size)
+        started = time.perf_counter()
+        engine = CategoryEngine(catalog)
+        build_ms = (time.perf_counter() - started) * 1000
+
+        for profile in PROFILES:
+            categories = engine.categorize(profile)
+            assert [categories.row(i) for i in range(size)] == [categorize_university(u, profile) for u in catalog]
+
+        profile = PROFILES[0]
+        scalar_ms = median_ms(lambda: [categorize_university(u, profile) for u in catalog])
+
+        def page():
+            categories = engine.categorize(profile)
+            return [categories.row(i) for i in range(PAGE_ROWS)]
+
+        def all_rows():
+            categories = engine.categorize(profile)
+            return [categories.row(i) for i in range(size)]
+
+        page_ms = median_ms(page)
+        all_ms = median_ms(all_rows)
+        print(f"{size:>12,} {build_ms:>9.1f} {scalar_ms:>10.2f} {page_ms:>8.3f} {all_ms:>12.2f} {scalar_ms / page_ms:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
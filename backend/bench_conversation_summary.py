@@ -0,0 +1,113 @@
+"""
+Benchmark for rolling conversation summaries.
+
+Builds the counsellor prompt for sessions of 10, 100 and 500 messages in a
+throwaway SQLite database, two ways:
+- full history: every earlier message passed to the prompt verbatim (what it
+  would take to keep the whole conversation without summaries)
+- summary: the session's rolling summary plus the last HISTORY_LIMIT
+  messages, after run_summary_job has folded the rest
+
+Reports the prompt's estimated tokens, the time to load the turn context and
+build the prompt (median), and the time to fold the backlog. Summaries come
+from the fake Gemini backend with zero latency, so the fold time is this
+process's share only; real summarizer calls run off the request path.
+
+Usage: python bench_conversation_summary.py
+"""
+import os
+import sys
+import time
+import asyncio
+import logging
+import tempfile
+import statistics
+
+os.environ.setdefault("GEMINI_BACKEND", "fake")
+os.environ.setdefault("GEMINI_FAKE_LATENCY_MS", "0")
+os.environ.setdefault("GEMINI_FAKE_LATENCY_SIGMA", "0")
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from ai_counsellor import build_counsellor_prompt  # noqa: E402
+from bench_build_context import PROFILES, SHORTLIST, TASKS, USER, make_catalog  # noqa: E402
+from chat_context import load_chat_context  # noqa: E402
+from conversation_summary import run_summary_job  # noqa: E402
+from database import Base  # noqa: E402
+from models import ChatMessage, ChatSession, User  # noqa: E402
+from prompt_budget import estimate_tokens  # noqa: E402
+
+SESSION_SIZES = [10, 100, 500]
+ITERATIONS = 20
+MESSAGE = "Which of these fits my budget best?"
+INTENT = {"intent": "UNIVERSITY_DISCOVERY"}
+USER_TURN = "I'm comparing options for a Masters in Computer Science; my budget is around $30k a year. " * 2
+ASSISTANT_TURN = (
+    "Given your GPA and budget, TU Munich and the University of Toronto are realistic targets, "
+    "while ETH Zurich is a reach. Book the IELTS soon and start your SOP draft this month. "
+) * 4
+
+
+def make_session(db, user_id: int, size: int) -> int:
+    session = ChatSession(user_id=user_id, title=f"{size} messages")
+    db.add(session)
+    db.flush()
+    db.add_all([
+        ChatMessage(user_id=user_id, session_id=session.id, role="assistant" if i % 2 else "user",
+                    content=ASSISTANT_TURN if i % 2 else USER_TURN)
+        for i in range(size)
+    ])
+    db.commit()
+    return session.id
+
+
+def timed_prompt(db, user_id: int, session_id: int, catalog: list, full_history: bool) -> tuple:
+    """Returns (estimated prompt tokens, median ms to load context and build the prompt)."""
+    timings = []
+    for _ in range(ITERATIONS):
+        started = time.perf_counter()
+        if full_history:
+            context = load_chat_context(db, user_id, session_id, history_limit=1_000_000)
+            summary = None
+        else:
+            context = load_chat_context(db, user_id, session_id)
+            summary = context.summary
+        prompt = asyncio.run(build_counsellor_prompt(
+            MESSAGE, USER, PROFILES[0], catalog, SHORTLIST, TASKS, context.history, INTENT, summary
+        ))
+        timings.append((time.perf_counter() - started) * 1000)
+    return estimate_tokens(prompt.system_instruction + prompt.contents), statistics.median(timings)
+
+
+def main():
+    # The full-history prompts are far over budget; that is the point, not news
+    logging.disable(logging.WARNING)
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{tmp}/bench.db")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        user = User(email="bench@example.com", password_hash="-", full_name="Bench User")
+        db.add(user)
+        db.commit()
+        catalog = make_catalog()
+
+        print(f"{'messages':>8} {'variant':<13} {'prompt tokens':>14} {'build ms':>9} {'fold ms':>8}")
+        for size in SESSION_SIZES:
+            session_id = make_session(db, user.id, size)
+            tokens, build_ms = timed_prompt(db, user.id, session_id, catalog, full_history=True)
+            print(f"{size:>8} {'full history':<13} {tokens:>14,} {build_ms:>9.1f} {'-':>8}")
+
+            started = time.perf_counter()
+            asyncio.run(run_summary_job(db, {"session_id": session_id}))
+            db.commit()
+            fold_ms = (time.perf_counter() - started) * 1000
+            tokens, build_ms = timed_prompt(db, user.id, session_id, catalog, full_history=False)
+            print(f"{size:>8} {'summary':<13} {tokens:>14,} {build_ms:>9.1f} {fold_ms:>8.1f}")
+        db.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
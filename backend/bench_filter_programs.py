@@ -0,0 +1,105 @@
+"""
+Benchmark for filter_programs.
+
+Compares the scan (`filter_programs_scan`, every program re-normalized and
+substring-checked per call) with the ProgramIndex path, on seed-shaped
+catalogs of 75, 5,000 and 50,000 programs frozen like catalog snapshots:
+- parity: identical output for every query
+- one-off index build time
+- median latency per query, scan vs index (index warm)
+
+Usage: python bench_filter_programs.py
+"""
+import os
+import sys
+import time
+import logging
+import statistics
+from types import MappingProxyType
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from real_universities_data import UNIVERSITIES_DATA  # noqa: E402
+from recommendation_engine import ProgramIndex, filter_programs, filter_programs_scan, program_indexes  # noqa: E402
+
+CATALOG_SIZES = [75, 5_000, 50_000]
+PROGRAMS_PER_UNIVERSITY = 5
+ITERATIONS = 20
+DISCIPLINES = [
+    "Computer Science", "Data Science", "Artificial Intelligence", "Electrical Engineering",
+    "Mechanical Engineering", "Business Analytics", "Finance", "Management", "Public Health",
+    "Economics", "Physics", "Biotechnology",
+]
+LEVELS = ["Masters", "MS", "M.Sc", "Bachelors", "PhD", "MBA"]
+PROFILE = {"field_of_study": "Computer Science"}
+QUERIES = [
+    {"intent": "PROGRAM_SPECIFIC_QUERY", "target_discipline": "Computer Science", "target_degree": "Masters",
+     "max_budget_usd": 30000, "target_countries": ["USA", "Germany"]},
+    {"intent": "UNIVERSITY_DISCOVERY", "target_countries": ["USA", "Canada", "UK"]},
+    {"intent": "FIELD_SWITCH", "target_discipline": "data", "max_budget_usd": 20000},
+    {"intent": "PROGRAM_SPECIFIC_QUERY", "target_discipline": "Engineering", "target_degree": "MS"},
+    {"intent": "PROFILE_ANALYSIS"},
+]
+
+
+def make_catalog(programs: int) -> list:
+    """Frozen university records, PROGRAMS_PER_UNIVERSITY programs each, like a catalog snapshot."""
+    catalog = []
+    for i in range(programs // PROGRAMS_PER_UNIVERSITY):
+        base = UNIVERSITIES_DATA[i % len(UNIVERSITIES_DATA)]
+        template = base["programs"][0]
+        records = []
+        for j in range(PROGRAMS_PER_UNIVERSITY):
+            n = i * PROGRAMS_PER_UNIVERSITY + j
+            discipline = DISCIPLINES[(i + j * 5) % len(DISCIPLINES)]
+            level = LEVELS[n % len(LEVELS)]
+            records.append(MappingProxyType({
+                **template,
+                "id": n + 1,
+                "university_id": i + 1,
+                "name": f"{level} {discipline}",
+                "degree_level": level,
+                "program_discipline": discipline,
+                "tuition_per_year_usd": 5000 + (n * 7919) % 60000,
+            }))
+        catalog.append(MappingProxyType({
+            **{k: v for k, v in base.items() if k != "programs"},
+            "id": i + 1,
+            "name": f"{base['name']} #{i + 1}",
+            "programs": tuple(records),
+        }))
+    return catalog
+
+
+def median_ms(fn, *args) -> float:
+    timings = []
+    for _ in range(ITERATIONS):
+        started = time.perf_counter()
+        fn(*args)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    # filter_programs logs every call at INFO
+    logging.disable(logging.INFO)
+    print(f"{'programs':>8} {'build ms':>9} {'query':>5} {'matches':>8} {'scan ms':>9} {'index ms':>9} {'speedup':>8}")
+    for size in CATALOG_SIZES:
+        catalog = make_catalog(size)
+        started = time.perf_counter()
+        ProgramIndex(catalog)
+        build_ms = (time.perf_counter() - started) * 1000
+        program_indexes.clear()
+        for i, intent in enumerate(QUERIES):
+            expected = filter_programs_scan(catalog, intent, PROFILE)
+            assert filter_programs(catalog, intent, PROFILE) == expected, f"parity broken for {intent}"
+            scan_ms = median_ms(filter_programs_scan, catalog, intent, PROFILE)
+            index_ms = median_ms(filter_programs, catalog, intent, PROFILE)
+            matches = sum(len(uni["programs"]) for uni in expected)
+            build = f"{build_ms:.1f}" if i == 0 else "-"
+            print(f"{size:>8,} {build:>9} {i + 1:>5} {matches:>8,} "
+                  f"{scan_ms:>9.3f} {index_ms:>9.3f} {scan_ms / index_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Offline benchmark for the local intent classifier.
+
+Runs a labelled message set through classify_intent_locally and reports,
+at the configured confidence threshold:
+- coverage: share of messages answered locally (no LLM call)
+- accuracy: share of locally answered messages with the right intent
+- per-message latency
+
+Usage: python bench_intent_classifier.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from recommendation_engine import INTENT_LOCAL_CONFIDENCE, classify_intent_locally  # noqa: E402
+
+LABELLED_MESSAGES = [
+    ("Suggest universities for me", "UNIVERSITY_DISCOVERY"),
+    ("Recommend some good universities", "UNIVERSITY_DISCOVERY"),
+    ("Where should I apply?", "UNIVERSITY_DISCOVERY"),
+    ("Show me universities in Germany", "UNIVERSITY_DISCOVERY"),
+    ("Any safe options in Canada?", "UNIVERSITY_DISCOVERY"),
+    ("Suggest dream universities in the USA", "UNIVERSITY_DISCOVERY"),
+    ("MS Data Science programs in the UK", "PROGRAM_SPECIFIC_QUERY"),
+    ("MBA programs in Canada under $50k", "PROGRAM_SPECIFIC_QUERY"),
+    ("Recommend Computer Science courses in Australia", "PROGRAM_SPECIFIC_QUERY"),
+    ("Which universities offer Mechanical Engineering?", "PROGRAM_SPECIFIC_QUERY"),
+    ("What about Data Science instead?", "FIELD_SWITCH"),
+    ("I want to switch to MBA", "FIELD_SWITCH"),
+    ("How about Information Systems?", "FIELD_SWITCH"),
+    ("Compare MIT and Stanford", "COMPARISON"),
+    ("TUM vs RWTH Aachen", "COMPARISON"),
+    ("Which is better, Toronto or UBC?", "COMPARISON"),
+    ("What's the difference between Oxford and Cambridge?", "COMPARISON"),
+    ("Do I need IELTS for Canada?", "EXAM_STRATEGY"),
+    ("Should I take the GRE?", "EXAM_STRATEGY"),
+    ("Is TOEFL or IELTS easier?", "EXAM_STRATEGY"),
+    ("What GMAT score do I need?", "EXAM_STRATEGY"),
+    ("What do I do now?", "NEXT_STEPS"),
+    ("What are my next steps?", "NEXT_STEPS"),
+    ("How do I apply to Toronto?", "NEXT_STEPS"),
+    ("What should I do next?", "NEXT_STEPS"),
+    ("Am I good enough for Stanford?", "PROFILE_ANALYSIS"),
+    ("What are my chances at CMU?", "PROFILE_ANALYSIS"),
+    ("Evaluate my profile", "PROFILE_ANALYSIS"),
+    ("Am I eligible for Oxford?", "PROFILE_ANALYSIS"),
+    ("Write me a poem", "OUT_OF_SCOPE"),
+    ("Tell me a joke", "OUT_OF_SCOPE"),
+    ("Who is the president of France?", "OUT_OF_SCOPE"),
+    ("What's the weather today?", "OUT_OF_SCOPE"),
+    # Ambiguous follow-ups - these should go to the LLM
+    ("Tell me more about that", "UNIVERSITY_DISCOVERY"),
+    ("Hmm ok", "UNIVERSITY_DISCOVERY"),
+    ("And the second one?", "PROGRAM_SPECIFIC_QUERY"),
+    ("Cheaper ones please", "UNIVERSITY_DISCOVERY"),
+    ("Yes", "NEXT_STEPS"),
+]
+
+ITERATIONS = 200
+
+
+def main():
+    answered = correct = 0
+    for message, expected in LABELLED_MESSAGES:
+        intent, confidence = classify_intent_locally(message)
+        local = confidence >= INTENT_LOCAL_CONFIDENCE
+        if local:
+            answered += 1
+            correct += intent["intent"] == expected
+        marker = ("OK " if intent["intent"] == expected else "BAD") if local else "LLM"
+        print(f"[{marker}] {confidence:.2f} {intent['intent']:<24} {message}")
+
+    started = time.perf_counter()
+    for _ in range(ITERATIONS):
+        for message, _ in LABELLED_MESSAGES:
+            classify_intent_locally(message)
+    per_message_us = (time.perf_counter() - started) / (ITERATIONS * len(LABELLED_MESSAGES)) * 1e6
+
+    total = len(LABELLED_MESSAGES)
+    print()
+    print(f"Threshold:  {INTENT_LOCAL_CONFIDENCE}")
+    print(f"Coverage:   {answered}/{total} ({answered / total:.0%}) answered locally")
+    print(f"Accuracy:   {correct}/{answered} ({(correct / answered if answered else 0):.0%}) of local answers")
+    print(f"Latency:    {per_message_us:.1f} us/message")
+
+
+if __name__ == "__main__":
+    main()
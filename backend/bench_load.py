@@ -0,0 +1,138 @@
+"""
+Load generator for the LLM-backed endpoints.
+
+Meant to run against a server started with the fake Gemini backend, so the
+whole request path (admission, key rotation, retries, caching, persistence)
+is exercised without network access or quota:
+
+    GEMINI_BACKEND=fake GEMINI_FAKE_QUOTA_RATE=0.05 uvicorn main:app
+    python bench_load.py --url http://localhost:8000 --concurrency 32 --requests 500
+
+Logs in as the seeded demo users and sends a mix of chat, streamed chat, SOP
+review and cold-email requests. Reports status codes and latency
+percentiles per endpoint, then the server's admission and per-call-site
+LLM metrics.
+
+Usage: python bench_load.py [--url URL] [--concurrency N] [--requests N]
+"""
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+from collections import Counter, defaultdict
+
+import httpx
+
+DEMO_USERS = ["weak@demo.com", "average@demo.com", "strong@demo.com"]
+DEMO_PASSWORD = "Demo@123"
+
+CHAT_MESSAGES = [
+    "What are my chances for a Masters in Computer Science in Germany?",
+    "Suggest safe universities in Canada under $30,000 a year",
+    "Which exams do I need for the UK?",
+    "Tell me more about that",
+    "Compare the universities on my shortlist",
+]
+
+SOP_TEXT = (
+    "Ever since I built my first website, I have wanted to understand how large systems stay reliable. "
+    "During my undergraduate studies I worked on distributed caching and fault injection. "
+) * 4
+
+# (weight, endpoint name)
+MIX = [(70, "chat"), (15, "chat_stream"), (10, "sop_review"), (5, "cold_email")]
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def login(client: httpx.AsyncClient, email: str) -> dict:
+    response = await client.post("/api/auth/login", json={"email": email, "password": DEMO_PASSWORD})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def send(client: httpx.AsyncClient, endpoint: str, headers: dict) -> int:
+    if endpoint == "chat":
+        response = await client.post("/api/chat", json={"content": random.choice(CHAT_MESSAGES)}, headers=headers)
+    elif endpoint == "chat_stream":
+        async with client.stream("POST", "/api/chat/stream", json={"content": random.choice(CHAT_MESSAGES)}, headers=headers) as response:
+            async for _ in response.aiter_bytes():
+                pass
+    elif endpoint == "sop_review":
+        response = await client.post("/api/sop/review", json={"text": SOP_TEXT}, headers=headers)
+    else:
+        response = await client.post("/api/tools/cold-email", json={
+            "professor_name": "Dr. Jane Smith",
+            "university_name": "Technical University of Munich",
+            "research_area": "Distributed systems",
+        }, headers=headers)
+    return response.status_code
+
+
+async def run(url: str, concurrency: int, total: int, seed: int):
+    random.seed(seed)
+    weights, endpoints = zip(*MIX)
+    plan = random.choices(endpoints, weights=weights, k=total)
+    latencies = defaultdict(list)
+    statuses = defaultdict(Counter)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, timeout=120, limits=limits) as client:
+        headers = [await login(client, email) for email in DEMO_USERS]
+
+        async def one(i: int, endpoint: str):
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    status = await send(client, endpoint, headers[i % len(headers)])
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+                latencies[endpoint].append((time.perf_counter() - started) * 1000)
+                statuses[endpoint][status] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i, endpoint) for i, endpoint in enumerate(plan)))
+        elapsed = time.perf_counter() - started
+
+        server_metrics = (await client.get("/api/metrics")).json()
+        llm_metrics = (await client.get("/api/metrics/llm")).json()
+
+    print(f"{total} requests in {elapsed:.1f}s ({total / elapsed:.1f} req/s), concurrency {concurrency}")
+    print(f"{'endpoint':<12} {'n':>5} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  statuses")
+    for endpoint in endpoints:
+        values = latencies.get(endpoint)
+        if not values:
+            continue
+        print(
+            f"{endpoint:<12} {len(values):>5} {percentile(values, 50):>8.0f} {percentile(values, 95):>8.0f} "
+            f"{percentile(values, 99):>8.0f}  {dict(statuses[endpoint])}"
+        )
+    print("\nadmission:", json.dumps(server_metrics.get("admission"), indent=2))
+    print("call sites:", json.dumps(
+        {site: {k: v for k, v in stats.items() if k in ("calls", "outcomes", "retries")}
+         for site, stats in llm_metrics.get("call_sites", {}).items()},
+        indent=2
+    ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    try:
+        asyncio.run(run(args.url, args.concurrency, args.requests, args.seed))
+    except httpx.ConnectError:
+        sys.exit(f"Could not connect to {args.url} - is the server running?")
+
+
+if __name__ == "__main__":
+    main()
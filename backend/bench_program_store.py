@@ -0,0 +1,166 @@
+"""
+Benchmark for the columnar program store.
+
+Seeds a throwaway SQLite database with 10,000 universities and 50,000
+programs, then holds the catalog three ways:
+- ORM: University objects with their programs loaded (what listing,
+  compare and detail requests hold)
+- frozen dicts: the previous catalog snapshot, one read-only dict per program
+- columnar: the current snapshot, programs in a ProgramStore
+
+Reports the memory each retains (tracemalloc, i.e. per worker process),
+the load time, and what reading programs costs on each snapshot: building
+the ProgramIndex, an indexed filter_programs and a full filter_programs_scan.
+
+Usage: python bench_program_store.py
+"""
+import gc
+import os
+import sys
+import time
+import logging
+import tempfile
+import statistics
+import tracemalloc
+from types import MappingProxyType
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine, insert  # noqa: E402
+from sqlalchemy.orm import selectinload, sessionmaker  # noqa: E402
+
+from catalog import CatalogSnapshot, _SKIPPED_COLUMNS, _freeze, load_snapshot  # noqa: E402
+from database import Base  # noqa: E402
+from models import Program, ProgramCategory, University  # noqa: E402
+from real_universities_data import UNIVERSITIES_DATA  # noqa: E402
+from recommendation_engine import ProgramIndex, filter_programs, filter_programs_scan, program_indexes  # noqa: E402
+
+UNIVERSITIES = 10_000
+PROGRAMS_PER_UNIVERSITY = 5
+ITERATIONS = 5
+DISCIPLINES = ["Computer Science", "Data Science", "Electrical Engineering", "Business Analytics", "Finance", "Public Health"]
+LEVELS = ["Masters", "MS", "M.Sc", "Bachelors", "PhD"]
+CATEGORIES = [ProgramCategory.STEM, ProgramCategory.STEM, ProgramCategory.STEM, ProgramCategory.BUSINESS,
+              ProgramCategory.BUSINESS, ProgramCategory.SOCIAL_SCIENCE]
+INTENT = {"intent": "PROGRAM_SPECIFIC_QUERY", "target_discipline": "Computer Science", "target_degree": "Masters",
+          "max_budget_usd": 30000, "target_countries": ["USA", "Germany"]}
+
+
+def seed(db):
+    db.execute(insert(University), [
+        {
+            **{k: v for k, v in UNIVERSITIES_DATA[i % len(UNIVERSITIES_DATA)].items() if k != "programs"},
+            "id": i + 1,
+            "name": f"{UNIVERSITIES_DATA[i % len(UNIVERSITIES_DATA)]['name']} #{i + 1}",
+            "min_gpa": 2.8 + (i % 10) / 10,
+            "tuition_per_year": 12000 + (i % 12) * 4000,
+            "data_source": "Official Website",
+        }
+        for i in range(UNIVERSITIES)
+    ])
+    template = UNIVERSITIES_DATA[0]["programs"][0]
+    rows = []
+    for i in range(UNIVERSITIES):
+        for j in range(PROGRAMS_PER_UNIVERSITY):
+            n = i * PROGRAMS_PER_UNIVERSITY + j
+            discipline = DISCIPLINES[(i + j) % len(DISCIPLINES)]
+            rows.append({
+                **{k: v for k, v in template.items() if k != "duration_months"},
+                "university_id": i + 1,
+                "name": f"{LEVELS[n % len(LEVELS)]} {discipline}",
+                "degree_level": LEVELS[n % len(LEVELS)],
+                "program_category": CATEGORIES[(i + j) % len(CATEGORIES)],
+                "program_discipline": discipline,
+                "duration_months": 12 + 12 * (n % 2),
+                "tuition_per_year_usd": 5000 + (n * 7919) % 60000,
+                "min_gpa": 3.0 + (n % 8) / 10,
+                "gmat_required": discipline == "Finance",
+                "requires_work_experience": n % 7 == 0,
+                "min_work_experience_years": 2 if n % 7 == 0 else 0,
+                "program_url": f"https://example.edu/{i + 1}/programs/{j + 1}",
+            })
+    db.execute(insert(Program), rows)
+    db.commit()
+
+
+def load_orm(db):
+    return db.query(University).options(selectinload(University.programs)).order_by(University.id).all()
+
+
+def load_frozen_dicts(db):
+    """The snapshot as it was before ProgramStore: one frozen dict per program."""
+    universities = []
+    for row in load_orm(db):
+        record = _freeze(row, _SKIPPED_COLUMNS)
+        record["programs"] = tuple(
+            MappingProxyType(_freeze(program)) for program in sorted(row.programs, key=lambda p: p.id)
+        )
+        universities.append(MappingProxyType(record))
+    return CatalogSnapshot(0, tuple(universities))
+
+
+def retained(factory, load):
+    """(result, bytes it retains, seconds to load) for `load` run in a fresh session."""
+    gc.collect()
+    tracemalloc.start()
+    db = factory()
+    result = load(db)
+    if not isinstance(result, list):
+        db.close()  # snapshots outlive their session; ORM objects do not
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    db = factory()
+    started = time.perf_counter()
+    load(db)
+    seconds = time.perf_counter() - started
+    db.close()
+    return result, size, seconds
+
+
+def median_ms(fn) -> float:
+    timings = []
+    for _ in range(ITERATIONS):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    logging.disable(logging.INFO)
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{tmp}/bench.db")
+        Base.metadata.create_all(bind=engine)
+        factory = sessionmaker(bind=engine)
+        with factory() as db:
+            seed(db)
+
+        print(f"{UNIVERSITIES:,} universities, {UNIVERSITIES * PROGRAMS_PER_UNIVERSITY:,} programs\n")
+        print(f"{'representation':<14} {'retained MB':>12} {'load ms':>8} {'index build ms':>15} {'filter ms':>10} {'scan ms':>8}")
+        orm_db = factory()
+        _, orm_bytes, orm_seconds = retained(lambda: orm_db, load_orm)
+        print(f"{'ORM':<14} {orm_bytes / 2**20:>12.1f} {orm_seconds * 1000:>8.0f} {'-':>15} {'-':>10} {'-':>8}")
+        orm_db.close()
+
+        results = {}
+        for label, load in (("frozen dicts", load_frozen_dicts), ("columnar", lambda db: load_snapshot(db, 0))):
+            snapshot, size, seconds = retained(factory, load)
+            universities = list(snapshot.universities)
+            build_ms = median_ms(lambda: ProgramIndex(universities))
+            program_indexes.clear()
+            filter_ms = median_ms(lambda: filter_programs(universities, INTENT, {}))
+            scan_ms = median_ms(lambda: filter_programs_scan(universities, INTENT, {}))
+            results[label] = filter_programs(universities, INTENT, {})
+            print(f"{label:<14} {size / 2**20:>12.1f} {seconds * 1000:>8.0f} {build_ms:>15.1f} {filter_ms:>10.2f} {scan_ms:>8.1f}")
+            if label == "columnar":
+                print(f"\n  of which NumPy arrays: {snapshot.programs.array_bytes() / 2**20:.1f} MB")
+            program_indexes.clear()
+
+        assert results["frozen dicts"] == results["columnar"], "filter results differ between representations"
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
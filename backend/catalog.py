@@ -0,0 +1,161 @@
+"""
+Read-only snapshot of the university catalog, shared across requests.
+
+The catalog only changes when it is re-seeded, yet every chat turn used to
+query all universities, lazy-load their programs one university at a time and
+copy the ORM objects' `__dict__`s. Instead, the catalog is loaded once (two
+queries: universities, then all programs) into compact, immutable records
+with lookups by id, name and country. Chat, voice and suggestion hydration
+all read from that snapshot, and university listings categorize against
+its CategoryEngine.
+
+University records are `MappingProxyType`s over plain column values (no
+SQLAlchemy state). Programs are held column by column in a ProgramStore
+(`snapshot.programs`); a university's "programs" is a sequence of read-only
+ProgramRow mappings over it. `dict(record)` or `record.copy()` gives a
+mutable copy.
+
+The snapshot carries the catalog version. `catalog.invalidate()` bumps it and
+drops the rendered-context cache and the program index, so the next reader
+reloads. Call it after anything that writes universities or programs (see
+`seed_universities`).
+"""
+
+import time
+import logging
+import threading
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional, Tuple
+
+from sqlalchemy.orm import Session, selectinload
+
+from ai_counsellor import invalidate_context_cache
+from category_engine import CategoryEngine
+from metrics import metrics
+from models import University
+from program_store import ProgramStore, university_program_rows
+from recommendation_engine import program_indexes
+
+logger = logging.getLogger(__name__)
+
+# Already carried by the programs relationship
+_SKIPPED_COLUMNS = {"programs_json"}
+
+
+def _freeze(obj, skipped=()) -> dict:
+    return {
+        attr.key: getattr(obj, attr.key)
+        for attr in obj.__mapper__.column_attrs
+        if attr.key not in skipped
+    }
+
+
+class CatalogSnapshot:
+    """Immutable view of every university and program at one catalog version."""
+
+    __slots__ = ("version", "universities", "programs", "by_id", "by_name", "by_country", "loaded_at", "_categories")
+
+    def __init__(self, version: int, universities: Tuple[Mapping, ...], programs: Optional[ProgramStore] = None):
+        self.version = version
+        self.universities = universities
+        self.programs = programs
+        self.by_id: Dict[int, Mapping] = {uni["id"]: uni for uni in universities}
+        self.by_name: Dict[str, Mapping] = {uni["name"].lower(): uni for uni in universities}
+        by_country: Dict[str, list] = {}
+        for uni in universities:
+            by_country.setdefault(uni["country"], []).append(uni)
+        self.by_country: Dict[str, Tuple[Mapping, ...]] = {c: tuple(unis) for c, unis in by_country.items()}
+        self.loaded_at = time.time()
+        self._categories: Optional[CategoryEngine] = None
+
+    @property
+    def categories(self) -> CategoryEngine:
+        """Categorization arrays for every university, built on first use."""
+        if self._categories is None:
+            self._categories = CategoryEngine(self.universities)
+        return self._categories
+
+    def get(self, university_id: Optional[int]) -> Optional[Mapping]:
+        return self.by_id.get(university_id)
+
+    def find(self, name: str) -> Optional[Mapping]:
+        """Case-insensitive lookup by exact university name."""
+        return self.by_name.get((name or "").strip().lower())
+
+    def in_country(self, country: str) -> Tuple[Mapping, ...]:
+        return self.by_country.get(country, ())
+
+    def __len__(self) -> int:
+        return len(self.universities)
+
+
+def load_snapshot(db: Session, version: int) -> CatalogSnapshot:
+    """Read the whole catalog with programs eagerly loaded."""
+    rows = (
+        db.query(University)
+        .options(selectinload(University.programs))
+        .order_by(University.id)
+        .all()
+    )
+    store = ProgramStore([sorted(row.programs, key=lambda p: p.id) for row in rows])
+    universities = []
+    for row, programs in zip(rows, university_program_rows(store)):
+        record = _freeze(row, _SKIPPED_COLUMNS)
+        record["programs"] = programs
+        universities.append(MappingProxyType(record))
+    return CatalogSnapshot(version, tuple(universities), store)
+
+
+class CatalogStore:
+    """Holds the current snapshot; reloads it only after `invalidate()`."""
+
+    def __init__(self):
+        self._version = 0
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._lock = threading.Lock()
+        self.loads = 0
+
+    def get(self, db: Session) -> CatalogSnapshot:
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == self._version:
+            return snapshot
+        with self._lock:
+            # Another thread may have loaded it while we waited
+            snapshot = self._snapshot
+            if snapshot is not None and snapshot.version == self._version:
+                return snapshot
+            started = time.perf_counter()
+            snapshot = load_snapshot(db, self._version)
+            self._snapshot = snapshot
+            self.loads += 1
+            metrics.inc("catalog.loads")
+            logger.info(
+                f"Loaded catalog snapshot v{snapshot.version}: {len(snapshot)} universities "
+                f"in {(time.perf_counter() - started) * 1000:.0f}ms"
+            )
+            return snapshot
+
+    def current(self) -> Optional[CatalogSnapshot]:
+        """The loaded snapshot if it is still current; never loads one."""
+        snapshot = self._snapshot
+        return snapshot if snapshot is not None and snapshot.version == self._version else None
+
+    def invalidate(self):
+        """Mark the catalog as changed; the next `get` reloads it."""
+        with self._lock:
+            self._version += 1
+            self._snapshot = None
+        invalidate_context_cache()
+        program_indexes.clear()
+
+    def stats(self) -> dict:
+        snapshot = self._snapshot
+        return {
+            "version": self._version,
+            "loaded": snapshot is not None,
+            "universities": len(snapshot) if snapshot else 0,
+            "loads": self.loads,
+        }
+
+
+catalog = CatalogStore()
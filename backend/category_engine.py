@@ -0,0 +1,114 @@
+"""
+Vectorized university categorization.
+
+`categorize_university` (ai_counsellor) classifies one university against a
+profile: category (DREAM / TARGET / SAFE), acceptance chance and cost level,
+plus fit and risk sentences. Listing, compare, detail and `build_context`
+used to call it once per university, re-deriving defaults and formatting
+both sentences for every row.
+
+CategoryEngine holds the catalog's min_gpa, tuition and acceptance_rate as
+NumPy arrays, with the scalar function's defaults applied once. Its
+`categorize(profile)` computes the three codes for every university in one
+pass. Sentences are formatted only when a row is read, from the original
+values, through the same `category_reasons` the scalar function uses, so
+rows are identical to `categorize_university`.
+
+The catalog snapshot builds one engine per catalog version (`snapshot.categories`).
+"""
+
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+CATEGORIES = ("DREAM", "TARGET", "SAFE")
+LEVELS = ("Low", "Medium", "High")
+
+# Defaults for missing (or zero) values, as in categorize_university
+DEFAULT_USER_GPA = 3.0
+DEFAULT_USER_BUDGET = 50000
+DEFAULT_MIN_GPA = 3.0
+DEFAULT_TUITION = 30000
+DEFAULT_ACCEPTANCE_RATE = 0.5
+
+_DREAM, _TARGET, _SAFE = range(3)
+_LOW, _MEDIUM, _HIGH = range(3)
+
+
+def category_reasons(category: str, uni_min_gpa, uni_tuition, user_gpa, user_budget) -> tuple:
+    """(fit, risk) sentences for a university already placed in `category`."""
+    if category == 'DREAM':
+        if uni_min_gpa > user_gpa + 0.3:
+            risk = f"GPA requirement ({uni_min_gpa}) is higher than your current GPA ({user_gpa})"
+        else:
+            risk = f"Tuition (${uni_tuition:,}) exceeds your budget (${user_budget:,})"
+        fit = "Prestigious program aligned with your goals"
+    elif category == 'SAFE':
+        risk = "Lower competition may mean less networking opportunities"
+        fit = f"Your GPA ({user_gpa}) exceeds requirements ({uni_min_gpa}) and fits budget"
+    else:
+        risk = "Competitive admission with moderate acceptance chances"
+        fit = "Good match - your profile meets requirements and budget"
+    return fit, risk
+
+
+class CategoryResults:
+    """Codes for every university of an engine against one profile; strings built per row on demand."""
+
+    def __init__(self, engine: "CategoryEngine", user_gpa, user_budget,
+                 category: np.ndarray, acceptance: np.ndarray, cost: np.ndarray):
+        self.engine = engine
+        self.user_gpa = user_gpa
+        self.user_budget = user_budget
+        self.category = category
+        self.acceptance = acceptance
+        self.cost = cost
+
+    def __len__(self) -> int:
+        return len(self.category)
+
+    def row(self, i: int) -> tuple:
+        """(category, fit, risk, acceptance_chance, cost_level), as `categorize_university` returns it."""
+        category = CATEGORIES[self.category[i]]
+        fit, risk = category_reasons(
+            category, self.engine.min_gpa_values[i], self.engine.tuition_values[i], self.user_gpa, self.user_budget
+        )
+        return category, fit, risk, LEVELS[self.acceptance[i]], LEVELS[self.cost[i]]
+
+    def for_id(self, university_id: Optional[int]) -> Optional[tuple]:
+        """The row of a university by id, None if the engine does not hold it."""
+        i = self.engine.positions.get(university_id)
+        return None if i is None else self.row(i)
+
+
+class CategoryEngine:
+    """Catalog columns categorization reads, as arrays in the order given."""
+
+    def __init__(self, universities: Sequence[dict]):
+        # `or` like the scalar function: None and 0 both fall back to the default
+        self.min_gpa_values = [uni.get('min_gpa') or DEFAULT_MIN_GPA for uni in universities]
+        self.tuition_values = [uni.get('tuition_per_year') or DEFAULT_TUITION for uni in universities]
+        self.min_gpa = np.array(self.min_gpa_values, dtype=np.float64)
+        self.tuition = np.array(self.tuition_values, dtype=np.float64)
+        self.acceptance_rate = np.array(
+            [uni.get('acceptance_rate') or DEFAULT_ACCEPTANCE_RATE for uni in universities], dtype=np.float64
+        )
+        self.positions: Dict[int, int] = {
+            uni.get('id'): i for i, uni in enumerate(universities) if uni.get('id') is not None
+        }
+        # Profile-independent, so computed once
+        self.cost = np.select([self.tuition < 15000, self.tuition < 40000], [_LOW, _MEDIUM], _HIGH).astype(np.int8)
+        self.acceptance = np.select(
+            [self.acceptance_rate < 0.1, self.acceptance_rate < 0.4], [_LOW, _MEDIUM], _HIGH
+        ).astype(np.int8)
+
+    def __len__(self) -> int:
+        return len(self.min_gpa_values)
+
+    def categorize(self, user_profile: dict) -> CategoryResults:
+        user_gpa = user_profile.get('gpa') or DEFAULT_USER_GPA
+        user_budget = user_profile.get('budget_per_year') or DEFAULT_USER_BUDGET
+        dream = (self.min_gpa > user_gpa + 0.3) | (self.tuition > user_budget * 1.2)
+        safe = (self.min_gpa <= user_gpa - 0.2) & (self.tuition <= user_budget)
+        category = np.select([dream, safe], [_DREAM, _SAFE], _TARGET).astype(np.int8)
+        return CategoryResults(self, user_gpa, user_budget, category, self.acceptance, self.cost)
@@ -0,0 +1,330 @@
+"""
+Set-based executor for the counsellor's tool calls.
+
+The user's shortlist and tasks are read once (two queries; university names
+come from the catalog snapshot). The whole action list is then validated and
+applied in memory, in order, so later actions see the effects of earlier ones:
+a university shortlisted and locked in the same reply works, and a lock moves
+the user to APPLICATION before any create_task that follows.
+
+The resulting changes are then written as bulk statements (one per table
+and kind: insert, update, delete) and committed together.
+
+Actions:
+- shortlist_university {"university_id", "category"}: DISCOVERY only
+- lock_university {"university_id"}: moves the user to APPLICATION, creates tasks
+- unlock_university {"university_id"}: deletes the lock's tasks, may regress the stage
+- create_task {"title", "description", "priority"}: APPLICATION only
+- update_task {"task_id", "status"}
+"""
+
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, insert, update
+from sqlalchemy.orm import Session
+
+from catalog import catalog
+from models import ShortlistedUniversity, Task, TaskStatus, UniversityCategory, User, UserStage
+
+# Free-plan shortlist limit (effectively unlimited since payments were removed)
+SHORTLIST_LIMIT = 100
+
+
+def _as_id(value) -> Optional[int]:
+    """An id from the model's arguments, which may arrive as a string ("12"); None if it isn't one."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _lock_task_templates(name: str) -> list:
+    return [
+        (f"Research {name} admission requirements", 1),
+        (f"Prepare SOP for {name}", 2),
+        (f"Gather documents for {name}", 3),
+        (f"Check {name} application deadline", 1),
+    ]
+
+
+class _ActionPlan:
+    """In-memory view of the user's shortlist, tasks and stage while actions are applied."""
+
+    def __init__(self, db: Session, user: User):
+        self.user = user
+        self.stage = user.current_stage
+        self.snapshot = catalog.get(db)
+        # Plain rows (not ORM instances), so the bulk writes below never race stale identity-map state
+        shortlist = db.query(
+            ShortlistedUniversity.id, ShortlistedUniversity.university_id, ShortlistedUniversity.is_locked
+        ).filter(ShortlistedUniversity.user_id == user.id).all()
+        tasks = db.query(Task.id, Task.shortlisted_university_id).filter(Task.user_id == user.id).all()
+        self.shortlist: Dict[int, dict] = {
+            row.university_id: {'id': row.id, 'university_id': row.university_id, 'is_locked': bool(row.is_locked)}
+            for row in shortlist
+        }
+        self.tasks: Dict[int, dict] = {row.id: {'id': row.id, 'shortlist_id': row.shortlisted_university_id} for row in tasks}
+
+        self.new_shortlist: List[dict] = []
+        self.new_tasks: List[dict] = []
+        self.shortlist_updates: Dict[int, dict] = {}
+        self.task_updates: Dict[int, dict] = {}
+        self.deleted_task_ids: List[int] = []
+        self.taken: List[dict] = []
+        self.blocked: List[dict] = []
+
+    def university_name(self, uni_id, default=None):
+        uni = self.snapshot.get(uni_id)
+        return uni["name"] if uni else default
+
+    def block(self, action_type: str, reason: str, **extra):
+        self.blocked.append({'type': action_type, 'reason': reason, **extra})
+
+    def set_lock(self, entry: dict, locked: bool):
+        entry['is_locked'] = locked
+        entry['locked_at'] = datetime.utcnow() if locked else None
+        if entry['id'] is not None:
+            self.shortlist_updates[entry['id']] = {
+                'id': entry['id'], 'is_locked': locked, 'locked_at': entry['locked_at']
+            }
+
+    # ------------------------------------------------------------
+    # TOOL: shortlist_university
+    # ------------------------------------------------------------
+    def shortlist_university(self, params: dict):
+        uni_id = _as_id(params.get('university_id'))
+        if uni_id is None:
+            return self.block('shortlist_university', f"Invalid university_id: {params.get('university_id')!r}")
+        category = params.get('category', 'TARGET')
+
+        # Stage check: Must be in DISCOVERY, not LOCKED/APPLICATION
+        if self.stage == UserStage.ONBOARDING:
+            return self.block('shortlist_university', 'Complete onboarding first')
+        if self.stage in [UserStage.LOCKED, UserStage.APPLICATION]:
+            return self.block('shortlist_university', 'Cannot modify shortlist after locking')
+        if len(self.shortlist) >= SHORTLIST_LIMIT:
+            return self.block('shortlist_university', 'Shortlist limit reached.', code='PLAN_LIMIT')
+        if uni_id in self.shortlist:
+            return self.block('shortlist_university', 'Already shortlisted')
+        name = self.university_name(uni_id)
+        if name is None:
+            return self.block('shortlist_university', 'University not found')
+        if category not in UniversityCategory.__members__:
+            return self.block('shortlist_university', f'Invalid category: {category}')
+
+        summary = {
+            'type': 'shortlist_university',
+            'university_id': uni_id,
+            'university_name': name,
+            'category': category,
+            'shortlist_id': None,  # filled in once inserted
+            'confirmed': True
+        }
+        entry = {
+            'id': None, 'university_id': uni_id, 'category': category,
+            'is_locked': False, 'locked_at': None, 'summary': summary
+        }
+        self.shortlist[uni_id] = entry
+        self.new_shortlist.append(entry)
+        self.taken.append(summary)
+
+    # ------------------------------------------------------------
+    # TOOL: lock_university
+    # ------------------------------------------------------------
+    def lock_university(self, params: dict):
+        uni_id = _as_id(params.get('university_id'))
+        if uni_id is None:
+            return self.block('lock_university', f"Invalid university_id: {params.get('university_id')!r}")
+
+        if self.stage == UserStage.ONBOARDING:
+            return self.block('lock_university', 'Complete onboarding first')
+        entry = self.shortlist.get(uni_id)
+        if entry is None:
+            return self.block('lock_university', 'University not in shortlist. Add to shortlist first.')
+        if entry['is_locked']:
+            return self.block('lock_university', 'Already locked')
+
+        self.set_lock(entry, True)
+        previous_stage = self.stage.value
+        self.stage = UserStage.APPLICATION
+
+        name = self.university_name(uni_id, 'Unknown')
+        templates = _lock_task_templates(name)
+        for title, priority in templates:
+            self.new_tasks.append({'title': title, 'priority': priority, 'shortlist': entry})
+
+        self.taken.append({
+            'type': 'lock_university',
+            'university_id': uni_id,
+            'university_name': name,
+            'stage_changed': True,
+            'previous_stage': previous_stage,
+            'new_stage': 'APPLICATION',
+            'tasks_created': len(templates),
+            'confirmed': True
+        })
+
+    # ------------------------------------------------------------
+    # TOOL: unlock_university
+    # ------------------------------------------------------------
+    def unlock_university(self, params: dict):
+        uni_id = _as_id(params.get('university_id'))
+        if uni_id is None:
+            return self.block('unlock_university', f"Invalid university_id: {params.get('university_id')!r}")
+
+        entry = self.shortlist.get(uni_id)
+        if entry is None:
+            return self.block('unlock_university', 'University not in shortlist')
+        if not entry['is_locked']:
+            return self.block('unlock_university', 'University is not locked')
+
+        self.set_lock(entry, False)
+
+        # Delete associated tasks, including ones a lock earlier in this reply would create
+        existing = [t['id'] for t in self.tasks.values() if entry['id'] is not None and t['shortlist_id'] == entry['id']]
+        for task_id in existing:
+            del self.tasks[task_id]
+            self.task_updates.pop(task_id, None)
+        self.deleted_task_ids.extend(existing)
+        pending = [t for t in self.new_tasks if t.get('shortlist') is entry]
+        self.new_tasks = [t for t in self.new_tasks if t.get('shortlist') is not entry]
+
+        stage_regressed = not any(s['is_locked'] for s in self.shortlist.values() if s is not entry)
+        if stage_regressed:
+            self.stage = UserStage.DISCOVERY
+
+        self.taken.append({
+            'type': 'unlock_university',
+            'university_id': uni_id,
+            'university_name': self.university_name(uni_id, 'Unknown'),
+            'tasks_deleted': len(existing) + len(pending),
+            'stage_regressed': stage_regressed,
+            'new_stage': self.stage.value,
+            'confirmed': True
+        })
+
+    # ------------------------------------------------------------
+    # TOOL: create_task
+    # ------------------------------------------------------------
+    def create_task(self, params: dict):
+        if self.stage != UserStage.APPLICATION:
+            return self.block('create_task', 'Tasks can only be created in APPLICATION stage')
+
+        title = params.get('title', 'New Task')
+        summary = {'type': 'create_task', 'task_id': None, 'title': title, 'confirmed': True}
+        self.new_tasks.append({
+            'title': title,
+            'description': params.get('description'),
+            'priority': params.get('priority', 1),
+            'summary': summary
+        })
+        self.taken.append(summary)
+
+    # ------------------------------------------------------------
+    # TOOL: update_task
+    # ------------------------------------------------------------
+    def update_task(self, params: dict):
+        task_id = params.get('task_id')
+        new_status = params.get('status', 'IN_PROGRESS')
+
+        if task_id not in self.tasks:
+            return self.block('update_task', 'Task not found')
+        try:
+            status = TaskStatus(new_status)
+        except ValueError:
+            return self.block('update_task', f'Invalid status: {new_status}')
+        self.task_updates[task_id] = {'id': task_id, 'status': status}
+        self.taken.append({'type': 'update_task', 'task_id': task_id, 'new_status': new_status, 'confirmed': True})
+
+    def apply(self, db: Session):
+        """Write the planned changes as bulk statements and commit them together."""
+        if self.new_shortlist:
+            # RETURNING order is not guaranteed for a multi-row insert, so match rows by university
+            returned = db.execute(
+                insert(ShortlistedUniversity).returning(ShortlistedUniversity.id, ShortlistedUniversity.university_id),
+                [
+                    {
+                        'user_id': self.user.id,
+                        'university_id': e['university_id'],
+                        'category': UniversityCategory[e['category']],
+                        'is_locked': e['is_locked'],
+                        'locked_at': e['locked_at'],
+                    }
+                    for e in self.new_shortlist
+                ]
+            ).all()
+            ids = {row.university_id: row.id for row in returned}
+            for entry in self.new_shortlist:
+                entry['id'] = ids[entry['university_id']]
+                entry['summary']['shortlist_id'] = entry['id']
+        if self.shortlist_updates:
+            db.execute(update(ShortlistedUniversity), list(self.shortlist_updates.values()))
+        if self.task_updates:
+            db.execute(update(Task), list(self.task_updates.values()))
+        if self.deleted_task_ids:
+            db.execute(
+                delete(Task).where(Task.id.in_(self.deleted_task_ids)).execution_options(synchronize_session=False)
+            )
+        if self.new_tasks:
+            rows = [
+                {
+                    'user_id': self.user.id,
+                    'shortlisted_university_id': t['shortlist']['id'] if 'shortlist' in t else None,
+                    'title': t['title'],
+                    'description': t.get('description'),
+                    'priority': t['priority'],
+                    'status': TaskStatus.PENDING,
+                }
+                for t in self.new_tasks
+            ]
+            returned = db.execute(
+                insert(Task).returning(Task.id, Task.shortlisted_university_id, Task.title), rows
+            ).all()
+            # RETURNING order is not guaranteed either; tasks with the same title and
+            # university are interchangeable, so any of their ids will do
+            ids: Dict[tuple, list] = {}
+            for row in returned:
+                ids.setdefault((row.shortlisted_university_id, row.title), []).append(row.id)
+            for task, values in zip(self.new_tasks, rows):
+                new_id = ids[(values['shortlisted_university_id'], values['title'])].pop()
+                if 'summary' in task:
+                    task['summary']['task_id'] = new_id
+        self.user.current_stage = self.stage
+        db.commit()
+
+
+HANDLERS = {
+    'shortlist_university': _ActionPlan.shortlist_university,
+    'lock_university': _ActionPlan.lock_university,
+    'unlock_university': _ActionPlan.unlock_university,
+    'create_task': _ActionPlan.create_task,
+    'update_task': _ActionPlan.update_task,
+}
+
+
+def execute_chat_actions(db: Session, current_user: User, actions: list) -> Optional[dict]:
+    """
+    Execute the counsellor's tool calls and commit them.
+
+    Returns the action summary stored on the assistant message
+    ({"executed", "blocked", "final_stage"}), or None when the response
+    carried no actions.
+    """
+    if not actions:
+        return None
+
+    plan = _ActionPlan(db, current_user)
+    for action in actions:
+        handler = HANDLERS.get(action.get('type'))
+        if handler is not None:
+            handler(plan, action.get('params') or {})
+    plan.apply(db)
+
+    if not (plan.taken or plan.blocked):
+        return None
+    return {
+        'executed': plan.taken,
+        'blocked': plan.blocked,
+        'final_stage': current_user.current_stage.value
+    }
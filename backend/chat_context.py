@@ -0,0 +1,132 @@
+"""
+Per-turn user context for the counsellor (text and voice chat).
+
+A turn needs the user's profile, shortlist, tasks and recent history on top
+of the catalog. They are loaded in a fixed number of queries however large
+the shortlist or task list grows:
+
+- `load_profile` and `load_previous_intent`: one query each (run first, so
+  intent detection can start)
+- `load_chat_context`: shortlist, tasks, the session's rolling summary and
+  history, one query each; shortlisted universities come from the catalog
+  snapshot, not the database
+
+Everything is returned as plain dicts, so the counsellor never touches ORM
+state (or triggers lazy loads) while building its prompt.
+
+The history is every message the session's summary does not cover yet: at
+least the caller's `history_limit`, plus up to SUMMARY_BATCH_MESSAGES that
+pile up before conversation_summary folds them. Each message is therefore
+either in the summary or in the prompt verbatim.
+
+Configuration:
+- CHAT_SUMMARY_BATCH_MESSAGES: messages allowed to pile up beyond the history
+  limit before they are folded into the summary (default 6)
+"""
+
+import os
+import logging
+from typing import List, NamedTuple, Optional
+
+from sqlalchemy.orm import Session
+
+from catalog import catalog
+from models import ChatMessage, ChatSession, ShortlistedUniversity, Task, UserProfile
+
+logger = logging.getLogger(__name__)
+
+# Previous messages always shown to the counsellor verbatim
+HISTORY_LIMIT = 5
+SUMMARY_BATCH_MESSAGES = max(1, int(os.environ.get("CHAT_SUMMARY_BATCH_MESSAGES", "6")))
+
+
+def history_window(history_limit: int) -> int:
+    """Most messages shown for `history_limit`: the limit plus an unfolded batch."""
+    return history_limit + SUMMARY_BATCH_MESSAGES
+
+
+class ChatContext(NamedTuple):
+    universities: List[dict]
+    shortlisted: List[dict]
+    tasks: List[dict]
+    history: List[dict]
+    summary: Optional[str] = None
+
+
+def _columns(obj) -> dict:
+    return {attr.key: getattr(obj, attr.key) for attr in obj.__mapper__.column_attrs}
+
+
+def load_profile(db: Session, user_id: int) -> dict:
+    profile = db.query(UserProfile).filter(UserProfile.user_id == user_id).first()
+    return _columns(profile) if profile else {}
+
+
+def load_previous_intent(db: Session, session_id: Optional[int], before_message_id: Optional[int] = None) -> Optional[dict]:
+    """Intent state stored on the session's latest user message that has one (before `before_message_id`)."""
+    if not session_id:
+        return None
+    query = db.query(ChatMessage.intent).filter(
+        ChatMessage.session_id == session_id, ChatMessage.role == "user", ChatMessage.intent.isnot(None)
+    )
+    if before_message_id is not None:
+        query = query.filter(ChatMessage.id < before_message_id)
+    row = query.order_by(ChatMessage.id.desc()).first()
+    return row.intent if row else None
+
+
+def load_chat_context(
+    db: Session,
+    user_id: int,
+    session_id: Optional[int],
+    current_message_id: Optional[int] = None,
+    history_limit: int = HISTORY_LIMIT
+) -> ChatContext:
+    """
+    Catalog, shortlist, tasks, the session's rolling summary and the messages
+    it does not cover yet, at most `history_window(history_limit)` (oldest
+    first, without the message being answered).
+
+    Pure DB/serialization work; the chat endpoint runs it in a worker thread
+    while intent detection is in flight.
+    """
+    snapshot = catalog.get(db)
+    shortlisted = db.query(ShortlistedUniversity).filter(
+        ShortlistedUniversity.user_id == user_id
+    ).all()
+    tasks = db.query(Task).filter(Task.user_id == user_id).all()
+
+    shortlist_data = [
+        {
+            'id': s.id,
+            'university_id': s.university_id,
+            'university': snapshot.get(s.university_id) or {},
+            'category': s.category.value if s.category else None,
+            'is_locked': s.is_locked
+        }
+        for s in shortlisted
+    ]
+    task_list = [{'id': t.id, 'title': t.title, 'status': t.status.value} for t in tasks]
+
+    recent_history = []
+    summary = None
+    if session_id:
+        session = db.query(ChatSession.summary, ChatSession.summary_message_id).filter(
+            ChatSession.id == session_id
+        ).first()
+        query = db.query(ChatMessage).filter(ChatMessage.session_id == session_id)
+        if session is not None and session.summary_message_id is not None:
+            summary = session.summary
+            query = query.filter(ChatMessage.id > session.summary_message_id)
+        if current_message_id is not None:
+            query = query.filter(ChatMessage.id != current_message_id)
+        history_msgs = query.order_by(
+            ChatMessage.created_at.desc(), ChatMessage.id.desc()
+        ).limit(history_window(history_limit)).all()
+        recent_history = [
+            {"role": m.role, "content": m.content, "intent": m.intent, "created_at": str(m.created_at)}
+            for m in reversed(history_msgs)
+        ]
+        logger.debug(f"Loaded {len(recent_history)} history messages for session {session_id}")
+
+    return ChatContext(list(snapshot.universities), shortlist_data, task_list, recent_history, summary)
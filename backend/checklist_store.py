@@ -0,0 +1,213 @@
+"""
+Persistent store for generated application checklists.
+
+A checklist only depends on the target (university, country, degree level),
+so it is generated once and reused by every user who locks that university.
+Rows carry the CHECKLIST_VERSION they were generated with and an expiry, so
+bumping the version (e.g. after editing CHECKLIST_SYSTEM_PROMPT) or letting
+the TTL lapse makes the next lock regenerate.
+
+Locking creates the tasks straight from a fresh row; otherwise it inserts
+placeholder tasks right away and queues a CHECKLIST_JOB, and
+run_checklist_job swaps the placeholders for the generated checklist.
+
+Configuration:
+- CHECKLIST_CACHE_TTL_DAYS: how long a generated checklist stays fresh (default 30)
+"""
+
+import os
+import re
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Iterable, Optional
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ai_counsellor import generate_application_checklist
+from metrics import metrics
+from models import ChecklistCache, ShortlistedUniversity, Task, TaskStatus, University
+
+logger = logging.getLogger(__name__)
+
+# Bump when the checklist prompt or item format changes
+CHECKLIST_VERSION = 1
+CHECKLIST_TTL = timedelta(days=int(os.environ.get("CHECKLIST_CACHE_TTL_DAYS", "30")))
+DEFAULT_DEGREE_LEVEL = "Master's"
+DEFAULT_WARM_CONCURRENCY = 4
+CHECKLIST_JOB = "checklist"
+
+
+def normalize_degree_level(degree_level: Optional[str]) -> str:
+    """Collapse spellings like "Masters", "MASTERS" and "Master's" to one key."""
+    return re.sub(r"[^a-z]", "", (degree_level or DEFAULT_DEGREE_LEVEL).lower())
+
+
+def _as_utc(value: datetime) -> datetime:
+    # Postgres returns aware datetimes for the timezone-aware column, SQLite naive UTC ones
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def get_cached_checklist(db: Session, university_id: int, country: str, degree_level: Optional[str]) -> Optional[list]:
+    """Items of a fresh, current-version checklist for the target, or None."""
+    row = db.query(ChecklistCache).filter(
+        ChecklistCache.university_id == university_id,
+        ChecklistCache.country == country,
+        ChecklistCache.degree_level == normalize_degree_level(degree_level)
+    ).first()
+    if row is None or row.version != CHECKLIST_VERSION or _as_utc(row.expires_at) <= datetime.now(timezone.utc):
+        return None
+    return row.items
+
+
+def save_checklist(db: Session, university_id: int, country: str, degree_level: str, items: list):
+    """
+    Insert or refresh the checklist row for the target; the caller commits.
+
+    The write runs in a savepoint, so losing an insert race to another worker
+    leaves the caller's other pending changes intact.
+    """
+    level = normalize_degree_level(degree_level)
+    now = datetime.now(timezone.utc)
+    values = {"items": items, "version": CHECKLIST_VERSION, "generated_at": now, "expires_at": now + CHECKLIST_TTL}
+
+    try:
+        with db.begin_nested():
+            row = db.query(ChecklistCache).filter(
+                ChecklistCache.university_id == university_id,
+                ChecklistCache.country == country,
+                ChecklistCache.degree_level == level
+            ).first()
+            if row is None:
+                db.add(ChecklistCache(university_id=university_id, country=country, degree_level=level, **values))
+            else:
+                for field, value in values.items():
+                    setattr(row, field, value)
+    except IntegrityError:
+        # Another worker stored the same target first; its checklist is just as good
+        logger.info(f"Checklist for university {university_id} ({level}) was stored concurrently")
+
+
+async def get_or_generate_checklist(db: Session, university: University, degree_level: Optional[str] = None) -> list:
+    """
+    Checklist for locking `university`, read from the store when fresh.
+
+    On a miss the checklist is generated and added to `db` for the caller to
+    commit. Failed generations return [] and are not stored, so the next lock
+    tries again.
+    """
+    degree_level = degree_level or DEFAULT_DEGREE_LEVEL
+    cached = get_cached_checklist(db, university.id, university.country, degree_level)
+    if cached is not None:
+        metrics.inc("checklist_store.hit")
+        return cached
+
+    metrics.inc("checklist_store.miss")
+    items = await generate_application_checklist(
+        university_name=university.name,
+        country=university.country,
+        program_name=degree_level
+    )
+    if items:
+        save_checklist(db, university.id, university.country, degree_level, items)
+    return items
+
+
+async def warm_checklists(
+    session_factory: Callable[[], Session],
+    university_names: Iterable[str],
+    degree_level: str = DEFAULT_DEGREE_LEVEL,
+    concurrency: int = DEFAULT_WARM_CONCURRENCY,
+    force: bool = False
+) -> dict:
+    """
+    Pre-generate checklists for the named universities, at most `concurrency`
+    LLM calls at a time. Fresh rows are skipped unless `force` is set.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    summary = {"generated": 0, "skipped": 0, "failed": 0, "missing": []}
+
+    async def warm_one(name: str):
+        # Take the slot before opening a session so idle tasks don't hold pool connections
+        async with semaphore:
+            db = session_factory()
+            try:
+                university = db.query(University).filter(University.name == name).first()
+                if university is None:
+                    summary["missing"].append(name)
+                    return
+                if not force and get_cached_checklist(db, university.id, university.country, degree_level) is not None:
+                    summary["skipped"] += 1
+                    return
+                items = await generate_application_checklist(
+                    university_name=university.name,
+                    country=university.country,
+                    program_name=degree_level
+                )
+                if not items:
+                    logger.warning(f"Checklist warm-up failed for {name}")
+                    summary["failed"] += 1
+                    return
+                save_checklist(db, university.id, university.country, degree_level, items)
+                db.commit()
+                summary["generated"] += 1
+            finally:
+                db.close()
+
+    await asyncio.gather(*(warm_one(name) for name in university_names))
+    return summary
+
+
+def build_placeholder_tasks(user_id: int, shortlist_id: int, university_name: str) -> list:
+    """Generic tasks shown until the generated checklist replaces them."""
+    return [
+        Task(user_id=user_id, shortlisted_university_id=shortlist_id,
+             title=f"Research {university_name} admission requirements", priority=1),
+        Task(user_id=user_id, shortlisted_university_id=shortlist_id,
+             title=f"Prepare SOP for {university_name}", priority=2),
+        Task(user_id=user_id, shortlisted_university_id=shortlist_id,
+             title=f"Gather required documents for {university_name}", priority=3),
+        Task(user_id=user_id, shortlisted_university_id=shortlist_id,
+             title=f"Check application deadline for {university_name}", priority=1),
+    ]
+
+
+def build_checklist_tasks(user_id: int, shortlist_id: int, items: list) -> list:
+    """Tasks for the items of a checklist."""
+    return [
+        Task(user_id=user_id, shortlisted_university_id=shortlist_id,
+             title=item.get("title", "Application Task"),
+             description=item.get("description", ""),
+             priority=item.get("priority", 2))
+        for item in items
+    ]
+
+
+async def run_checklist_job(db: Session, payload: dict) -> dict:
+    """
+    Replace a lock's placeholder tasks with its generated checklist.
+
+    Placeholders the user already started are kept. If none of the
+    placeholders exist any more, the university was unlocked since, and the
+    job does nothing. Raises when generation fails so the job is retried;
+    once retries run out the placeholders simply stay.
+    """
+    placeholder_ids = payload.get("placeholder_task_ids") or []
+    placeholders = db.query(Task).filter(Task.id.in_(placeholder_ids)).all() if placeholder_ids else []
+    shortlist = db.get(ShortlistedUniversity, payload["shortlist_id"])
+    if not placeholders or shortlist is None or not shortlist.is_locked:
+        return {"skipped": "university no longer locked"}
+
+    university = db.get(University, shortlist.university_id)
+    items = await get_or_generate_checklist(db, university, payload.get("degree_level"))
+    if not items:
+        raise RuntimeError(f"No checklist generated for {university.name}")
+
+    replaced = 0
+    for task in placeholders:
+        if task.status == TaskStatus.PENDING:
+            db.delete(task)
+            replaced += 1
+    db.add_all(build_checklist_tasks(shortlist.user_id, shortlist.id, items))
+    return {"tasks_created": len(items), "placeholders_replaced": replaced}
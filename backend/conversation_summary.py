@@ -0,0 +1,133 @@
+"""
+Rolling per-session conversation summaries.
+
+The counsellor sees a session's summary plus its most recent messages, so
+its prompt stays the same size however long the session runs, without
+forgetting what was decided early on.
+
+After each assistant turn `schedule_summary` counts the messages the summary
+does not cover yet. Once the caller's history window (its history limit plus
+SUMMARY_BATCH_MESSAGES, see chat_context) is about to overflow it queues a
+SUMMARY_JOB, and run_summary_job folds everything but the latest
+`keep_recent` messages (that history limit) into chat_sessions.summary, off
+the request path. The fold is queued one exchange early, so the window still
+covers the next turn while the job runs: no message falls between the summary
+and the history. Batching keeps it to one summarizer call every few turns.
+
+Without API keys nothing can be summarized; no job is queued and the
+history window stays as it is.
+"""
+
+import logging
+from typing import Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from ai_counsellor import summarize_conversation
+from chat_context import HISTORY_LIMIT, history_window
+from gemini_key_manager import key_manager
+from job_queue import job_pool
+from metrics import metrics
+from models import BackgroundJob, ChatMessage, ChatSession, JobStatus
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_JOB = "conversation_summary"
+# Messages folded per summarizer call when catching up on a long backlog
+SUMMARY_CHUNK_MESSAGES = 40
+
+
+def unsummarized_count(db: Session, session_id: int) -> int:
+    """Messages of the session newer than its summary."""
+    cursor = select(ChatSession.summary_message_id).where(ChatSession.id == session_id).scalar_subquery()
+    return db.query(func.count(ChatMessage.id)).filter(
+        ChatMessage.session_id == session_id,
+        ChatMessage.id > func.coalesce(cursor, 0)
+    ).scalar()
+
+
+def schedule_summary(db: Session, user_id: int, session_id: int, keep_recent: int = HISTORY_LIMIT) -> Optional[int]:
+    """
+    Queue a SUMMARY_JOB for the session if enough messages piled up and none
+    is already queued. `keep_recent` is the caller's history limit. Returns
+    the new job's id. Must run on the event loop.
+    """
+    if not key_manager.has_keys():
+        return None
+    # One exchange (user + assistant message) before the window overflows
+    if unsummarized_count(db, session_id) <= history_window(keep_recent) - 2:
+        return None
+
+    queued = db.query(BackgroundJob.payload).filter(
+        BackgroundJob.kind == SUMMARY_JOB,
+        BackgroundJob.user_id == user_id,
+        BackgroundJob.status.in_([JobStatus.PENDING, JobStatus.RUNNING])
+    ).all()
+    if any((row.payload or {}).get("session_id") == session_id for row in queued):
+        return None
+
+    job = job_pool.create_job(db, SUMMARY_JOB, {"session_id": session_id, "keep_recent": keep_recent}, user_id=user_id)
+    db.commit()
+    job_pool.enqueue(job.id)
+    return job.id
+
+
+async def run_summary_job(db: Session, payload: dict) -> dict:
+    """
+    Fold the session's messages, except the latest `keep_recent`, into its
+    summary.
+
+    A long backlog (e.g. a session from before summaries existed) is folded
+    in chunks of SUMMARY_CHUNK_MESSAGES. The summary only advances if no other
+    run moved it meanwhile. Raises when summarization fails so the job is
+    retried; until then the counsellor keeps using the previous summary.
+    Without API keys there is nothing to retry with, and the job is a no-op.
+    """
+    session_id = payload["session_id"]
+    keep_recent = max(1, payload.get("keep_recent", HISTORY_LIMIT))
+    if not key_manager.has_keys():
+        return {"skipped": "no API keys configured"}
+    session = db.query(ChatSession.summary, ChatSession.summary_message_id).filter(
+        ChatSession.id == session_id
+    ).first()
+    if session is None:
+        return {"skipped": "session deleted"}
+
+    # Oldest message that stays out of the summary
+    boundary = db.query(ChatMessage.id).filter(ChatMessage.session_id == session_id).order_by(
+        ChatMessage.id.desc()
+    ).offset(keep_recent - 1).limit(1).scalar()
+    start = session.summary_message_id or 0
+    if boundary is None or boundary <= start:
+        return {"folded": 0}
+
+    messages = db.query(ChatMessage.id, ChatMessage.role, ChatMessage.content).filter(
+        ChatMessage.session_id == session_id,
+        ChatMessage.id > start,
+        ChatMessage.id < boundary
+    ).order_by(ChatMessage.id).all()
+    if not messages:
+        return {"folded": 0}
+
+    summary = session.summary
+    for i in range(0, len(messages), SUMMARY_CHUNK_MESSAGES):
+        chunk = messages[i:i + SUMMARY_CHUNK_MESSAGES]
+        summary = await summarize_conversation(
+            summary, [{"role": m.role, "content": m.content} for m in chunk]
+        )
+        if summary is None:
+            raise RuntimeError(f"No summary generated for chat session {session_id}")
+
+    result = db.execute(
+        update(ChatSession).where(
+            ChatSession.id == session_id,
+            ChatSession.summary_message_id.is_not_distinct_from(session.summary_message_id)
+        ).values(summary=summary, summary_message_id=messages[-1].id)
+    )
+    if result.rowcount == 0:
+        logger.info(f"Summary of chat session {session_id} advanced concurrently; dropping this one")
+        return {"folded": 0, "skipped": "summary advanced concurrently"}
+
+    metrics.inc("chat_summary.folded_messages", len(messages))
+    return {"folded": len(messages), "summary_message_id": messages[-1].id}
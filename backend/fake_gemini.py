@@ -0,0 +1,291 @@
+"""
+Deterministic stand-in for the Gemini API, for offline load testing.
+
+Set GEMINI_BACKEND=fake and GeminiKeyManager builds FakeGeminiClient objects
+instead of genai.Client, so the real request path runs unchanged. That path
+includes admission, key selection and cooldowns, retries on another key,
+prompt caching and streaming. Without configured keys, GEMINI_FAKE_KEYS
+synthetic keys are used so key rotation still has something to rotate.
+
+The prompt is recognised (intent routing, counsellor turn, SOP review,
+checklist, cold email, polish, conversation summary, transcription) and
+answered with JSON in the shape that caller expects. Reply text is derived
+from a hash of the prompt, so the same prompt always gets the same reply.
+
+Configuration:
+- GEMINI_FAKE_KEYS: synthetic keys when none are configured (default 3)
+- GEMINI_FAKE_LATENCY_MS: median call latency (default 300)
+- GEMINI_FAKE_LATENCY_SIGMA: log-normal spread of latency, 0 for fixed (default 0.3)
+- GEMINI_FAKE_QUOTA_RATE: share of calls failing with 429 RESOURCE_EXHAUSTED (default 0)
+- GEMINI_FAKE_ERROR_RATE: share of calls failing with a 500 (default 0)
+- GEMINI_FAKE_SEED: seed for latency and failure sampling (default 0)
+"""
+
+import os
+import re
+import json
+import random
+import asyncio
+import hashlib
+import threading
+from typing import Any, NamedTuple, Optional
+
+from llm_telemetry import content_chars
+from prompt_budget import CHARS_PER_TOKEN
+
+STREAM_CHUNK_CHARS = 24
+# Share of the latency spent before the first streamed chunk
+FIRST_CHUNK_SHARE = 0.4
+
+COUNSELLOR_OPENERS = [
+    "Here's where I'd focus next.",
+    "Good question - let's make this concrete.",
+    "Let's look at this from your profile's angle.",
+    "A few things stand out here.",
+]
+
+
+class FakeBackendConfig(NamedTuple):
+    latency_ms: float = 300.0
+    latency_sigma: float = 0.3
+    quota_rate: float = 0.0
+    error_rate: float = 0.0
+    seed: int = 0
+
+    @classmethod
+    def from_env(cls) -> "FakeBackendConfig":
+        return cls(
+            latency_ms=float(os.environ.get("GEMINI_FAKE_LATENCY_MS", "300")),
+            latency_sigma=float(os.environ.get("GEMINI_FAKE_LATENCY_SIGMA", "0.3")),
+            quota_rate=float(os.environ.get("GEMINI_FAKE_QUOTA_RATE", "0")),
+            error_rate=float(os.environ.get("GEMINI_FAKE_ERROR_RATE", "0")),
+            seed=int(os.environ.get("GEMINI_FAKE_SEED", "0")),
+        )
+
+
+class FakeAPIError(Exception):
+    """Raised like the SDK's API errors; the message carries the status the way callers check it."""
+
+    def __init__(self, code: int, status: str, message: str):
+        super().__init__(f"{code} {status}. {message}")
+        self.code = code
+        self.status = status
+
+
+class FakeUsage:
+    def __init__(self, prompt_tokens: int, response_tokens: int, cached_tokens: int = 0):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = response_tokens
+        self.cached_content_token_count = cached_tokens or None
+        self.total_token_count = prompt_tokens + response_tokens
+
+
+class FakeResponse:
+    def __init__(self, text: str, usage_metadata: Optional[FakeUsage] = None):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+class FakeBackend:
+    """Shared sampling state: one seeded RNG for latency and injected failures."""
+
+    def __init__(self, config: FakeBackendConfig):
+        self.config = config
+        self._rng = random.Random(config.seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.quota_errors = 0
+        self.errors = 0
+
+    def sample(self) -> tuple:
+        """(latency seconds, failure or None) for the next call."""
+        with self._lock:
+            self.calls += 1
+            latency = self.config.latency_ms / 1000
+            if self.config.latency_sigma > 0:
+                latency *= self._rng.lognormvariate(0, self.config.latency_sigma)
+            roll = self._rng.random()
+            if roll < self.config.quota_rate:
+                self.quota_errors += 1
+                return latency, FakeAPIError(429, "RESOURCE_EXHAUSTED", "Fake quota exceeded for this key.")
+            if roll < self.config.quota_rate + self.config.error_rate:
+                self.errors += 1
+                return latency, FakeAPIError(500, "INTERNAL", "Fake backend error.")
+            return latency, None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"calls": self.calls, "quota_errors": self.quota_errors, "errors": self.errors}
+
+
+def _prompt_text(contents: Any) -> str:
+    if isinstance(contents, str):
+        return contents
+    if isinstance(contents, (list, tuple)):
+        return "\n".join(part for part in contents if isinstance(part, str))
+    return ""
+
+
+def _has_binary_part(contents: Any) -> bool:
+    return isinstance(contents, (list, tuple)) and any(not isinstance(part, str) for part in contents)
+
+
+def _section(text: str, heading: str) -> str:
+    """First non-empty line after `heading` in a prompt."""
+    match = re.search(re.escape(heading) + r"\s*\n?(.*)", text)
+    return match.group(1).strip() if match else ""
+
+
+def _pick(digest: int, options: list):
+    return options[digest % len(options)]
+
+
+def reply_for(contents: Any, config: Any = None, cached_prefix: str = "") -> str:
+    """Schema-valid reply text for a prompt, chosen by recognising which caller sent it."""
+    text = _prompt_text(contents)
+    system = getattr(config, "system_instruction", None) or cached_prefix or ""
+    digest = int(hashlib.sha256((system + text).encode()).hexdigest()[:8], 16)
+
+    if _has_binary_part(contents) or "Transcribe the spoken words" in text:
+        return "What are my chances for a Masters in Computer Science in Germany?"
+
+    # Checked early: the folded messages may quote any of the markers below
+    if "running summary of a conversation" in text:
+        previous = _section(text, "## Summary So Far")
+        folded = text.count("\nStudent: ") + text.count("\nCounsellor: ")
+        summary = f"The student is exploring study-abroad options; {folded} more messages covered shortlisting and exams."
+        if previous and previous != "(none yet)":
+            summary = f"{previous[:1500]} {summary}"
+        return json.dumps({"summary": summary})
+
+    if "Intent Detection Router" in text:
+        # Imported lazily: recommendation_engine sits above llm_client in the import graph
+        from recommendation_engine import classify_intent_locally
+        message = _section(text, "User Message:")
+        intent, _ = classify_intent_locally(message)
+        return json.dumps(intent)
+
+    if "## Student SOP" in text:
+        return json.dumps({
+            "overall_score": 55 + digest % 40,
+            "strengths": ["Clear motivation for the chosen field", "Relevant project experience"],
+            "weaknesses": ["Career goals are vague", "Opening paragraph is generic"],
+            "grammar_mistakes": ["Inconsistent tense in the second paragraph"],
+            "improved_snippet": "My work on distributed systems taught me to reason about failure first.",
+            "ai_feedback": "A solid draft. Tie your projects to the program's research groups."
+        })
+
+    if "Checklist of application documents" in text:
+        country = _section(text, "Target Country:")
+        items = [
+            {"title": "Request official transcripts", "description": "Sealed copies from your university", "priority": 1},
+            {"title": "Finalize Statement of Purpose", "description": "Tailor it to the program", "priority": 1},
+            {"title": "Collect recommendation letters", "description": "Two academic referees", "priority": 2},
+            {"title": "Book English test", "description": "IELTS 7.0 or TOEFL 100", "priority": 2},
+            {"title": "Prepare financial documents", "description": "Proof of funds for the visa", "priority": 3},
+        ]
+        if country == "Germany":
+            items.append({"title": "Apply for APS Certificate", "description": "Required for Indian applicants", "priority": 1})
+        return json.dumps(items)
+
+    if '"polished_body"' in text:
+        draft = _section(text, "Original Draft:")
+        return json.dumps({
+            "polished_body": draft or "Dear Professor, I hope this message finds you well.",
+            "changes_made": ["Tightened the opening", "Made the request more specific"]
+        })
+
+    if '"subject_line"' in text:
+        professor = _section(text, "Target Professor:") or "Professor"
+        return json.dumps({
+            "subject_line": "Prospective research student - inquiry about your group",
+            "email_body": f"Dear {professor.split(' (')[0]},\n\nI have been following your recent work and would love to contribute.",
+            "tips": ["Mention one specific paper", "Keep it under 200 words"]
+        })
+
+    # Counsellor turns carry the system prompt out of band (inline or as cached content)
+    message = _section(text, "## User Message")
+    return json.dumps({
+        "intent": "UNIVERSITY_DISCOVERY",
+        "message": f"{_pick(digest, COUNSELLOR_OPENERS)} You asked: \"{message[:80]}\". "
+                   "Start by shortlisting two target and one safe university.",
+        "actions": [],
+        "suggested_universities": [],
+        "suggested_next_questions": ["What are my chances?", "Which exams do I need?"]
+    })
+
+
+def _usage(contents: Any, reply: str, cached_prefix: str) -> FakeUsage:
+    cached_tokens = len(cached_prefix) // CHARS_PER_TOKEN
+    prompt_tokens = content_chars(contents) // CHARS_PER_TOKEN + cached_tokens
+    return FakeUsage(prompt_tokens, len(reply) // CHARS_PER_TOKEN, cached_tokens)
+
+
+class FakeCaches:
+    """Cached-content handles, kept so later calls can see the cached system prompt."""
+
+    def __init__(self):
+        self.contents = {}
+
+    async def create(self, model: str, config: Any = None):
+        name = f"cachedContents/fake-{len(self.contents) + 1}"
+        self.contents[name] = getattr(config, "system_instruction", None) or ""
+        return type("CachedContent", (), {"name": name})()
+
+
+class FakeModels:
+    def __init__(self, backend: FakeBackend, caches: FakeCaches):
+        self.backend = backend
+        self.caches = caches
+
+    def _cached_prefix(self, config: Any) -> str:
+        name = getattr(config, "cached_content", None)
+        if name and name not in self.caches.contents:
+            raise FakeAPIError(404, "NOT_FOUND", f"Cached content {name} not found.")
+        return self.caches.contents.get(name, "")
+
+    async def generate_content(self, model: str, contents: Any, config: Any = None):
+        latency, failure = self.backend.sample()
+        await asyncio.sleep(latency)
+        if failure is not None:
+            raise failure
+        cached_prefix = self._cached_prefix(config)
+        reply = reply_for(contents, config, cached_prefix)
+        return FakeResponse(reply, _usage(contents, reply, cached_prefix))
+
+    async def generate_content_stream(self, model: str, contents: Any, config: Any = None):
+        latency, failure = self.backend.sample()
+        await asyncio.sleep(latency * FIRST_CHUNK_SHARE)
+        if failure is not None:
+            raise failure
+        cached_prefix = self._cached_prefix(config)
+        reply = reply_for(contents, config, cached_prefix)
+        chunks = [reply[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(reply), STREAM_CHUNK_CHARS)]
+        per_chunk = latency * (1 - FIRST_CHUNK_SHARE) / max(1, len(chunks))
+        for i, chunk in enumerate(chunks):
+            if i:
+                await asyncio.sleep(per_chunk)
+            last = i == len(chunks) - 1
+            yield FakeResponse(chunk, _usage(contents, reply, cached_prefix) if last else None)
+
+
+class FakeGeminiClient:
+    """Mimics the parts of `genai.Client` the backend uses (`client.aio.models` / `client.aio.caches`)."""
+
+    def __init__(self, backend: FakeBackend):
+        caches = FakeCaches()
+        models = FakeModels(backend, caches)
+        self.aio = type("FakeAsyncClient", (), {"models": models, "caches": caches})()
+
+
+_backend: Optional[FakeBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_fake_backend() -> FakeBackend:
+    """Process-wide fake backend, configured from the environment on first use."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = FakeBackend(FakeBackendConfig.from_env())
+        return _backend
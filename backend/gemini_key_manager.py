@@ -3,17 +3,69 @@ Gemini API Key Manager
 
 Manages a pool of Gemini API keys with random selection and retry support.
 Supports both GEMINI_API_KEYS (comma-separated) and single GEMINI_API_KEY for backward compatibility.
+
+Clients are long-lived: one `genai.Client` is created lazily per key and reused
+for every call, so the SDK's HTTP session (and its keep-alive connections) is
+shared instead of being rebuilt on each intent detection or chat turn.
+
+Each key also carries health state (recent quota errors, rolling latency and a
+cooldown deadline). Selection is weighted toward healthy, fast keys and skips
+keys that are cooling down after a 429 / RESOURCE_EXHAUSTED. Calls in flight
+are counted per key too: keys at GEMINI_MAX_IN_FLIGHT_PER_KEY are passed over
+while another key has room.
+
+With GEMINI_BACKEND=fake, clients come from `fake_gemini` instead of the SDK
+(see that module), for load testing without a network or real keys.
 """
 
 import os
+import time
 import random
 import logging
-from typing import Optional, Tuple, List
+import threading
+from collections import deque
+from typing import Dict, Optional, Tuple, List
 from google import genai
 
 
 logger = logging.getLogger(__name__)
 
+# Circuit breaker tuning
+KEY_COOLDOWN_SECONDS = float(os.environ.get("GEMINI_KEY_COOLDOWN_SECONDS", "30"))
+KEY_MAX_COOLDOWN_SECONDS = float(os.environ.get("GEMINI_KEY_MAX_COOLDOWN_SECONDS", "600"))
+QUOTA_WINDOW_SECONDS = 300
+LATENCY_SMOOTHING = 0.2
+DEFAULT_LATENCY_SECONDS = 2.0
+MAX_IN_FLIGHT_PER_KEY = max(1, int(os.environ.get("GEMINI_MAX_IN_FLIGHT_PER_KEY", "8")))
+
+
+class KeyHealth:
+    """Rolling health state for a single API key."""
+    
+    def __init__(self):
+        self.quota_events: deque = deque()
+        self.latency_ewma: Optional[float] = None
+        self.cooldown_until = 0.0
+        self.consecutive_quota_errors = 0
+        self.successes = 0
+        self.failures = 0
+        self.in_flight = 0
+    
+    def prune(self, now: float):
+        """Drop quota events that fell out of the rolling window."""
+        cutoff = now - QUOTA_WINDOW_SECONDS
+        while self.quota_events and self.quota_events[0] < cutoff:
+            self.quota_events.popleft()
+    
+    def in_cooldown(self, now: float) -> bool:
+        return now < self.cooldown_until
+    
+    def weight(self, now: float) -> float:
+        """Selection weight: faster, less busy keys with fewer recent 429s score higher."""
+        self.prune(now)
+        latency = self.latency_ewma or DEFAULT_LATENCY_SECONDS
+        return 1.0 / (max(latency, 0.05) * (1 + len(self.quota_events)) * (1 + self.in_flight))
+
 
 class GeminiKeyManager:
     """Manages a pool of Gemini API keys with random selection."""
@@ -50,8 +102,24 @@ class GeminiKeyManager:
                 else:
                     logger.warning("GeminiKeyManager: No API keys configured! Set GEMINI_API_KEYS or GEMINI_API_KEY")
         
+        self.backend = os.environ.get("GEMINI_BACKEND", "genai").strip().lower()
+        if self.backend == "fake" and not self.keys:
+            fake_keys = max(1, int(os.environ.get("GEMINI_FAKE_KEYS", "3")))
+            self.keys = [f"fake-key-{i + 1}" for i in range(fake_keys)]
+            logger.info(f"GeminiKeyManager: Using {fake_keys} synthetic keys for the fake backend")
+        
         self.model_name = "gemini-flash-latest"
         
+        # Pooled clients, one per key index, created on first use
+        self._clients: Dict[int, genai.Client] = {}
+        self._clients_lock = threading.Lock()
+        self.clients_created = 0
+        self.client_reuse_hits = 0
+        
+        # Per-key health, keyed by key index
+        self._health: Dict[int, KeyHealth] = {}
+        self._health_lock = threading.Lock()
+        
         # Log initialization summary
         print(f"[STARTUP] GeminiKeyManager initialized with {len(self.keys)} keys")
     
@@ -61,7 +129,10 @@ class GeminiKeyManager:
     
     def get_random_key(self, exclude_indices: Optional[List[int]] = None) -> Tuple[Optional[str], int]:
         """
-        Get a randomly selected API key.
+        Get an API key, weighted toward healthy and fast keys.
+        
+        Keys in cooldown after a quota error are skipped entirely, so callers
+        do not spend a round-trip on a key that is known to be exhausted.
         
         Args:
             exclude_indices: List of key indices to exclude from selection (for retry logic)
@@ -77,17 +148,140 @@ class GeminiKeyManager:
         if exclude_indices:
             available_indices = [i for i in available_indices if i not in exclude_indices]
         
-        if not available_indices:
-            # All keys exhausted, return None
-            return None, -1
+        now = time.monotonic()
+        with self._health_lock:
+            available_indices = [i for i in available_indices if not self._get_health(i).in_cooldown(now)]
+            
+            if not available_indices:
+                # All keys exhausted or cooling down, return None
+                return None, -1
+            
+            # Prefer keys with spare in-flight capacity; if all are full the caller queues on one
+            with_room = [i for i in available_indices if self._get_health(i).in_flight < MAX_IN_FLIGHT_PER_KEY]
+            available_indices = with_room or available_indices
+            
+            weights = [self._get_health(i).weight(now) for i in available_indices]
         
-        # Randomly select from available keys
-        key_index = random.choice(available_indices)
+        key_index = random.choices(available_indices, weights=weights)[0]
         return self.keys[key_index], key_index
     
+    def _get_health(self, key_index: int) -> KeyHealth:
+        health = self._health.get(key_index)
+        if health is None:
+            health = KeyHealth()
+            self._health[key_index] = health
+        return health
+    
+    def call_started(self, key_index: int):
+        if key_index < 0:
+            return
+        with self._health_lock:
+            self._get_health(key_index).in_flight += 1
+    
+    def call_finished(self, key_index: int):
+        if key_index < 0:
+            return
+        with self._health_lock:
+            health = self._get_health(key_index)
+            health.in_flight = max(0, health.in_flight - 1)
+    
+    def record_success(self, key_index: int, latency_seconds: float):
+        """Record a successful call and fold its latency into the rolling average."""
+        if key_index < 0:
+            return
+        with self._health_lock:
+            health = self._get_health(key_index)
+            health.successes += 1
+            health.consecutive_quota_errors = 0
+            if health.latency_ewma is None:
+                health.latency_ewma = latency_seconds
+            else:
+                health.latency_ewma += LATENCY_SMOOTHING * (latency_seconds - health.latency_ewma)
+    
+    def record_quota_error(self, key_index: int):
+        """Record a 429 / RESOURCE_EXHAUSTED and put the key into exponential cooldown."""
+        if key_index < 0:
+            return
+        now = time.monotonic()
+        with self._health_lock:
+            health = self._get_health(key_index)
+            health.failures += 1
+            health.consecutive_quota_errors += 1
+            health.quota_events.append(now)
+            cooldown = min(
+                KEY_COOLDOWN_SECONDS * (2 ** (health.consecutive_quota_errors - 1)),
+                KEY_MAX_COOLDOWN_SECONDS
+            )
+            health.cooldown_until = now + cooldown
+        logger.warning(f"Gemini key #{key_index + 1} cooling down for {cooldown:.0f}s after quota error")
+    
+    def record_error(self, key_index: int):
+        """Record a non-quota failure (does not trigger cooldown)."""
+        if key_index < 0:
+            return
+        with self._health_lock:
+            self._get_health(key_index).failures += 1
+    
+    def get_health(self) -> List[dict]:
+        """Per-key health snapshot for the metrics endpoint (no key material)."""
+        now = time.monotonic()
+        snapshot = []
+        with self._health_lock:
+            for i in range(len(self.keys)):
+                health = self._get_health(i)
+                health.prune(now)
+                snapshot.append({
+                    "key": f"#{i + 1}",
+                    "state": "cooldown" if health.in_cooldown(now) else "healthy",
+                    "cooldown_remaining_seconds": round(max(0.0, health.cooldown_until - now), 1),
+                    "recent_quota_errors": len(health.quota_events),
+                    "in_flight": health.in_flight,
+                    "latency_ms": round(health.latency_ewma * 1000) if health.latency_ewma is not None else None,
+                    "successes": health.successes,
+                    "failures": health.failures,
+                })
+        return snapshot
+    
+    def _build_client(self, api_key: str) -> genai.Client:
+        """Construct a new SDK client for the given key."""
+        if self.backend == "fake":
+            from fake_gemini import FakeGeminiClient, get_fake_backend
+            return FakeGeminiClient(get_fake_backend())
+        if self.use_replit:
+            return genai.Client(
+                api_key=api_key,
+                http_options={
+                    'api_version': '',
+                    'base_url': self.replit_base_url
+                }
+            )
+        return genai.Client(api_key=api_key)
+    
+    def get_client(self, key_index: int) -> genai.Client:
+        """
+        Get the pooled client for a key, creating it on first use.
+        
+        Args:
+            key_index: Index of the key in `self.keys`
+        
+        Returns:
+            The long-lived client bound to that key.
+        """
+        with self._clients_lock:
+            client = self._clients.get(key_index)
+            if client is not None:
+                self.client_reuse_hits += 1
+                return client
+            
+            client = self._build_client(self.keys[key_index])
+            self._clients[key_index] = client
+            self.clients_created += 1
+            logger.info(f"Created pooled Gemini client for key #{key_index + 1}")
+            return client
+    
     def create_client(self, exclude_indices: Optional[List[int]] = None) -> Tuple[Optional[genai.Client], int]:
         """
-        Create a Gemini client with a randomly selected API key.
+        Get a pooled Gemini client for a randomly selected API key.
         
         Args:
             exclude_indices: List of key indices to exclude from selection
@@ -103,18 +297,39 @@ class GeminiKeyManager:
         # Log key index (NOT the actual key for security)
         logger.info(f"Using Gemini API key #{key_index + 1} of {len(self.keys)}")
         
-        if self.use_replit:
-            client = genai.Client(
-                api_key=api_key,
-                http_options={
-                    'api_version': '',
-                    'base_url': self.replit_base_url
-                }
-            )
-        else:
-            client = genai.Client(api_key=api_key)
+        return self.get_client(key_index), key_index
+    
+    def get_stats(self) -> dict:
+        """Connection pool counters for the metrics endpoint."""
+        with self._clients_lock:
+            return {
+                "backend": self.backend,
+                "keys": len(self.keys),
+                "pooled_clients": len(self._clients),
+                "clients_created": self.clients_created,
+                "client_reuse_hits": self.client_reuse_hits,
+            }
+    
+    async def aclose(self):
+        """Close all pooled clients (called from the FastAPI lifespan on shutdown)."""
+        with self._clients_lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        
+        for client in clients:
+            # Older SDK releases open a session per request and expose no close hooks
+            try:
+                aio_close = getattr(client.aio, "aclose", None)
+                if aio_close is not None:
+                    await aio_close()
+                close = getattr(client, "close", None)
+                if close is not None:
+                    close()
+            except Exception as e:
+                logger.warning(f"Error closing Gemini client: {e}")
         
-        return client, key_index
+        if clients:
+            logger.info(f"Closed {len(clients)} pooled Gemini clients")
     
     def get_model_name(self) -> str:
         """Get the model name to use."""
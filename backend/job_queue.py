@@ -0,0 +1,185 @@
+"""
+In-process background job queue.
+
+Jobs are rows in background_jobs, so none are lost on restart: when the pool
+starts it re-queues every PENDING job and every RUNNING job the previous
+process was in the middle of. Handlers are async functions registered per
+job kind. A handler that raises uses up one attempt; the job is retried with
+exponential backoff until JOB_MAX_ATTEMPTS is reached and then marked FAILED.
+
+A handler gets its own session and returns a JSON-serializable result. Its
+changes are committed together with the COMPLETED status, so a job's effects
+and its completion are visible at the same time.
+
+Configuration:
+- JOB_WORKERS: concurrent workers per process (default 4)
+- JOB_MAX_ATTEMPTS: attempts before a job is marked FAILED (default 3)
+- JOB_RETRY_DELAY_SECONDS: backoff before the first retry (default 2)
+"""
+
+import os
+import time
+import asyncio
+import logging
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from metrics import metrics
+from models import BackgroundJob, JobStatus
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[Session, dict], Awaitable[Optional[dict]]]
+
+
+class JobWorkerPool:
+    """Bounded pool of asyncio workers draining persisted background jobs."""
+
+    def __init__(self, session_factory: Callable[[], Session], size: int, max_attempts: int, retry_delay_seconds: float):
+        self.session_factory = session_factory
+        self.size = max(1, size)
+        self.max_attempts = max(1, max_attempts)
+        self.retry_delay_seconds = retry_delay_seconds
+        self.handlers: Dict[str, JobHandler] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._retries: Set[asyncio.Task] = set()
+
+    def register(self, kind: str, handler: JobHandler):
+        self.handlers[kind] = handler
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    def create_job(self, db: Session, kind: str, payload: dict, user_id: int = None) -> BackgroundJob:
+        """Add a PENDING job to `db`. Enqueue it only after the caller commits."""
+        job = BackgroundJob(user_id=user_id, kind=kind, payload=payload, status=JobStatus.PENDING, attempts=0)
+        db.add(job)
+        db.flush()
+        return job
+
+    def enqueue(self, job_id: int):
+        """Hand a committed job to the workers. Without a running pool it waits for the next start()."""
+        if self._queue is not None:
+            self._queue.put_nowait(job_id)
+
+    async def start(self) -> int:
+        """Spawn the workers and re-queue unfinished jobs. Returns how many were recovered."""
+        if self.running:
+            return 0
+        self._queue = asyncio.Queue()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.size)]
+        recovered = self.recover()
+        if recovered:
+            logger.info(f"Recovered {recovered} unfinished background jobs")
+        return recovered
+
+    def recover(self) -> int:
+        db = self.session_factory()
+        try:
+            jobs = db.query(BackgroundJob).filter(
+                BackgroundJob.status.in_([JobStatus.PENDING, JobStatus.RUNNING])
+            ).order_by(BackgroundJob.id).all()
+            for job in jobs:
+                # A RUNNING job here was interrupted by a restart; its attempt already counted
+                job.status = JobStatus.PENDING
+            db.commit()
+            job_ids = [job.id for job in jobs]
+        finally:
+            db.close()
+        for job_id in job_ids:
+            self.enqueue(job_id)
+        return len(job_ids)
+
+    async def stop(self):
+        for task in [*self._workers, *self._retries]:
+            task.cancel()
+        await asyncio.gather(*self._workers, *self._retries, return_exceptions=True)
+        self._workers = []
+        self._retries.clear()
+        self._queue = None
+
+    async def run_job(self, job_id: int) -> Optional[JobStatus]:
+        """Run one attempt of a job and record the outcome. Returns the new status."""
+        db = self.session_factory()
+        try:
+            job = db.get(BackgroundJob, job_id)
+            if job is None or job.status not in (JobStatus.PENDING, JobStatus.RUNNING):
+                return job.status if job else None
+            handler = self.handlers.get(job.kind)
+            job.status = JobStatus.RUNNING
+            job.attempts += 1
+            db.commit()
+
+            started = time.perf_counter()
+            try:
+                if handler is None:
+                    raise LookupError(f"No handler registered for job kind '{job.kind}'")
+                result = await handler(db, dict(job.payload or {}))
+            except Exception as e:
+                db.rollback()
+                return self._record_failure(db, job, e)
+
+            job.status = JobStatus.COMPLETED
+            job.result = result
+            job.error = None
+            job.completed_at = datetime.utcnow()
+            db.commit()
+            metrics.inc(f"jobs.{job.kind}.completed")
+            metrics.observe(f"jobs.{job.kind}.duration_ms", (time.perf_counter() - started) * 1000)
+            return job.status
+        finally:
+            db.close()
+
+    def _record_failure(self, db: Session, job: BackgroundJob, error: Exception) -> JobStatus:
+        job.error = str(error)[:500]
+        if job.attempts >= self.max_attempts:
+            job.status = JobStatus.FAILED
+            job.completed_at = datetime.utcnow()
+            metrics.inc(f"jobs.{job.kind}.failed")
+            logger.error(f"Job {job.id} ({job.kind}) failed after {job.attempts} attempts: {job.error}")
+        else:
+            job.status = JobStatus.PENDING
+            metrics.inc(f"jobs.{job.kind}.retried")
+            logger.warning(f"Job {job.id} ({job.kind}) attempt {job.attempts} failed, retrying: {job.error}")
+        db.commit()
+        if job.status == JobStatus.PENDING and self.running:
+            delay = self.retry_delay_seconds * 2 ** (job.attempts - 1)
+            retry = asyncio.create_task(self._retry_later(job.id, delay))
+            self._retries.add(retry)
+            retry.add_done_callback(self._retries.discard)
+        return job.status
+
+    async def _retry_later(self, job_id: int, delay: float):
+        await asyncio.sleep(delay)
+        self.enqueue(job_id)
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self.run_job(job_id)
+            except Exception as e:
+                # Bookkeeping itself failed (e.g. DB unavailable); the job stays recoverable
+                logger.error(f"Background worker error on job {job_id}: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    def stats(self) -> dict:
+        return {
+            "workers": len(self._workers),
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "retries_scheduled": len(self._retries),
+        }
+
+
+job_pool = JobWorkerPool(
+    SessionLocal,
+    size=int(os.environ.get("JOB_WORKERS", "4")),
+    max_attempts=int(os.environ.get("JOB_MAX_ATTEMPTS", "3")),
+    retry_delay_seconds=float(os.environ.get("JOB_RETRY_DELAY_SECONDS", "2"))
+)
@@ -0,0 +1,321 @@
+"""
+Async Gemini call path.
+
+Every LLM call in the backend goes through `generate_content` so that the
+uvicorn event loop is never blocked by a model round-trip. Calls use the
+SDK's async surface (`client.aio`) and are capped by a process-wide
+concurrency limit, configurable via GEMINI_MAX_CONCURRENCY (default 16), and
+by a per-key limit (GEMINI_MAX_IN_FLIGHT_PER_KEY, default 8) so one key is
+never hit hard enough to trip its rate limit while others sit idle.
+Outcomes and latencies are reported back to the key manager's health tracking,
+and every call is recorded per call site by `llm_telemetry`. Creating a
+cached-content handle (`create_cached_content`) goes through the same path.
+
+`SingleFlight` coalesces concurrent identical requests (e.g. the same
+checklist prompt from several users locking one university) onto a single
+in-flight call.
+"""
+
+import os
+import copy
+import json
+import time
+import asyncio
+import inspect
+import logging
+import weakref
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from gemini_key_manager import MAX_IN_FLIGHT_PER_KEY, key_manager
+from llm_telemetry import LLMCall, apply_usage, content_chars, record as record_call
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONCURRENCY = 16
+
+
+def _read_max_concurrency() -> int:
+    try:
+        value = int(os.environ.get("GEMINI_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY))
+    except ValueError:
+        logger.warning("Invalid GEMINI_MAX_CONCURRENCY, falling back to %s", DEFAULT_MAX_CONCURRENCY)
+        value = DEFAULT_MAX_CONCURRENCY
+    return max(1, value)
+
+
+MAX_CONCURRENCY = _read_max_concurrency()
+
+# Semaphores are bound to the loop they are first used on, so keep one per loop
+# (tests and scripts may spin up several loops in the same process).
+_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+        _semaphores[loop] = semaphore
+    return semaphore
+
+
+_key_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[int, asyncio.Semaphore]]" = weakref.WeakKeyDictionary()
+
+
+@asynccontextmanager
+async def _key_slot(key_index: int):
+    """Hold one of the in-flight slots of key `key_index` (no-op without a key)."""
+    if key_index < 0:
+        yield
+        return
+    loop = asyncio.get_running_loop()
+    per_key = _key_semaphores.setdefault(loop, {})
+    semaphore = per_key.get(key_index)
+    if semaphore is None:
+        semaphore = per_key[key_index] = asyncio.Semaphore(MAX_IN_FLIGHT_PER_KEY)
+    async with semaphore:
+        key_manager.call_started(key_index)
+        try:
+            yield
+        finally:
+            key_manager.call_finished(key_index)
+
+
+def is_quota_error(error: Exception) -> bool:
+    """True for 429 / RESOURCE_EXHAUSTED / quota errors from the SDK."""
+    error_str = str(error)
+    return "429" in error_str or "RESOURCE_EXHAUSTED" in error_str or "quota" in error_str.lower()
+
+
+class KeysExhausted(RuntimeError):
+    """
+    No client to call with: `key_manager.create_client()` returned None
+    because every key is cooling down after quota errors. Worded as a 429 so
+    `is_quota_error` and the callers' quota handling treat it like one.
+    """
+
+    def __init__(self):
+        super().__init__("429 RESOURCE_EXHAUSTED: every Gemini API key is cooling down after quota errors")
+
+
+def _require_client(client, site: str):
+    if client is None:
+        metrics.inc(f"llm.{site}.keys_exhausted")
+        raise KeysExhausted()
+
+
+def _expects_json(config: Optional[Any]) -> bool:
+    return getattr(config, "response_mime_type", None) == "application/json"
+
+
+def _classify(call: LLMCall, error: Optional[Exception], text: Optional[str], expects_json: bool):
+    if error is not None:
+        call.outcome = "quota" if is_quota_error(error) else "error"
+        return
+    call.response_chars = len(text or "")
+    if expects_json:
+        try:
+            json.loads(text or "")
+        except ValueError:
+            call.outcome = "parse_error"
+
+
+async def generate_content(
+    client,
+    contents: Any,
+    config: Optional[Any] = None,
+    model: Optional[str] = None,
+    key_index: int = -1,
+    site: str = "other",
+    attempt: int = 1
+):
+    """
+    Run `generate_content` on the async client without blocking the event loop.
+
+    Args:
+        client: A client returned by `key_manager.create_client()`; None
+            (every key cooling down) raises KeysExhausted
+        contents: Prompt text or list of parts
+        config: Optional GenerateContentConfig
+        model: Model name override (defaults to the key manager's model)
+        key_index: Index of the key behind `client`, used for health tracking
+        site: Call site name for instrumentation (e.g. "intent", "counsellor")
+        attempt: 1-based attempt number when the caller retries on another key
+
+    Returns:
+        The SDK GenerateContentResponse.
+    """
+    _require_client(client, site)
+    model = model or key_manager.get_model_name()
+    call = LLMCall(site, model, key_index, attempt)
+    call.prompt_chars = content_chars(contents)
+    async with _get_semaphore(), _key_slot(key_index):
+        started = time.perf_counter()
+        response = None
+        error = None
+        try:
+            response = await client.aio.models.generate_content(
+                model=model,
+                contents=contents,
+                config=config
+            )
+        except Exception as e:
+            error = e
+            if is_quota_error(e):
+                key_manager.record_quota_error(key_index)
+            else:
+                key_manager.record_error(key_index)
+            raise
+        finally:
+            call.duration_ms = (time.perf_counter() - started) * 1000
+            if response is not None:
+                apply_usage(call, getattr(response, "usage_metadata", None))
+            _classify(call, error, response.text if response is not None else None, _expects_json(config))
+            record_call(call)
+        key_manager.record_success(key_index, time.perf_counter() - started)
+        return response
+
+
+async def generate_content_stream(
+    client,
+    contents: Any,
+    config: Optional[Any] = None,
+    model: Optional[str] = None,
+    key_index: int = -1,
+    site: str = "other",
+    attempt: int = 1
+):
+    """
+    Streaming counterpart of `generate_content`.
+    
+    Yields the text of each chunk as the model produces it. The concurrency
+    slots are held until the stream is exhausted or closed. A stream closed
+    early by the caller is recorded as a call with the text received so far.
+    """
+    _require_client(client, site)
+    model = model or key_manager.get_model_name()
+    call = LLMCall(site, model, key_index, attempt, streamed=True)
+    call.prompt_chars = content_chars(contents)
+    async with _get_semaphore(), _key_slot(key_index):
+        started = time.perf_counter()
+        parts = []
+        error = None
+        try:
+            stream = client.aio.models.generate_content_stream(
+                model=model,
+                contents=contents,
+                config=config
+            )
+            # Older SDKs return an async generator, newer ones a coroutine resolving to one
+            if inspect.isawaitable(stream):
+                stream = await stream
+            async for chunk in stream:
+                # Usage is reported on the final chunk
+                apply_usage(call, getattr(chunk, "usage_metadata", None))
+                if chunk.text:
+                    parts.append(chunk.text)
+                    yield chunk.text
+        except Exception as e:
+            error = e
+            if is_quota_error(e):
+                key_manager.record_quota_error(key_index)
+            else:
+                key_manager.record_error(key_index)
+            raise
+        finally:
+            call.duration_ms = (time.perf_counter() - started) * 1000
+            _classify(call, error, "".join(parts), _expects_json(config))
+            record_call(call)
+        key_manager.record_success(key_index, time.perf_counter() - started)
+
+
+async def create_cached_content(
+    client,
+    config: Any,
+    model: Optional[str] = None,
+    key_index: int = -1,
+    site: str = "prompt_cache"
+):
+    """
+    Create a cached-content handle (`client.aio.caches.create`) under the same
+    concurrency limits, key health tracking and telemetry as `generate_content`.
+
+    Returns:
+        The SDK CachedContent.
+    """
+    _require_client(client, site)
+    model = model or key_manager.get_model_name()
+    call = LLMCall(site, model, key_index, 1)
+    call.prompt_chars = content_chars(getattr(config, "system_instruction", None))
+    async with _get_semaphore(), _key_slot(key_index):
+        started = time.perf_counter()
+        error = None
+        try:
+            cached = await client.aio.caches.create(model=model, config=config)
+        except Exception as e:
+            error = e
+            if is_quota_error(e):
+                key_manager.record_quota_error(key_index)
+            else:
+                key_manager.record_error(key_index)
+            raise
+        finally:
+            call.duration_ms = (time.perf_counter() - started) * 1000
+            _classify(call, error, None, False)
+            record_call(call)
+        key_manager.record_success(key_index, time.perf_counter() - started)
+        return cached
+
+
+class SingleFlight:
+    """
+    Shares one in-flight call among concurrent callers with the same key.
+    
+    The first caller starts the call as its own task; callers arriving while
+    it runs await that task instead of issuing another request, and each
+    gets a deep copy of the result (or the same exception). Nothing is kept
+    once the call finishes, so this is coalescing, not caching. Because the
+    call runs as a separate task, a cancelled caller doesn't cancel it for the
+    others.
+    """
+    
+    def __init__(self, name: str):
+        self.name = name
+        # In-flight tasks are bound to their loop, so keep one table per loop
+        self._inflight: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Hashable, asyncio.Task]]" = weakref.WeakKeyDictionary()
+        self.calls = 0
+        self.coalesced = 0
+    
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        loop = asyncio.get_running_loop()
+        inflight = self._inflight.setdefault(loop, {})
+        task = inflight.get(key)
+        if task is None:
+            task = loop.create_task(fn())
+            inflight[key] = task
+            task.add_done_callback(lambda t: self._finished(inflight, key, t))
+            self.calls += 1
+            metrics.inc(f"singleflight.{self.name}.calls")
+        else:
+            self.coalesced += 1
+            metrics.inc(f"singleflight.{self.name}.coalesced")
+        
+        # Copies, so one caller mutating its result can't affect the others
+        return copy.deepcopy(await asyncio.shield(task))
+    
+    @staticmethod
+    def _finished(inflight: dict, key: Hashable, task: asyncio.Task):
+        if inflight.get(key) is task:
+            del inflight[key]
+        # Mark the exception retrieved in case every waiter was cancelled
+        if not task.cancelled():
+            task.exception()
+    
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "in_flight": sum(len(table) for table in self._inflight.values()),
+        }
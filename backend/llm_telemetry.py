@@ -0,0 +1,167 @@
+"""
+Per-call instrumentation for Gemini requests.
+
+`llm_client` records every call it makes with its call site (e.g. "intent",
+"counsellor", "sop_review"), model, key index, attempt number, duration,
+prompt/response size, token usage when the SDK reports it, and an outcome:
+
+- ok: the call succeeded (and returned valid JSON when JSON was requested)
+- quota: 429 / RESOURCE_EXHAUSTED
+- parse_error: the call succeeded but the JSON response did not parse
+- error: any other failure
+
+Calls are aggregated in the metrics registry under `llm.<site>.*` and
+summarised per call site on /api/metrics/llm. Within an HTTP request, calls
+are also collected by `LLMCallLogMiddleware` and logged as a single summary
+line when the response has been sent.
+"""
+
+import logging
+import threading
+from contextvars import ContextVar
+from typing import Any, List, Optional
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+OUTCOMES = ("ok", "quota", "parse_error", "error")
+TOKEN_BUCKETS = [100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000]
+
+_request_calls: ContextVar[Optional[List["LLMCall"]]] = ContextVar("llm_request_calls", default=None)
+_sites_lock = threading.Lock()
+_sites: set = set()
+
+
+class LLMCall:
+    """One Gemini request as seen by the caller."""
+
+    __slots__ = (
+        "site", "model", "key_index", "attempt", "duration_ms", "prompt_chars", "response_chars",
+        "prompt_tokens", "response_tokens", "cached_tokens", "outcome", "streamed"
+    )
+
+    def __init__(self, site: str, model: str, key_index: int, attempt: int, streamed: bool = False):
+        self.site = site
+        self.model = model
+        self.key_index = key_index
+        self.attempt = attempt
+        self.streamed = streamed
+        self.duration_ms = 0.0
+        self.prompt_chars = 0
+        self.response_chars = 0
+        self.prompt_tokens: Optional[int] = None
+        self.response_tokens: Optional[int] = None
+        self.cached_tokens: Optional[int] = None
+        self.outcome = "ok"
+
+    def as_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def describe(self) -> str:
+        tokens = ""
+        if self.prompt_tokens is not None:
+            tokens = f" tok={self.prompt_tokens}/{self.response_tokens or 0}"
+            if self.cached_tokens:
+                tokens += f" cached={self.cached_tokens}"
+        retry = f" attempt={self.attempt}" if self.attempt > 1 else ""
+        return (
+            f"{self.site} {self.outcome} {self.duration_ms:.0f}ms key#{self.key_index + 1}{retry}"
+            f" chars={self.prompt_chars}/{self.response_chars}{tokens}"
+        )
+
+
+def content_chars(contents: Any) -> int:
+    """Text size of a prompt; binary parts (e.g. audio) count their byte length."""
+    if contents is None:
+        return 0
+    if isinstance(contents, str):
+        return len(contents)
+    if isinstance(contents, (list, tuple)):
+        return sum(content_chars(part) for part in contents)
+    text = getattr(contents, "text", None)
+    if isinstance(text, str):
+        return len(text)
+    inline = getattr(contents, "inline_data", None)
+    data = getattr(inline, "data", None)
+    return len(data) if isinstance(data, (bytes, bytearray)) else 0
+
+
+def apply_usage(call: LLMCall, usage: Any):
+    """Copy token counts from a response's `usage_metadata`, if present."""
+    if usage is None:
+        return
+    call.prompt_tokens = getattr(usage, "prompt_token_count", None)
+    call.response_tokens = getattr(usage, "candidates_token_count", None)
+    call.cached_tokens = getattr(usage, "cached_content_token_count", None)
+
+
+def record(call: LLMCall):
+    """Publish a finished call to the metrics registry and the current request's log."""
+    prefix = f"llm.{call.site}"
+    with _sites_lock:
+        _sites.add(call.site)
+    metrics.inc(f"{prefix}.calls")
+    metrics.inc(f"{prefix}.outcome.{call.outcome}")
+    if call.attempt > 1:
+        metrics.inc(f"{prefix}.retries")
+    metrics.observe(f"{prefix}.duration_ms", call.duration_ms)
+    if call.prompt_tokens is not None:
+        metrics.observe(f"{prefix}.prompt_tokens", call.prompt_tokens, TOKEN_BUCKETS)
+    if call.response_tokens is not None:
+        metrics.observe(f"{prefix}.response_tokens", call.response_tokens, TOKEN_BUCKETS)
+    if call.cached_tokens:
+        metrics.inc(f"{prefix}.cached_tokens", call.cached_tokens)
+
+    calls = _request_calls.get()
+    if calls is not None:
+        calls.append(call)
+
+
+def call_site_summary() -> dict:
+    """Per call site: call count, outcomes, retries and latency/token histograms."""
+    snapshot = metrics.snapshot()
+    counters, histograms = snapshot["counters"], snapshot["histograms"]
+    with _sites_lock:
+        sites = sorted(_sites)
+    summary = {}
+    for site in sites:
+        prefix = f"llm.{site}"
+        summary[site] = {
+            "calls": counters.get(f"{prefix}.calls", 0),
+            "outcomes": {outcome: counters.get(f"{prefix}.outcome.{outcome}", 0) for outcome in OUTCOMES},
+            "retries": counters.get(f"{prefix}.retries", 0),
+            "cached_tokens": counters.get(f"{prefix}.cached_tokens", 0),
+            "duration_ms": histograms.get(f"{prefix}.duration_ms"),
+            "prompt_tokens": histograms.get(f"{prefix}.prompt_tokens"),
+            "response_tokens": histograms.get(f"{prefix}.response_tokens"),
+        }
+    return summary
+
+
+def summarize_calls(calls: List[LLMCall]) -> str:
+    total_ms = sum(call.duration_ms for call in calls)
+    return f"{len(calls)} LLM calls, {total_ms:.0f}ms: " + "; ".join(call.describe() for call in calls)
+
+
+class LLMCallLogMiddleware:
+    """
+    ASGI middleware that collects the LLM calls made while serving a request
+    and logs one summary line once the response (including a stream) is done.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        calls: List[LLMCall] = []
+        token = _request_calls.set(calls)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_calls.reset(token)
+            if calls:
+                logger.info(f"{scope['method']} {scope['path']}: {summarize_calls(calls)}")
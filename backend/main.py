@@ -1,10 +1,16 @@
+import json
+import time
+import asyncio
+import logging
 from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
 from typing import List, Optional
 from fastapi import FastAPI, Depends, HTTPException, Response, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from sqlalchemy.orm import Session
-from sqlalchemy import text, String
+from sqlalchemy import text, String, update
 
 from database import engine, get_db, Base
 from schemas import (
@@ -13,26 +19,45 @@ from schemas import (
     ProfileUpdate, ProfileResponse,
     UniversityResponse, ShortlistCreate, ShortlistResponse,
     TaskCreate, TaskUpdate, TaskResponse,
-    ChatMessageCreate, ChatMessageResponse,
+    ChatMessageCreate, ChatMessageResponse, ChatHistoryPage,
     ChatSessionCreate, ChatSessionUpdate, ChatSessionResponse,
     DashboardResponse, ForgotPasswordRequest, ResetPasswordRequest,
     SOPReviewRequest, SOPReviewResponse,
     ColdEmailRequest, ColdEmailResponse, ColdEmailPolishRequest,
-    SavedEmailCreate, SavedEmailResponse
+    SavedEmailCreate, SavedEmailResponse, JobResponse
 )
 from real_universities_data import UNIVERSITIES_DATA
-from models import User, UserProfile, University, Program, ShortlistedUniversity, Task, ChatMessage, ChatSession, UserStage, TaskStatus, SavedEmail
+from models import User, UserProfile, University, Program, ShortlistedUniversity, Task, ChatMessage, ChatSession, UserStage, TaskStatus, SavedEmail, BackgroundJob
 from auth import get_password_hash, verify_password, create_access_token, get_current_user, get_current_user_optional
 # from universities_data import UNIVERSITIES # Replaced by real_universities_data
-from ai_counsellor import get_counsellor_response, analyze_profile_strength, categorize_university, analyze_sop, generate_application_checklist, generate_cold_email_content, polish_cold_email_content
+from ai_counsellor import checklist_flight, sop_flight, get_counsellor_response, stream_counsellor_response, context_render_cache, analyze_profile_strength, categorize_university, analyze_sop, generate_cold_email_content, polish_cold_email_content
 from report_generator import StrategyReportGenerator
 from demo_data import DEMO_PROFILES, DEMO_CREDENTIALS
 from google_oauth import google_router
 from routers.voice import router as voice_router
+from gemini_key_manager import key_manager
+from recommendation_engine import intent_cache, intent_stats, resolve_intent, storable_intent
+from metrics import metrics, StageTimer
+from prompt_cache import prefix_cache
+from checklist_store import (
+    CHECKLIST_JOB, build_checklist_tasks, build_placeholder_tasks, get_cached_checklist, run_checklist_job
+)
+from job_queue import job_pool
+from admission import Ticket, admission, admit, admit_for_stream
+from llm_telemetry import LLMCallLogMiddleware, call_site_summary
+from catalog import catalog
+from chat_context import load_chat_context, load_previous_intent, load_profile
+from chat_actions import execute_chat_actions
+from conversation_summary import SUMMARY_JOB, run_summary_job, schedule_summary
 # import subscriptions  # DISABLED: Payment system deactivated
 
 Base.metadata.create_all(bind=engine)
 
+logger = logging.getLogger(__name__)
+
+job_pool.register(CHECKLIST_JOB, run_checklist_job)
+job_pool.register(SUMMARY_JOB, run_summary_job)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     run_migrations()
@@ -40,10 +65,14 @@ async def lifespan(app: FastAPI):
     seed_universities(db)
     seed_demo_users(db)
     db.close()
+    await job_pool.start()
     yield
+    await job_pool.stop()
+    await key_manager.aclose()
 
 app = FastAPI(title="AI Counsellor API", lifespan=lifespan)
 
+app.add_middleware(LLMCallLogMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -118,6 +147,29 @@ def api_health():
     """API health check"""
     return {"status": "healthy"}
 
+@app.get("/api/metrics/llm")
+def llm_metrics():
+    """Gemini client pool counters, per-key health (no key material is exposed) and per-call-site stats"""
+    return {
+        "clients": key_manager.get_stats(),
+        "keys": key_manager.get_health(),
+        "call_sites": call_site_summary(),
+        "singleflight": {flight.name: flight.stats() for flight in (checklist_flight, sop_flight)}
+    }
+
+@app.get("/api/metrics")
+def app_metrics():
+    """In-process counters and latency histograms (e.g. chat.<stage>_ms)"""
+    snapshot = metrics.snapshot()
+    snapshot["intent_cache"] = intent_cache.stats()
+    snapshot["intent"] = intent_stats()
+    snapshot["context_render_cache"] = context_render_cache.stats()
+    snapshot["catalog"] = catalog.stats()
+    snapshot["prompt_prefix_cache"] = prefix_cache.stats()
+    snapshot["background_jobs"] = job_pool.stats()
+    snapshot["admission"] = admission.stats()
+    return snapshot
+
 @app.delete("/api/user/sessions/all")
 def delete_all_user_sessions(
     current_user: User = Depends(get_current_user),
@@ -151,6 +203,7 @@ def seed_universities(db: Session):
                 db.add(program)
                 
     db.commit()
+    catalog.invalidate()
 
 def seed_demo_users(db: Session):
     """Create demo users with weak/average/strong profiles for demo purposes"""
@@ -248,6 +301,13 @@ def run_migrations():
             ("ALTER TABLE users ADD COLUMN onboarding_completed BOOLEAN DEFAULT FALSE", "users.onboarding_completed"),
             # Add missing work_experience_years to user_profiles
             ("ALTER TABLE user_profiles ADD COLUMN work_experience_years INTEGER DEFAULT 0", "user_profiles.work_experience_years"),
+            # Keyset index for paginated chat history
+            ("CREATE INDEX IF NOT EXISTS ix_chat_messages_session_id_id ON chat_messages (session_id, id)", "chat_messages history index"),
+            # Rolling conversation summaries
+            ("ALTER TABLE chat_sessions ADD COLUMN summary TEXT", "chat_sessions.summary"),
+            ("ALTER TABLE chat_sessions ADD COLUMN summary_message_id INTEGER", "chat_sessions.summary_message_id"),
+            # Intent state per user message
+            ("ALTER TABLE chat_messages ADD COLUMN intent JSON", "chat_messages.intent"),
         ]
 
         if dialect == "postgresql":
@@ -670,6 +730,18 @@ def get_dashboard(
         next_action=next_action
     )
 
+def categorize_universities(db: Session, universities: list, profile_dict: dict) -> list:
+    """
+    `categorize_university` for each ORM university, in one vectorized pass
+    over the catalog snapshot; a university the snapshot lacks is done directly.
+    """
+    categories = catalog.get(db).categories.categorize(profile_dict)
+    return [
+        categories.for_id(uni.id) or categorize_university(uni.__dict__, profile_dict)
+        for uni in universities
+    ]
+
+
 @app.get("/api/universities", response_model=List[UniversityResponse])
 def get_universities(
     country: Optional[str] = None,
@@ -711,10 +783,12 @@ def get_universities(
         profile = db.query(UserProfile).filter(UserProfile.user_id == current_user.id).first()
         profile_dict = profile.__dict__ if profile else {}
     
+    categorized = categorize_universities(db, universities, profile_dict) if current_user and profile_dict else None
+    
     result = []
-    for uni in universities:
-        if current_user and profile_dict:
-            cat, fit, risk, acc, cost = categorize_university(uni.__dict__, profile_dict)
+    for i, uni in enumerate(universities):
+        if categorized:
+            cat, fit, risk, acc, cost = categorized[i]
         else:
             # Default values for guests
             cat = "TARGET" # Default so UI doesn't break
@@ -780,8 +854,7 @@ def compare_universities(
         raise HTTPException(status_code=404, detail="One or more universities not found")
     
     result = []
-    for uni in universities:
-        cat, fit, risk, acc, cost = categorize_university(uni.__dict__, profile_dict)
+    for uni, (cat, fit, risk, acc, cost) in zip(universities, categorize_universities(db, universities, profile_dict)):
         # Get programs for this university
         programs = [
             {
@@ -841,7 +914,7 @@ def get_university_detail(
     profile = db.query(UserProfile).filter(UserProfile.user_id == current_user.id).first()
     profile_dict = profile.__dict__ if profile else {}
     
-    cat, fit, risk, acc, cost = categorize_university(uni.__dict__, profile_dict)
+    cat, fit, risk, acc, cost = categorize_universities(db, [uni], profile_dict)[0]
     
     # Get all programs for this university
     programs = [
@@ -1063,42 +1136,60 @@ async def lock_university(
         current_user.current_stage = UserStage.APPLICATION
     
     uni = db.query(University).filter(University.id == shortlist.university_id).first()
+    degree_level = current_user.profile.intended_degree if current_user.profile else None
     
-    # --- INTELLIGENT CHECKLIST GENERATION ---
-    generated_checklist = await generate_application_checklist(
-        university_name=uni.name, 
-        country=uni.country
-    )
+    # A stored checklist for this target becomes the tasks directly, no job needed
+    cached = get_cached_checklist(db, uni.id, uni.country, degree_level)
+    if cached is not None:
+        metrics.inc("checklist_store.hit")
+        db.add_all(build_checklist_tasks(current_user.id, shortlist.id, cached))
+        db.commit()
+        return {
+            "message": "University locked successfully. Your application tasks are ready.",
+            "stage": current_user.current_stage.value,
+            "job_id": None
+        }
     
-    if generated_checklist:
-        # Use AI Tasks
-        for item in generated_checklist:
-            task = Task(
-                user_id=current_user.id,
-                shortlisted_university_id=shortlist.id,
-                title=item.get("title", "Application Task"),
-                description=item.get("description", ""),
-                priority=item.get("priority", 2)
-            )
-            db.add(task)
-    else:
-        # Fallback to Static Tasks
-        default_tasks = [
-            Task(user_id=current_user.id, shortlisted_university_id=shortlist.id, 
-                 title=f"Research {uni.name} admission requirements", priority=1),
-            Task(user_id=current_user.id, shortlisted_university_id=shortlist.id,
-                 title=f"Prepare SOP for {uni.name}", priority=2),
-            Task(user_id=current_user.id, shortlisted_university_id=shortlist.id,
-                 title=f"Gather required documents for {uni.name}", priority=3),
-            Task(user_id=current_user.id, shortlisted_university_id=shortlist.id,
-                 title=f"Check application deadline for {uni.name}", priority=1),
-        ]
-        for task in default_tasks:
-            db.add(task)
+    # Generic tasks right away; the checklist job swaps in AI tasks when ready.
+    # Stays async so job_pool.enqueue runs on the event loop.
+    placeholders = build_placeholder_tasks(current_user.id, shortlist.id, uni.name)
+    db.add_all(placeholders)
+    db.flush()
     
+    job = job_pool.create_job(
+        db,
+        CHECKLIST_JOB,
+        {
+            "shortlist_id": shortlist.id,
+            "degree_level": degree_level,
+            "placeholder_task_ids": [task.id for task in placeholders],
+        },
+        user_id=current_user.id
+    )
     db.commit()
+    job_pool.enqueue(job.id)
     
-    return {"message": "University locked successfully. Intelligent Tasks Generated.", "stage": current_user.current_stage.value}
+    return {
+        "message": "University locked successfully. Personalized tasks are being generated.",
+        "stage": current_user.current_stage.value,
+        "job_id": job.id
+    }
+
+@app.get("/api/jobs/{job_id}", response_model=JobResponse)
+def get_job(
+    job_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    job = db.query(BackgroundJob).filter(
+        BackgroundJob.id == job_id,
+        BackgroundJob.user_id == current_user.id
+    ).first()
+    
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return JobResponse.model_validate(job)
 
 @app.post("/api/shortlist/{shortlist_id}/unlock")
 def unlock_university(
@@ -1291,12 +1382,31 @@ def delete_session(
     db.commit()
     return {"message": "Session deleted"}
 
-@app.get("/api/chat/history/{session_id}", response_model=List[ChatMessageResponse])
+HISTORY_PAGE_SIZE = 50
+MAX_HISTORY_PAGE_SIZE = 200
+
+@app.get("/api/chat/history/{session_id}", response_model=ChatHistoryPage)
 def get_chat_history(
     session_id: int,
+    before: Optional[int] = None,
+    after: Optional[int] = None,
+    limit: int = HISTORY_PAGE_SIZE,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
+    """
+    One page of a session's messages, oldest first.
+    
+    Without a cursor this is the latest page. `before=<message id>` scrolls
+    back and `after=<message id>` fetches newer messages; either way the
+    page's `next_cursor` continues in the same direction. Pages are keyset
+    scans on (session_id, id), so every page costs the same however long the
+    session is.
+    """
+    if before is not None and after is not None:
+        raise HTTPException(status_code=400, detail="Use either 'before' or 'after', not both")
+    limit = max(1, min(limit, MAX_HISTORY_PAGE_SIZE))
+    
     # Verify session ownership
     session = db.query(ChatSession).filter(
         ChatSession.id == session_id,
@@ -1305,70 +1415,71 @@ def get_chat_history(
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
 
-    messages = db.query(ChatMessage).filter(
-        ChatMessage.session_id == session_id
-    ).order_by(ChatMessage.created_at).all()
+    query = db.query(ChatMessage).filter(ChatMessage.session_id == session_id)
+    if after is not None:
+        messages = query.filter(ChatMessage.id > after).order_by(ChatMessage.id).limit(limit + 1).all()
+        has_more = len(messages) > limit
+        messages = messages[:limit]
+    else:
+        if before is not None:
+            query = query.filter(ChatMessage.id < before)
+        messages = query.order_by(ChatMessage.id.desc()).limit(limit + 1).all()
+        has_more = len(messages) > limit
+        messages = list(reversed(messages[:limit]))
+    
+    next_cursor = None
+    if has_more:
+        next_cursor = messages[-1].id if after is not None else messages[0].id
 
     # Runtime Hydration (Fix for old messages & dynamic info)
-    shortlisted_ids = [s.university_id for s in current_user.shortlisted_universities]
-    
-    # Pre-fetch universities to avoid N+1 if needed, or query on demand
-    # Simple on-demand for now as universities table is small
+    shortlisted_ids = {
+        row.university_id for row in db.query(ShortlistedUniversity.university_id).filter(
+            ShortlistedUniversity.user_id == current_user.id
+        )
+    }
+    snapshot = catalog.get(db)
     
+    responses = []
     for msg in messages:
-        if msg.suggested_universities and isinstance(msg.suggested_universities, list):
-            # We need to modify the dict in place or create a copy
-            # Since SQLA models return immutable-ish JSON, better to modify before returning response model
-            # But here we are returning list of model_validates.
-            # We must modify the underlying dict or handle it in the loop. 
-            # Note: Modifying msg.suggested_universities directly on DB object might trigger update if we commit (we won't).
-            # But for Pydantic validation, we need to pass the modified data.
-            
-            # Create a mutable copy
+        response = ChatMessageResponse.model_validate(msg)
+        if response.suggested_universities:
+            # Hydrate copies, never the JSON column on the ORM object
             updated_suggestions = []
-            for uni_data in msg.suggested_universities:
-                new_data = uni_data.copy()
+            for uni_data in response.suggested_universities:
+                new_data = dict(uni_data)
                 uni_id = new_data.get('university_id')
                 
-                # Check if hydration needed
                 if uni_id:
                     # Always re-hydrate to ensure freshness and fix "ID Only" bug
-                    db_uni = db.query(University).filter(University.id == uni_id).first()
-                    if db_uni:
-                        new_data['name'] = db_uni.name
-                        new_data['country'] = db_uni.country
-                        new_data['tuition'] = db_uni.tuition_per_year
-                        new_data['ranking'] = db_uni.ranking
+                    catalog_uni = snapshot.get(uni_id)
+                    if catalog_uni:
+                        new_data['name'] = catalog_uni['name']
+                        new_data['country'] = catalog_uni['country']
+                        new_data['tuition'] = catalog_uni['tuition_per_year']
+                        new_data['ranking'] = catalog_uni['ranking']
                     
                     # Update shortlist status
                     new_data['is_shortlisted'] = uni_id in shortlisted_ids
                 
                 updated_suggestions.append(new_data)
-            
-            # Temporarily assign to object for response serialization
-            # This works because Python objects are mutable, but won't persist to DB unless committed
-            msg.suggested_universities = updated_suggestions
+            response.suggested_universities = updated_suggestions
+        responses.append(response)
 
-    return [ChatMessageResponse.model_validate(m) for m in messages]
+    return ChatHistoryPage(messages=responses, next_cursor=next_cursor, has_more=has_more)
 
-@app.post("/api/chat", response_model=ChatMessageResponse)
-async def chat_with_counsellor(
-    message_data: ChatMessageCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    if not message_data.session_id:
+def open_chat_turn(db: Session, current_user: User, content: str, session_id: Optional[int]):
+    """Resolve (or auto-create) the chat session and persist the user's message."""
+    if not session_id:
         # Auto-create session if not provided
         new_session = ChatSession(
             user_id=current_user.id,
-            title=message_data.content[:30] + "..."
+            title=content[:30] + "..."
         )
         db.add(new_session)
         db.commit()
         db.refresh(new_session)
         session_id = new_session.id
     else:
-        session_id = message_data.session_id
         session = db.query(ChatSession).filter(ChatSession.id == session_id, ChatSession.user_id == current_user.id).first()
         if not session:
             raise HTTPException(status_code=404, detail="Session not found")
@@ -1383,17 +1494,36 @@ async def chat_with_counsellor(
         user_id=current_user.id,
         session_id=session_id,
         role="user",
-        content=message_data.content
+        content=content
     )
     db.add(user_message)
     db.commit()
+    return session_id, user_message
+
+async def prepare_counsellor_inputs(
+    db: Session,
+    current_user: User,
+    content: str,
+    session_id: int,
+    user_message_id: int,
+    timer: StageTimer
+) -> dict:
+    """
+    Gather everything the counsellor needs for one turn.
     
-    profile = db.query(UserProfile).filter(UserProfile.user_id == current_user.id).first()
-    universities = db.query(University).all()
-    shortlisted = db.query(ShortlistedUniversity).filter(
-        ShortlistedUniversity.user_id == current_user.id
-    ).all()
-    tasks = db.query(Task).filter(Task.user_id == current_user.id).all()
+    Returns keyword arguments for `get_counsellor_response` /
+    `stream_counsellor_response` (minus the message itself).
+    """
+    profile_dict = load_profile(db, current_user.id)
+    previous_intent = load_previous_intent(db, session_id, user_message_id)
+    
+    # Intent detection only needs the message, profile and previous intent, so
+    # start it now and overlap its LLM round-trip with the context loading below.
+    async def timed_detect_intent():
+        with timer.stage("intent"):
+            return await resolve_intent(content, profile_dict, previous_intent)
+    
+    intent_task = asyncio.create_task(timed_detect_intent())
     
     user_dict = {
         'id': current_user.id,
@@ -1403,335 +1533,69 @@ async def chat_with_counsellor(
         'onboarding_completed': current_user.onboarding_completed,
         # 'subscription_plan': 'FREE' # DISABLED
     }
-    profile_dict = profile.__dict__ if profile else {}
     
-    # helper to serialize uni with programs
-    uni_list = []
-    for u in universities:
-        u_dict = u.__dict__.copy()
-        # Manually serialize programs as they might be lazy loaded or list of objects
-        if hasattr(u, 'programs'):
-            u_dict['programs'] = [p.__dict__ for p in u.programs]
-        uni_list.append(u_dict)
-
-    shortlist_data = []
-    for s in shortlisted:
-        uni = db.query(University).filter(University.id == s.university_id).first()
-        shortlist_data.append({
-            'id': s.id,
-            'university_id': s.university_id,
-            'university': uni.__dict__ if uni else {},
-            'category': s.category.value if s.category else None,
-            'is_locked': s.is_locked
-        })
-    task_list = [{'id': t.id, 'title': t.title, 'status': t.status.value} for t in tasks]
-    
-    # Fetch history for Delta Detection
-    recent_history = []
-    if session_id:
-        # Get last 5 messages (excluding current one which is already in DB but not committed/queried effectively yet or we just treat it as current)
-        # Actually we just added current message at line 1170.
-        # We want the PREVIOUS history.
-        history_msgs = db.query(ChatMessage).filter(
-            ChatMessage.session_id == session_id
-        ).order_by(ChatMessage.created_at.desc()).limit(6).all()
-        
-        print(f"[DEBUG] Fetching history for session {session_id}. Found {len(history_msgs)} raw messages.")
-        
-        # Reverse to get chronological order [Oldest -> Newest]
-        # Skip the most recent one if it's the one we just processed (user_message)
-        for m in reversed(history_msgs):
-            if m.id == user_message.id:
-                 continue
-            recent_history.append({
-                "role": m.role,
-                "content": m.content,
-                "created_at": str(m.created_at)
-            })
-        print(f"[DEBUG] Passed {len(recent_history)} history items to AI.")
-
-    response = await get_counsellor_response(
-        message_data.content,
-        user_dict,
-        profile_dict,
-        uni_list,
-        shortlist_data,
-        task_list,
-        history=recent_history
-    )
-    
-    # ============================================================
-    # EXECUTE AI TOOL CALLS → Backend Actions → DB Updates
-    # ============================================================
-    # Flow: Gemini JSON → Validate Stage → Execute → DB Update → Confirm
-    # ============================================================
-    actions_taken = []
-    actions_blocked = []
-    
-    for action in response.get('actions', []):
-        action_type = action.get('type')
-        params = action.get('params', {})
-        
-        # ------------------------------------------------------------
-        # TOOL: shortlist_university
-        # JSON: {"type": "shortlist_university", "params": {"university_id": 1, "category": "TARGET"}}
-        # Requires: DISCOVERY stage, onboarding complete
-        # ------------------------------------------------------------
-        if action_type == 'shortlist_university':
-            uni_id = params.get('university_id')
-            category = params.get('category', 'TARGET')
-            
-            # Stage check: Must be in DISCOVERY, not LOCKED/APPLICATION
-            if current_user.current_stage == UserStage.ONBOARDING:
-                actions_blocked.append({'type': action_type, 'reason': 'Complete onboarding first'})
-                continue
-            if current_user.current_stage in [UserStage.LOCKED, UserStage.APPLICATION]:
-                actions_blocked.append({'type': action_type, 'reason': 'Cannot modify shortlist after locking'})
-                continue
-                
-            # FEATURE GATE: Shortlist Limit (Free Plan)
-            plan = 'FREE' 
-            current_count = db.query(ShortlistedUniversity).filter(ShortlistedUniversity.user_id == current_user.id).count()
-            
-            # Since payment is removed, we just check count but don't strictly enforce upgraded plans
-            # If we wanted to enforce it:
-            if plan == 'FREE' and current_count >= 100: # Increased limit effectively removing it
-                actions_blocked.append({'type': action_type, 'reason': 'Shortlist limit reached.', 'code': 'PLAN_LIMIT'})
-                continue
-            
-            existing = db.query(ShortlistedUniversity).filter(
-                ShortlistedUniversity.user_id == current_user.id,
-                ShortlistedUniversity.university_id == uni_id
-            ).first()
-            
-            if existing:
-                actions_blocked.append({'type': action_type, 'reason': 'Already shortlisted'})
-                continue
-            
-            uni = db.query(University).filter(University.id == uni_id).first()
-            if not uni:
-                actions_blocked.append({'type': action_type, 'reason': 'University not found'})
-                continue
-            
-            shortlist = ShortlistedUniversity(
-                user_id=current_user.id,
-                university_id=uni_id,
-                category=category
-            )
-            db.add(shortlist)
-            db.flush()  # Get ID immediately
-            actions_taken.append({
-                'type': 'shortlist_university',
-                'university_id': uni_id,
-                'university_name': uni.name,
-                'category': category,
-                'shortlist_id': shortlist.id,
-                'confirmed': True
-            })
-        
-        # ------------------------------------------------------------
-        # TOOL: lock_university
-        # JSON: {"type": "lock_university", "params": {"university_id": 1}}
-        # Requires: DISCOVERY stage, university in shortlist
-        # Result: Moves user to APPLICATION stage, creates tasks
-        # ------------------------------------------------------------
-        elif action_type == 'lock_university':
-            uni_id = params.get('university_id')
-            
-            # Stage check
-            if current_user.current_stage == UserStage.ONBOARDING:
-                actions_blocked.append({'type': action_type, 'reason': 'Complete onboarding first'})
-                continue
-            
-            # Find in shortlist
-            shortlist = db.query(ShortlistedUniversity).filter(
-                ShortlistedUniversity.user_id == current_user.id,
-                ShortlistedUniversity.university_id == uni_id
-            ).first()
-            
-            if not shortlist:
-                actions_blocked.append({'type': action_type, 'reason': 'University not in shortlist. Add to shortlist first.'})
-                continue
-            
-            if shortlist.is_locked:
-                actions_blocked.append({'type': action_type, 'reason': 'Already locked'})
-                continue
-            
-            # Execute lock
-            shortlist.is_locked = True
-            shortlist.locked_at = datetime.utcnow()
-            
-            # Stage transition: Move to APPLICATION
-            previous_stage = current_user.current_stage.value
-            current_user.current_stage = UserStage.APPLICATION
-            
-            # Auto-generate tasks
-            uni = db.query(University).filter(University.id == uni_id).first()
-            generated_tasks = []
-            task_templates = [
-                (f"Research {uni.name} admission requirements", 1),
-                (f"Prepare SOP for {uni.name}", 2),
-                (f"Gather documents for {uni.name}", 3),
-                (f"Check {uni.name} application deadline", 1),
-            ]
-            for title, priority in task_templates:
-                task = Task(
-                    user_id=current_user.id,
-                    shortlisted_university_id=shortlist.id,
-                    title=title,
-                    priority=priority
-                )
-                db.add(task)
-                generated_tasks.append(title)
-            
-            actions_taken.append({
-                'type': 'lock_university',
-                'university_id': uni_id,
-                'university_name': uni.name,
-                'stage_changed': True,
-                'previous_stage': previous_stage,
-                'new_stage': 'APPLICATION',
-                'tasks_created': len(generated_tasks),
-                'confirmed': True
-            })
-        
-        # ------------------------------------------------------------
-        # TOOL: unlock_university
-        # JSON: {"type": "unlock_university", "params": {"university_id": 1}}
-        # Warning: Deletes tasks, may regress stage
-        # ------------------------------------------------------------
-        elif action_type == 'unlock_university':
-            uni_id = params.get('university_id')
-            
-            shortlist = db.query(ShortlistedUniversity).filter(
-                ShortlistedUniversity.user_id == current_user.id,
-                ShortlistedUniversity.university_id == uni_id
-            ).first()
-            
-            if not shortlist:
-                actions_blocked.append({'type': action_type, 'reason': 'University not in shortlist'})
-                continue
-            
-            if not shortlist.is_locked:
-                actions_blocked.append({'type': action_type, 'reason': 'University is not locked'})
-                continue
-            
-            # Execute unlock
-            shortlist.is_locked = False
-            shortlist.locked_at = None
-            
-            # Delete associated tasks
-            deleted_tasks = db.query(Task).filter(
-                Task.shortlisted_university_id == shortlist.id
-            ).delete()
-            
-            # Check if any other locked universities remain
-            other_locked = db.query(ShortlistedUniversity).filter(
-                ShortlistedUniversity.user_id == current_user.id,
-                ShortlistedUniversity.is_locked,
-                ShortlistedUniversity.id != shortlist.id
-            ).count()
-            
-            stage_regressed = False
-            if other_locked == 0:
-                current_user.current_stage = UserStage.DISCOVERY
-                stage_regressed = True
-            
-            uni = db.query(University).filter(University.id == uni_id).first()
-            actions_taken.append({
-                'type': 'unlock_university',
-                'university_id': uni_id,
-                'university_name': uni.name if uni else 'Unknown',
-                'tasks_deleted': deleted_tasks,
-                'stage_regressed': stage_regressed,
-                'new_stage': current_user.current_stage.value,
-                'confirmed': True
-            })
-        
-        # ------------------------------------------------------------
-        # TOOL: create_task
-        # JSON: {"type": "create_task", "params": {"title": "...", "description": "...", "priority": 1}}
-        # Requires: APPLICATION stage
-        # ------------------------------------------------------------
-        elif action_type == 'create_task':
-            # Stage check
-            if current_user.current_stage != UserStage.APPLICATION:
-                actions_blocked.append({'type': action_type, 'reason': 'Tasks can only be created in APPLICATION stage'})
-                continue
-            
-            task = Task(
-                user_id=current_user.id,
-                title=params.get('title', 'New Task'),
-                description=params.get('description'),
-                priority=params.get('priority', 1)
+    try:
+        with timer.stage("context"):
+            # Blocking DB work runs off the event loop so the intent call keeps progressing
+            context = await asyncio.to_thread(
+                load_chat_context, db, current_user.id, session_id, user_message_id
             )
-            db.add(task)
-            db.flush()
-            actions_taken.append({
-                'type': 'create_task',
-                'task_id': task.id,
-                'title': task.title,
-                'confirmed': True
-            })
         
-        # ------------------------------------------------------------
-        # TOOL: update_task
-        # JSON: {"type": "update_task", "params": {"task_id": 1, "status": "COMPLETED"}}
-        # ------------------------------------------------------------
-        elif action_type == 'update_task':
-            task_id = params.get('task_id')
-            new_status = params.get('status', 'IN_PROGRESS')
-            
-            task = db.query(Task).filter(
-                Task.id == task_id,
-                Task.user_id == current_user.id
-            ).first()
-            
-            if not task:
-                actions_blocked.append({'type': action_type, 'reason': 'Task not found'})
-                continue
-            
-            try:
-                task.status = TaskStatus(new_status)
-                actions_taken.append({
-                    'type': 'update_task',
-                    'task_id': task_id,
-                    'new_status': new_status,
-                    'confirmed': True
-                })
-            except ValueError:
-                actions_blocked.append({'type': action_type, 'reason': f'Invalid status: {new_status}'})
-    
-    db.commit()
-    db.refresh(current_user)  # Refresh to get updated stage
-    
-    # Build comprehensive action summary for response
-    action_summary = None
-    if actions_taken or actions_blocked:
-        action_summary = {
-            'executed': actions_taken,
-            'blocked': actions_blocked,
-            'final_stage': current_user.current_stage.value
-        }
-    
-    # Hydrate suggested universities with DB data
-    suggested_unis = response.get('suggested_universities')
+        with timer.stage("intent_wait"):
+            intent = await intent_task
+    finally:
+        if not intent_task.done():
+            intent_task.cancel()
     
+    return {
+        "user_data": user_dict,
+        "profile": profile_dict,
+        "universities": context.universities,
+        "shortlisted": context.shortlisted,
+        "tasks": context.tasks,
+        "history": context.history,
+        "summary": context.summary,
+        "intent": intent
+    }
+
+def hydrate_suggested_universities(db: Session, current_user: User, suggested_unis: Optional[list]):
+    """Fill suggested universities in place with catalog data and shortlist status."""
     # Get user's currently shortlisted IDs for "is_shortlisted" status
     shortlisted_ids = [s.university_id for s in current_user.shortlisted_universities]
+    snapshot = catalog.get(db)
     
     if suggested_unis:
         for uni_data in suggested_unis:
             uni_id = uni_data.get('university_id')
             if uni_id:
-                db_uni = db.query(University).filter(University.id == uni_id).first()
-                if db_uni:
-                    uni_data['name'] = db_uni.name
-                    uni_data['country'] = db_uni.country
-                    uni_data['tuition'] = db_uni.tuition_per_year
-                    uni_data['ranking'] = db_uni.ranking
+                catalog_uni = snapshot.get(uni_id)
+                if catalog_uni:
+                    uni_data['name'] = catalog_uni['name']
+                    uni_data['country'] = catalog_uni['country']
+                    uni_data['tuition'] = catalog_uni['tuition_per_year']
+                    uni_data['ranking'] = catalog_uni['ranking']
                     uni_data['is_shortlisted'] = uni_id in shortlisted_ids
 
+def finish_chat_turn(
+    db: Session,
+    current_user: User,
+    session_id: int,
+    response: dict,
+    timer: StageTimer,
+    user_message_id: Optional[int] = None,
+    intent: Optional[dict] = None
+) -> ChatMessage:
+    """
+    Run actions, hydrate suggestions, persist the assistant message (and the
+    user message's intent) and queue a summary if due.
+    """
+    with timer.stage("actions"):
+        action_summary = execute_chat_actions(db, current_user, response.get('actions', []))
+    
+    # Hydrate suggested universities with DB data
+    suggested_unis = response.get('suggested_universities')
+    hydrate_suggested_universities(db, current_user, suggested_unis)
+
     ai_message = ChatMessage(
         user_id=current_user.id,
         session_id=session_id,
@@ -1741,15 +1605,133 @@ async def chat_with_counsellor(
         suggested_universities=suggested_unis,
         suggested_next_questions=response.get('suggested_next_questions')
     )
-    db.add(ai_message)
-    db.commit()
-    db.refresh(ai_message)
+    with timer.stage("persist"):
+        state = storable_intent(intent)
+        if user_message_id is not None and state is not None:
+            # Written here, not when resolved, so no write transaction is held across the model call
+            db.execute(update(ChatMessage).where(ChatMessage.id == user_message_id).values(intent=state))
+        db.add(ai_message)
+        db.commit()
+        db.refresh(ai_message)
+    schedule_summary(db, current_user.id, session_id)
+    return ai_message
+
+@app.post("/api/chat", response_model=ChatMessageResponse)
+async def chat_with_counsellor(
+    message_data: ChatMessageCreate,
+    _ticket: Ticket = Depends(admit("chat")),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    timer = StageTimer("chat")
+    
+    session_id, user_message = open_chat_turn(db, current_user, message_data.content, message_data.session_id)
+    timer.record("session", time.perf_counter() - timer.started)
+    
+    inputs = await prepare_counsellor_inputs(
+        db, current_user, message_data.content, session_id, user_message.id, timer
+    )
+    
+    with timer.stage("generate"):
+        response = await get_counsellor_response(message_data.content, **inputs)
+    
+    ai_message = finish_chat_turn(
+        db, current_user, session_id, response, timer, user_message.id, inputs["intent"]
+    )
+    
+    timings = timer.finish()
+    logger.info(f"Chat turn timings (ms): {timings}")
     
     return ChatMessageResponse.model_validate(ai_message)
 
+def sse_event(event: str, data) -> str:
+    """Format one Server-Sent Events frame."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@app.post("/api/chat/stream")
+async def chat_with_counsellor_stream(
+    message_data: ChatMessageCreate,
+    ticket: Ticket = Depends(admit_for_stream("chat")),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Streaming variant of /api/chat (Server-Sent Events).
+    
+    Events, in order:
+    - `session`: {"session_id", "user_message_id"} once the user message is saved
+    - `delta`: {"text"} fragments of the counsellor message as they are generated
+    - `done`: the persisted assistant message (same shape as /api/chat), sent
+      after actions have been executed
+    - `error`: {"detail"} if the turn fails after streaming has started
+    """
+    timer = StageTimer("chat_stream")
+    
+    # Session ownership errors still surface as a normal 404 before streaming
+    # starts; the ticket is then released by its dependency, otherwise by the stream
+    session_id, user_message = open_chat_turn(db, current_user, message_data.content, message_data.session_id)
+    user_message_id = user_message.id
+    user_id = current_user.id
+    timer.record("session", time.perf_counter() - timer.started)
+    
+    # The request-scoped session is closed once this handler returns, so the
+    # stream works on its own session bound to the same engine.
+    stream_db = Session(bind=db.get_bind())
+    
+    def release_stream():
+        # Idempotent: runs when the stream ends and again as the response's
+        # background task, which also covers a client that disconnects before
+        # the body is iterated (the generator then never starts)
+        stream_db.close()
+        ticket.release()
+    
+    async def event_stream():
+        try:
+            user = stream_db.get(User, user_id)
+            yield sse_event("session", {"session_id": session_id, "user_message_id": user_message_id})
+            
+            inputs = await prepare_counsellor_inputs(
+                stream_db, user, message_data.content, session_id, user_message_id, timer
+            )
+            
+            response = None
+            first_token_at = None
+            with timer.stage("generate"):
+                async for kind, payload in stream_counsellor_response(message_data.content, **inputs):
+                    if kind == "delta":
+                        if first_token_at is None:
+                            first_token_at = time.perf_counter()
+                            timer.record("ttft", first_token_at - timer.started)
+                        yield sse_event("delta", {"text": payload})
+                    else:
+                        response = payload
+            
+            ai_message = finish_chat_turn(
+                stream_db, user, session_id, response, timer, user_message_id, inputs["intent"]
+            )
+            done = ChatMessageResponse.model_validate(ai_message).model_dump(mode="json")
+            
+            timings = timer.finish()
+            logger.info(f"Streamed chat turn timings (ms): {timings}")
+            yield sse_event("done", done)
+        except Exception as e:
+            logger.exception("Streaming chat turn failed")
+            stream_db.rollback()
+            yield sse_event("error", {"detail": str(e)[:200]})
+        finally:
+            release_stream()
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(release_stream)
+    )
+
 @app.post("/api/sop/review", response_model=SOPReviewResponse)
 async def review_sop(
     request: SOPReviewRequest,
+    _ticket: Ticket = Depends(admit("sop")),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -1894,6 +1876,7 @@ def get_profile_summary_text(profile: UserProfile):
 @app.post("/api/tools/cold-email", response_model=ColdEmailResponse)
 async def create_cold_email(
     request: ColdEmailRequest,
+    _ticket: Ticket = Depends(admit("cold_email")),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -1924,6 +1907,7 @@ async def create_cold_email(
 @app.post("/api/tools/cold-email/polish")
 async def polish_cold_email(
     request: ColdEmailPolishRequest,
+    _ticket: Ticket = Depends(admit("cold_email")),
     current_user: User = Depends(get_current_user)
 ):
     """Polish an existing email draft."""
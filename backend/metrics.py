@@ -0,0 +1,131 @@
+"""
+In-process metrics registry.
+
+Lightweight counters and latency histograms kept in memory per worker and
+exported as JSON from /api/metrics. Good enough to compare before/after on a
+single instance without pulling in a metrics stack.
+"""
+
+import time
+import bisect
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (milliseconds) for histogram buckets; the last bucket is open-ended
+DEFAULT_BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000]
+
+
+class Histogram:
+    """Fixed-bucket histogram with count/sum/min/max."""
+
+    def __init__(self, buckets: Optional[List[float]] = None):
+        self.buckets = buckets or DEFAULT_BUCKETS_MS
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def snapshot(self) -> dict:
+        buckets = {f"le_{bound}": n for bound, n in zip(self.buckets, self.counts)}
+        buckets["inf"] = self.counts[-1]
+        return {
+            "count": self.count,
+            "sum": round(self.total, 2),
+            "avg": round(self.total / self.count, 2) if self.count else None,
+            "min": round(self.min, 2) if self.min is not None else None,
+            "max": round(self.max, 2) if self.max is not None else None,
+            "buckets": buckets,
+        }
+
+
+class MetricsRegistry:
+    """Thread-safe store of named counters, gauges and histograms."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = {}
+        self._gauges: Dict[str, float] = {}
+        self._histograms: Dict[str, Histogram] = {}
+
+    def inc(self, name: str, amount: int = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def set_gauge(self, name: str, value: float):
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name: str, value: float, buckets: Optional[List[float]] = None):
+        """Record `value`; `buckets` only applies when the histogram is first created."""
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = Histogram(buckets)
+                self._histograms[name] = histogram
+            histogram.observe(value)
+
+    def get_counter(self, name: str) -> int:
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+                "histograms": {name: h.snapshot() for name, h in self._histograms.items()},
+            }
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+
+# Global instance for convenience
+metrics = MetricsRegistry()
+
+
+class StageTimer:
+    """
+    Records wall-clock duration per named stage of a request.
+
+    Stages may overlap (e.g. a background LLM call running alongside DB work),
+    so `total` is measured independently from the sum of the stages.
+    """
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def record(self, name: str, seconds: float):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds * 1000
+
+    def finish(self) -> Dict[str, float]:
+        """Publish all stages to the registry and return them in milliseconds."""
+        self.stages["total"] = (time.perf_counter() - self.started) * 1000
+        for name, ms in self.stages.items():
+            metrics.observe(f"{self.prefix}.{name}_ms", ms)
+        return {name: round(ms, 1) for name, ms in self.stages.items()}
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Enum, Text, JSON
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Enum, Text, JSON, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -30,6 +30,12 @@ class TaskStatus(str, enum.Enum):
     IN_PROGRESS = "IN_PROGRESS"
     COMPLETED = "COMPLETED"
 
+class JobStatus(str, enum.Enum):
+    PENDING = "PENDING"
+    RUNNING = "RUNNING"
+    COMPLETED = "COMPLETED"
+    FAILED = "FAILED"
+
 class UniversityCategory(str, enum.Enum):
     DREAM = "DREAM"
     TARGET = "TARGET"
@@ -233,12 +239,46 @@ class Task(Base):
     user = relationship("User", back_populates="tasks")
     shortlisted_university = relationship("ShortlistedUniversity", back_populates="tasks")
 
+class ChecklistCache(Base):
+    """Generated application checklist, shared by every user who locks the university."""
+    __tablename__ = "checklist_cache"
+    __table_args__ = (
+        UniqueConstraint("university_id", "country", "degree_level", name="uq_checklist_cache_target"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    university_id = Column(Integer, ForeignKey("universities.id"), nullable=False)
+    country = Column(String(100), nullable=False)
+    degree_level = Column(String(50), nullable=False)
+    items = Column(JSON, nullable=False)
+    version = Column(Integer, nullable=False)
+    generated_at = Column(DateTime(timezone=True), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+
+class BackgroundJob(Base):
+    __tablename__ = "background_jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    kind = Column(String(50), nullable=False)
+    status = Column(Enum(JobStatus), default=JobStatus.PENDING, nullable=False, index=True)
+    payload = Column(JSON)
+    result = Column(JSON)
+    attempts = Column(Integer, default=0, nullable=False)
+    error = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    completed_at = Column(DateTime(timezone=True))
+
 class ChatSession(Base):
     __tablename__ = "chat_sessions"
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     title = Column(String(255), nullable=True)
+    # Rolling summary of every message up to and including summary_message_id
+    summary = Column(Text, nullable=True)
+    summary_message_id = Column(Integer, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
@@ -247,6 +287,10 @@ class ChatSession(Base):
 
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
+    __table_args__ = (
+        # History pages are keyset scans on (session_id, id)
+        Index("ix_chat_messages_session_id_id", "session_id", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -256,6 +300,8 @@ class ChatMessage(Base):
     actions_taken = Column(JSON)
     suggested_universities = Column(JSON)
     suggested_next_questions = Column(JSON)
+    # User messages: the intent state after this message (constraints carried forward)
+    intent = Column(JSON, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     session = relationship("ChatSession", back_populates="messages")
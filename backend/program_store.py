@@ -0,0 +1,291 @@
+"""
+Columnar store of catalog programs.
+
+The catalog snapshot used to hold every program as its own frozen dict of
+~30 columns, on top of the ORM objects it was read from. At tens of
+thousands of programs that dominates each worker's memory, and a scan
+touches one dict per program.
+
+ProgramStore keeps the `programs` table column by column instead:
+- numbers (tuition, min_gpa, IELTS/TOEFL/GRE/GMAT thresholds, duration,
+  work experience) and flags as typed NumPy arrays, with a null mask for
+  nullable columns
+- low-cardinality strings (degree level, category, discipline, department,
+  deadlines) as codes into a vocabulary of interned values
+- JSON lists (intake terms, specializations) likewise, each distinct list
+  stored once; reads return a fresh list
+- everything else (name, URL, timestamps) as Python lists of interned values
+- `offsets`: university i owns positions offsets[i]:offsets[i + 1], in
+  catalog order
+
+A university's "programs" is a ProgramRows slice of the store, and each
+program a ProgramRow: a read-only Mapping that reads its store position on
+access. Code that takes `p.get("tuition_per_year_usd")` keeps working; code
+that needs a column for many programs (e.g. ProgramIndex) takes
+`rows.column(key)` without building rows at all.
+"""
+
+import sys
+from collections.abc import Mapping, Sequence
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from sqlalchemy import JSON
+
+from models import Program
+
+INT_COLUMNS = (
+    "id", "university_id", "duration_months", "tuition_per_year_usd",
+    "toefl_min", "gre_min", "gmat_min", "min_work_experience_years",
+)
+FLOAT_COLUMNS = ("duration_years", "min_gpa", "gpa_scale", "ielts_min")
+FLAG_COLUMNS = ("gre_required", "gmat_required", "requires_work_experience", "portfolio_required")
+INTERNED_COLUMNS = (
+    "degree_level", "program_category", "program_discipline", "department",
+    "application_deadline_fall", "application_deadline_spring",
+)
+_DTYPES = {
+    **{key: (np.int64, int) for key in INT_COLUMNS},
+    **{key: (np.float64, float) for key in FLOAT_COLUMNS},
+    **{key: (np.bool_, bool) for key in FLAG_COLUMNS},
+}
+
+# Column keys in model order, as the frozen dicts had them
+PROGRAM_COLUMNS = tuple(attr.key for attr in Program.__mapper__.column_attrs)
+JSON_COLUMNS = tuple(
+    attr.key for attr in Program.__mapper__.column_attrs if isinstance(attr.columns[0].type, JSON)
+)
+_SCALARS = (str, int, float, bool)
+
+
+def _intern(value):
+    # Exactly str: str-based enums (ProgramCategory) cannot be interned
+    return sys.intern(value) if value.__class__ is str else value
+
+
+class _TypedColumn:
+    """Typed array plus a null mask (None when the column has no nulls)."""
+
+    __slots__ = ("values", "nulls")
+
+    def __init__(self, values: list, dtype):
+        nulls = np.fromiter((v is None for v in values), dtype=np.bool_, count=len(values))
+        self.nulls = nulls if nulls.any() else None
+        zero = dtype(0)
+        self.values = np.array([zero if v is None else v for v in values], dtype=dtype)
+        if dtype is np.int64 and len(self.values) and np.abs(self.values).max() < 2 ** 31:
+            self.values = self.values.astype(np.int32)
+
+    def get(self, pos: int):
+        if self.nulls is not None and self.nulls[pos]:
+            return None
+        return self.values[pos].item()
+
+    def slice(self, start: int, stop: int) -> list:
+        values = self.values[start:stop].tolist()
+        if self.nulls is not None:
+            for i in np.flatnonzero(self.nulls[start:stop]).tolist():
+                values[i] = None
+        return values
+
+    def nbytes(self) -> int:
+        return self.values.nbytes + (self.nulls.nbytes if self.nulls is not None else 0)
+
+
+class _InternedColumn:
+    """Codes into a vocabulary of distinct values."""
+
+    __slots__ = ("codes", "vocabulary")
+
+    def __init__(self, values: list):
+        codes: Dict[Any, int] = {}
+        self.vocabulary = []
+        for value in values:
+            if value not in codes:
+                codes[value] = len(self.vocabulary)
+                self.vocabulary.append(_intern(value))
+        dtype = np.int16 if len(self.vocabulary) < 2 ** 15 else np.int32
+        self.codes = np.array([codes[value] for value in values], dtype=dtype)
+
+    def get(self, pos: int):
+        return self.vocabulary[self.codes[pos]]
+
+    def slice(self, start: int, stop: int) -> list:
+        vocabulary = self.vocabulary
+        return [vocabulary[code] for code in self.codes[start:stop].tolist()]
+
+    def nbytes(self) -> int:
+        return self.codes.nbytes
+
+
+class _SharedListColumn:
+    """
+    JSON lists of scalars (intake terms, specializations), each distinct list
+    stored once as a tuple. Every read returns a new list, as a fresh row
+    would, so callers cannot change what other programs see.
+    """
+
+    __slots__ = ("codes", "vocabulary")
+
+    def __init__(self, values: list):
+        codes: Dict[Any, int] = {}
+        self.vocabulary = []
+        positions = []
+        for value in values:
+            # Element types are part of the key: [1] and [True] are different lists
+            key = None if value is None else tuple((item.__class__, item) for item in value)
+            if key not in codes:
+                codes[key] = len(self.vocabulary)
+                self.vocabulary.append(None if value is None else tuple(_intern(item) for item in value))
+            positions.append(codes[key])
+        dtype = np.int16 if len(self.vocabulary) < 2 ** 15 else np.int32
+        self.codes = np.array(positions, dtype=dtype)
+
+    @staticmethod
+    def fits(values: list) -> bool:
+        return all(
+            value is None or (isinstance(value, list) and all(isinstance(item, _SCALARS) for item in value))
+            for value in values
+        )
+
+    def get(self, pos: int):
+        value = self.vocabulary[self.codes[pos]]
+        return None if value is None else list(value)
+
+    def slice(self, start: int, stop: int) -> list:
+        vocabulary = self.vocabulary
+        return [None if vocabulary[code] is None else list(vocabulary[code]) for code in self.codes[start:stop].tolist()]
+
+    def nbytes(self) -> int:
+        return self.codes.nbytes
+
+
+class _ListColumn:
+    __slots__ = ("values",)
+
+    def __init__(self, values: list):
+        self.values = [_intern(value) for value in values]
+
+    def get(self, pos: int):
+        return self.values[pos]
+
+    def slice(self, start: int, stop: int) -> list:
+        return self.values[start:stop]
+
+    def nbytes(self) -> int:
+        return 0
+
+
+class ProgramStore:
+    """Every program of a catalog, column by column; see the module docstring."""
+
+    def __init__(self, programs_by_university: List[list]):
+        offsets = [0]
+        programs = []
+        for university_programs in programs_by_university:
+            programs.extend(university_programs)
+            offsets.append(len(programs))
+        self.offsets = np.array(offsets, dtype=np.int64)
+        self.columns: Dict[str, Any] = {}
+        for key in PROGRAM_COLUMNS:
+            values = [getattr(program, key) for program in programs]
+            dtype, python_type = _DTYPES.get(key, (None, None))
+            # SQLite hands back whatever was stored; a column that does not
+            # round-trip exactly (e.g. an int in a Float column) stays a list
+            if dtype is not None and all(v is None or type(v) is python_type for v in values):
+                self.columns[key] = _TypedColumn(values, dtype)
+            elif key in INTERNED_COLUMNS:
+                self.columns[key] = _InternedColumn(values)
+            elif key in JSON_COLUMNS and _SharedListColumn.fits(values):
+                self.columns[key] = _SharedListColumn(values)
+            else:
+                self.columns[key] = _ListColumn(values)
+        self._getters: Dict[str, Callable[[int], Any]] = {key: column.get for key, column in self.columns.items()}
+        self._size = len(programs)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def value(self, key: str, pos: int):
+        return self._getters[key](pos)
+
+    def rows(self, university: int) -> "ProgramRows":
+        """Programs of the university at catalog position `university`."""
+        return ProgramRows(self, int(self.offsets[university]), int(self.offsets[university + 1]))
+
+    def array_bytes(self) -> int:
+        """Bytes held in NumPy arrays (the Python-list columns are not counted)."""
+        return self.offsets.nbytes + sum(column.nbytes() for column in self.columns.values())
+
+
+class ProgramRow(Mapping):
+    """One program, read from its store on access. Read-only."""
+
+    __slots__ = ("store", "position")
+
+    def __init__(self, store: ProgramStore, position: int):
+        self.store = store
+        self.position = position
+
+    def __getitem__(self, key: str):
+        return self.store.value(key, self.position)
+
+    def __iter__(self):
+        return iter(PROGRAM_COLUMNS)
+
+    def __len__(self) -> int:
+        return len(PROGRAM_COLUMNS)
+
+    def copy(self) -> dict:
+        return dict(self)
+
+    def __repr__(self) -> str:
+        return f"ProgramRow({dict(self)!r})"
+
+
+class ProgramRows(Sequence):
+    """A university's programs: positions start:stop of a store."""
+
+    __slots__ = ("store", "start", "stop")
+
+    def __init__(self, store: ProgramStore, start: int, stop: int):
+        self.store = store
+        self.start = start
+        self.stop = stop
+
+    def __len__(self) -> int:
+        return self.stop - self.start
+
+    def __getitem__(self, index):
+        if index.__class__ is int:
+            if index < 0:
+                index += self.stop - self.start
+            if 0 <= index < self.stop - self.start:
+                return ProgramRow(self.store, self.start + index)
+            raise IndexError("program index out of range")
+        if isinstance(index, slice):
+            return tuple(ProgramRow(self.store, self.start + i) for i in range(*index.indices(len(self))))
+        return self[index.__index__()]
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Sequence) and not isinstance(other, str):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    __hash__ = None
+
+    def column(self, key: str, default: Optional[Any] = None) -> list:
+        """`[p.get(key, default) for p in self]`, read straight from the column."""
+        column = self.store.columns.get(key)
+        if column is None:
+            return [default] * len(self)
+        return column.slice(self.start, self.stop)
+
+    def __repr__(self) -> str:
+        return f"ProgramRows({list(self)!r})"
+
+
+def university_program_rows(store: ProgramStore) -> Tuple[ProgramRows, ...]:
+    """ProgramRows for every university of the store, in catalog order."""
+    return tuple(store.rows(i) for i in range(len(store.offsets) - 1))
@@ -0,0 +1,87 @@
+"""
+Prompt size accounting for LLM calls.
+
+Token counts are estimated from character length (~4 characters per token
+for English text). That is close enough to keep prompts under a ceiling
+without a round-trip to the tokenizer endpoint. The counsellor ceiling is
+configurable via COUNSELLOR_PROMPT_TOKEN_BUDGET (default 16000).
+"""
+
+import os
+import logging
+from typing import Dict, List
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 4
+DEFAULT_PROMPT_TOKEN_BUDGET = 16000
+
+
+def _read_prompt_token_budget() -> int:
+    try:
+        value = int(os.environ.get("COUNSELLOR_PROMPT_TOKEN_BUDGET", DEFAULT_PROMPT_TOKEN_BUDGET))
+    except ValueError:
+        logger.warning("Invalid COUNSELLOR_PROMPT_TOKEN_BUDGET, falling back to %s", DEFAULT_PROMPT_TOKEN_BUDGET)
+        value = DEFAULT_PROMPT_TOKEN_BUDGET
+    return max(1, value)
+
+
+PROMPT_TOKEN_BUDGET = _read_prompt_token_budget()
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for `text` (rounded up)."""
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+class PromptBudget:
+    """
+    Token ledger for one prompt.
+
+    Sections are added with their estimated size and every trimming step is
+    recorded, so the caller can report what was cut and the final estimate.
+    Since each section is rounded up, the ledger total never underestimates
+    the assembled prompt.
+    """
+
+    def __init__(self, ceiling: int = None):
+        self.ceiling = ceiling if ceiling is not None else PROMPT_TOKEN_BUDGET
+        self.sections: Dict[str, int] = {}
+        self.trimmed: List[dict] = []
+
+    def add(self, name: str, text: str) -> int:
+        tokens = estimate_tokens(text)
+        self.sections[name] = self.sections.get(name, 0) + tokens
+        return tokens
+
+    @property
+    def total(self) -> int:
+        return sum(self.sections.values())
+
+    def remaining(self) -> int:
+        return self.ceiling - self.total
+
+    def record_trim(self, step: str, removed: int, tokens: int):
+        """Note that `removed` items worth ~`tokens` tokens were cut at `step`."""
+        self.trimmed.append({"step": step, "removed": removed, "tokens": tokens})
+
+    def report(self) -> dict:
+        return {
+            "ceiling": self.ceiling,
+            "estimated_tokens": self.total,
+            "sections": dict(self.sections),
+            "trimmed": list(self.trimmed),
+        }
+
+    def publish(self, prefix: str, prompt: str) -> int:
+        """Record the final prompt's token estimate under `<prefix>.prompt_tokens`."""
+        tokens = estimate_tokens(prompt)
+        metrics.observe(f"{prefix}.prompt_tokens", tokens)
+        if self.trimmed:
+            metrics.inc(f"{prefix}.prompt_trimmed")
+        if tokens > self.ceiling:
+            # Only the fixed sections (system prompt, message) can push us here
+            logger.warning(f"Prompt for {prefix} is ~{tokens} tokens, over the {self.ceiling} budget")
+        return tokens
@@ -0,0 +1,140 @@
+"""
+Provider-side caching of the counsellor's stable prompt prefix.
+
+The system instruction (SYSTEM_PROMPT + catalog reference) is byte-identical
+across turns for a given catalog version, so Gemini can hold it as cached
+content and each turn only sends the small per-turn suffix. Cached content
+belongs to the API key that created it, so handles are kept per
+(key index, prefix fingerprint). A new catalog version yields a new
+fingerprint and therefore a fresh handle; old handles expire server-side.
+
+When caching is disabled, the prefix is below the model's minimum cacheable
+size, or creation fails, the prefix is sent inline as `system_instruction`.
+Handles are created through `llm_client`, so creation counts against the
+same concurrency limits, key health and telemetry as any other call.
+
+Configuration:
+- GEMINI_PROMPT_CACHE: "0" disables cached content (default enabled)
+- GEMINI_PROMPT_CACHE_TTL_SECONDS: handle lifetime (default 3600)
+- GEMINI_PROMPT_CACHE_MIN_TOKENS: smallest prefix worth caching (default 1024,
+  the minimum for the Flash models the counsellor uses; Pro models need 4096)
+"""
+
+import os
+import time
+import hashlib
+import logging
+import threading
+from typing import Dict, Tuple
+
+from google.genai import types
+
+from llm_client import create_cached_content
+from metrics import metrics
+from prompt_budget import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Refresh a handle this long before it expires so in-flight calls never hit a dead one
+REFRESH_MARGIN_SECONDS = 60
+# After a failed create, send the prefix inline for this long before trying again
+CREATE_RETRY_SECONDS = 600
+
+
+def prefix_fingerprint(prefix: str) -> str:
+    return hashlib.sha256(prefix.encode()).hexdigest()[:16]
+
+
+class PrefixCacheRegistry:
+    """Creates and reuses cached-content handles for stable prompt prefixes."""
+
+    def __init__(self, enabled: bool, ttl_seconds: int, min_tokens: int):
+        self.enabled = enabled
+        self.ttl_seconds = ttl_seconds
+        self.min_tokens = min_tokens
+        self._handles: Dict[Tuple[int, str], Tuple[str, float]] = {}
+        self._retry_after: Dict[Tuple[int, str], float] = {}
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+        self.failures = 0
+
+    async def resolve(self, client, key_index: int, prefix: str) -> dict:
+        """
+        GenerateContentConfig kwargs that carry `prefix` for this key.
+
+        Returns {"cached_content": name} when a handle is available, otherwise
+        {"system_instruction": prefix}. Two turns racing on a cold key may both
+        create a handle; the later one wins and the other simply expires.
+        """
+        inline = {"system_instruction": prefix}
+        if not self.enabled or key_index < 0 or estimate_tokens(prefix) < self.min_tokens:
+            return inline
+
+        fingerprint = prefix_fingerprint(prefix)
+        handle_key = (key_index, fingerprint)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._handles.get(handle_key)
+            if entry and entry[1] - REFRESH_MARGIN_SECONDS > now:
+                self.reused += 1
+                metrics.inc("prompt_cache.reused")
+                return {"cached_content": entry[0]}
+            if self._retry_after.get(handle_key, 0) > now:
+                return inline
+
+        try:
+            cached = await create_cached_content(
+                client,
+                config=types.CreateCachedContentConfig(
+                    system_instruction=prefix,
+                    ttl=f"{self.ttl_seconds}s",
+                    display_name=f"counsellor-prefix-{fingerprint}"
+                ),
+                key_index=key_index
+            )
+        except Exception as e:
+            logger.warning(f"Could not cache prompt prefix on key #{key_index + 1}, sending inline: {str(e)[:100]}")
+            with self._lock:
+                self._retry_after[handle_key] = now + CREATE_RETRY_SECONDS
+                self.failures += 1
+            metrics.inc("prompt_cache.create_failed")
+            return inline
+
+        with self._lock:
+            # Handles for older prefixes on this key are left to expire server-side
+            for stale in [k for k in self._handles if k[0] == key_index and k != handle_key]:
+                del self._handles[stale]
+            self._handles[handle_key] = (cached.name, now + self.ttl_seconds)
+            self.created += 1
+        metrics.inc("prompt_cache.created")
+        logger.info(f"Cached prompt prefix {fingerprint} on key #{key_index + 1} as {cached.name}")
+        return {"cached_content": cached.name}
+
+    def forget(self, key_index: int, prefix: str):
+        """Drop the handle for `prefix`, e.g. after the API reported it missing."""
+        with self._lock:
+            self._handles.pop((key_index, prefix_fingerprint(prefix)), None)
+
+    def clear(self):
+        with self._lock:
+            self._handles.clear()
+            self._retry_after.clear()
+            self.created = self.reused = self.failures = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "handles": len(self._handles),
+                "created": self.created,
+                "reused": self.reused,
+                "failures": self.failures,
+            }
+
+
+prefix_cache = PrefixCacheRegistry(
+    enabled=os.environ.get("GEMINI_PROMPT_CACHE", "1") != "0",
+    ttl_seconds=int(os.environ.get("GEMINI_PROMPT_CACHE_TTL_SECONDS", "3600")),
+    min_tokens=int(os.environ.get("GEMINI_PROMPT_CACHE_MIN_TOKENS", "1024"))
+)
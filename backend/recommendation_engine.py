@@ -1,9 +1,19 @@
+import os
+import re
+import bisect
+import copy
 import json
+import time
 import logging
 import hashlib
-from typing import List, Dict, Any
+import threading
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import List, Dict, Any, Optional
 from enum import Enum
 from gemini_key_manager import key_manager
+from llm_client import generate_content
+from metrics import metrics
 from google.genai import types
 
 logger = logging.getLogger(__name__)
@@ -45,26 +55,441 @@ Also extract strict search constraints.
 }
 """
 
+# Profile fields that actually influence constraint extraction
+INTENT_PROFILE_FIELDS = ("field_of_study", "intended_degree", "budget_per_year", "preferred_countries")
+
+class IntentCache:
+    """
+    Bounded LRU cache of detect_intent results with TTL eviction.
+    
+    Keyed on the normalized message plus a hash of the profile fields that
+    affect extraction, so repeated prompts ("suggest universities", "what next?")
+    skip the LLM round-trip.
+    """
+    
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return copy.deepcopy(value)
+    
+    def set(self, key: str, value: Dict[str, Any]):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, copy.deepcopy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+    
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            }
+
+# INTENT_CACHE_SIZE=0 disables the cache
+intent_cache = IntentCache(
+    max_size=int(os.environ.get("INTENT_CACHE_SIZE", "1024")),
+    ttl_seconds=float(os.environ.get("INTENT_CACHE_TTL_SECONDS", "900"))
+)
+
+def normalize_message(message: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation."""
+    text = " ".join((message or "").lower().split())
+    return re.sub(r"[\s.!?]+$", "", text)
+
+def intent_cache_key(message: str, user_profile: dict) -> str:
+    profile_values = [user_profile.get(field) for field in INTENT_PROFILE_FIELDS]
+    profile_hash = hashlib.sha1(json.dumps(profile_values, default=str).encode()).hexdigest()
+    return f"{normalize_message(message)}|{profile_hash}"
+
+# ------------------------------------------------------------
+# Local fast-path classifier
+# ------------------------------------------------------------
+# Rules + a small lexicon cover the obvious messages ("compare X and Y",
+# "do I need IELTS", "what do I do now") in microseconds. detect_intent only
+# falls back to the Gemini router when confidence is below the threshold.
+
+INTENT_LOCAL_CONFIDENCE = float(os.environ.get("INTENT_LOCAL_CONFIDENCE", "0.8"))
+
+# Canonical discipline -> aliases. Canonical names follow the seeded
+# Program.program_discipline values (Computer Science default, Data Science,
+# MBA, Mechanical Engineering, Information Systems, ...).
+DISCIPLINE_LEXICON = {
+    "Computer Science": ["computer science", "comp sci", "cs", "cse"],
+    "Data Science": ["data science", "data analytics"],
+    "Artificial Intelligence": ["artificial intelligence", "machine learning"],
+    "Information Systems": ["information systems", "mis"],
+    "Information Technology": ["information technology"],
+    "Software Engineering": ["software engineering"],
+    "Cybersecurity": ["cybersecurity", "cyber security", "information security"],
+    "Electrical Engineering": ["electrical engineering", "eee", "ece", "eecs"],
+    "Mechanical Engineering": ["mechanical engineering"],
+    "Civil Engineering": ["civil engineering"],
+    "MBA": ["mba", "business administration"],
+    "Management": [],
+    "Finance": ["fintech"],
+    "Design": ["ux", "hci"],
+}
+
+# Aliases that are everyday words too ("the AI said", "finance my studies",
+# "time management", "the design of the site") only name a discipline next
+# to a study cue: "study AI", "masters in finance", "design programs".
+_STUDY_BEFORE = (
+    r"(?:stud(?:y|ying)|major(?:ing)?(?: in)?|degree in|field of|switch(?:ing)? to|interested in"
+    r"|(?:ms|msc|m\.s\.|masters?|master's|phd|bachelors?|bachelor's|mba|pg|ug)(?: in)?)"
+)
+_STUDY_AFTER = r"(?:programs?|programmes?|degrees?|courses?|masters|major|specialization)"
+AMBIGUOUS_DISCIPLINE_ALIASES = {
+    "Computer Science": ["computing"],
+    "Data Science": ["analytics", "ds"],
+    "Artificial Intelligence": ["ai", "ml", "ai/ml", "ai and ml"],
+    "Mechanical Engineering": ["mechanical"],
+    "Management": ["management"],
+    "Finance": ["finance"],
+    "Design": ["design"],
+}
+
+
+def _study_context(alias: str) -> str:
+    alias = re.escape(alias)
+    return rf"(?<!\w){_STUDY_BEFORE} {alias}(?!\w)|(?<!\w){alias} {_STUDY_AFTER}(?!\w)"
+
+# Canonical values match University.country in the catalog
+COUNTRY_LEXICON = {
+    "USA": ["usa", "united states"],
+    "UK": ["uk", "united kingdom", "england", "britain", "scotland"],
+    "Canada": ["canada"],
+    "Germany": ["germany"],
+    "Australia": ["australia"],
+    "Ireland": ["ireland"],
+}
+
+DEGREE_LEXICON = {
+    "Masters": ["masters", "master's", "ms", "msc", "m.s.", "m.sc", "meng", "mba", "postgraduate", "pg"],
+    "PhD": ["phd", "ph.d", "doctorate", "doctoral"],
+    "Bachelors": ["bachelors", "bachelor's", "bachelor", "undergraduate", "ug", "bsc", "btech"],
+}
+
+# Ordered by specificity: the first matching rule wins, conflicts lower confidence
+INTENT_RULES = [
+    (IntentType.OUT_OF_SCOPE, 0.9, [
+        r"\bpoem\b", r"\bjoke\b", r"\bpresident\b", r"\bweather\b", r"\brecipe\b", r"\bsong\b",
+        r"\bmovie\b", r"\bcricket\b", r"\bfootball\b", r"\bstock price\b"
+    ]),
+    (IntentType.COMPARISON, 0.9, [
+        r"\bcompare\b", r"\bcomparison\b", r"\bvs\.?\b", r"\bversus\b", r"\bbetter than\b",
+        r"\bdifference between\b", r"\bwhich is better\b"
+    ]),
+    (IntentType.EXAM_STRATEGY, 0.88, [
+        r"\bielts\b", r"\btoefl\b", r"\bgre\b", r"\bgmat\b", r"\bpte\b", r"\bduolingo\b",
+        r"\bexams?\b", r"\btest scores?\b"
+    ]),
+    (IntentType.PROFILE_ANALYSIS, 0.85, [
+        r"\bmy chances?\b", r"\bgood enough\b", r"\bchances? of (getting|admission)\b",
+        r"\b(evaluate|analy[sz]e|assess|review) my (profile|chances)\b", r"\bmy profile (strong|weak)\b",
+        r"\bam i (eligible|competitive|qualified)\b", r"\bprofile strength\b"
+    ]),
+    (IntentType.NEXT_STEPS, 0.85, [
+        r"\bwhat (do|should) i do (now|next)\b", r"\bwhat next\b", r"\bwhat'?s next\b", r"\bnext steps?\b",
+        r"\bhow (do i|to|can i) apply\b", r"\bwhere do i start\b", r"\bwhat should i do\b"
+    ]),
+]
+
+FIELD_SWITCH_PATTERNS = [
+    r"\binstead\b", r"\bswitch(ing)? to\b", r"\bchange (my field )?to\b", r"\brather\b", r"\bwhat about\b", r"\bhow about\b"
+]
+DISCOVERY_PATTERNS = [
+    r"\bsuggest\b", r"\brecommend", r"\buniversit(y|ies)\b", r"\bcolleges?\b", r"\bschools?\b",
+    r"\bwhere should i apply\b", r"\bshortlist\b", r"\boptions\b", r"\bprograms?\b", r"\bcourses?\b"
+]
+# Actions on a specific shortlist entry; those go through the LLM router
+ACTION_PATTERNS = [
+    r"\b(?:lock|unlock|remove|delete|drop)\b", r"\badd\b.*\b(?:shortlist|list)\b"
+]
+# Capitalised words that never name a university
+NON_UNIVERSITY_WORDS = {
+    "i", "i'm", "i've", "i'd", "i'll", "us", "ok", "okay", "hi", "hello", "hey", "thanks",
+    "ielts", "toefl", "gre", "gmat", "pte", "duolingo", "sat", "act", "gpa", "cgpa", "sop", "lor", "cv",
+    "english", "fall", "spring", "summer", "winter", "dream", "target", "safe", "usd", "inr", "eur", "gbp",
+}
+GENERIC_INSTITUTION_WORDS = {"university", "universities", "college", "colleges", "school", "schools"}
+CATEGORY_PATTERNS = {
+    "DREAM": r"\b(dream|ambitious|reach)\b",
+    "SAFE": r"\b(safe|safety|backup)\b",
+    "TARGET": r"\btarget\b",
+}
+BUDGET_PATTERN = re.compile(
+    r"(?:under|below|less than|max(?:imum)?|within|upto|up to|budget(?: of| is)?|<)\s*"
+    r"(?:\$|usd\s*)?(\d[\d,]*(?:\.\d+)?)\s*(k|thousand|lakh)?\b"
+    r"|\$\s*(\d[\d,]*(?:\.\d+)?)\s*(k)?\b"
+)
+
+
+# Qualified forms of everyday words: "America" but not "Latin America",
+# "the States" but not "it states that", "master" only as a degree
+QUALIFIED_COUNTRY_PATTERNS = {
+    "USA": [r"(?<!latin )(?<!south )(?<!central )(?<!\w)america(?!\w)", r"\b(?:in|to|the) states\b(?! (?:of|that|which)\b)"],
+}
+QUALIFIED_DEGREE_PATTERNS = {
+    "Masters": [r"\bmaster(?= (?:degree|program|programme|course|of|in)\b)"],
+}
+
+
+def _compile_lexicon(lexicon: Dict[str, List[str]], qualified: Optional[Dict[str, List[str]]] = None) -> List[tuple]:
+    """
+    (canonical, pattern) pairs in lexicon order. Aliases match whole words
+    only; `qualified` adds regexes for a canonical's context-dependent forms.
+    """
+    compiled = []
+    for canonical, aliases in lexicon.items():
+        for alias in sorted(aliases, key=len, reverse=True):
+            compiled.append((canonical, re.compile(r"(?<![\w])" + re.escape(alias) + r"(?![\w])")))
+        for pattern in (qualified or {}).get(canonical, []):
+            compiled.append((canonical, re.compile(pattern)))
+    return compiled
+
+
+_DISCIPLINES = _compile_lexicon(DISCIPLINE_LEXICON, {
+    canonical: [_study_context(alias) for alias in sorted(aliases, key=len, reverse=True)]
+    for canonical, aliases in AMBIGUOUS_DISCIPLINE_ALIASES.items()
+})
+_COUNTRIES = _compile_lexicon(COUNTRY_LEXICON, QUALIFIED_COUNTRY_PATTERNS)
+_DEGREES = _compile_lexicon(DEGREE_LEXICON, QUALIFIED_DEGREE_PATTERNS)
+_INTENT_RULES = [(intent, confidence, [re.compile(p) for p in patterns]) for intent, confidence, patterns in INTENT_RULES]
+_FIELD_SWITCH = [re.compile(p) for p in FIELD_SWITCH_PATTERNS]
+_DISCOVERY = [re.compile(p) for p in DISCOVERY_PATTERNS]
+_CATEGORIES = {category: re.compile(p) for category, p in CATEGORY_PATTERNS.items()}
+_ACTIONS = [re.compile(p) for p in ACTION_PATTERNS]
+_NAME_TOKEN = re.compile(r"[A-Za-z][\w&'.-]*")
+
+
+def _first_match(text: str, lexicon: List[tuple]) -> Optional[str]:
+    for canonical, pattern in lexicon:
+        if pattern.search(text):
+            return canonical
+    return None
+
+
+def _all_matches(text: str, lexicon: List[tuple]) -> List[str]:
+    found = []
+    for canonical, pattern in lexicon:
+        if canonical not in found and pattern.search(text):
+            found.append(canonical)
+    return found
+
+
+def _university_mentions(message: str) -> List[str]:
+    """
+    Names the message seems to point at: runs of capitalised words ("Stanford",
+    "University of Toronto", "CMU") that aren't lexicon constraints or exams.
+    Sentence-initial words only count when they are acronyms.
+    """
+    text = " ".join((message or "").split())
+    lowered = text.lower()
+    covered = [m.span() for _, p in _DISCIPLINES + _COUNTRIES + _DEGREES for m in p.finditer(lowered)]
+    
+    names, current, sentence_start = [], [], True
+    for match in _NAME_TOKEN.finditer(text):
+        word = match.group().rstrip(".'")
+        gap = text[match.start() - 1] if match.start() else ""
+        start = sentence_start or (gap == " " and text[:match.start()].rstrip().endswith(("?", "!", ".")))
+        sentence_start = False
+        joined = current and word.lower() in ("of", "at") and gap == " "
+        candidate = (
+            word[:1].isupper()
+            and (not start or (word.isupper() and len(word) > 1))
+            and word.lower() not in NON_UNIVERSITY_WORDS
+            and not any(a <= match.start() < b for a, b in covered)
+        )
+        if candidate or joined:
+            current.append(word)
+            continue
+        if current:
+            names.append(current)
+        current = []
+    if current:
+        names.append(current)
+    
+    mentions = []
+    for words in names:
+        while words and words[-1].lower() in ("of", "at"):
+            words.pop()
+        name = " ".join(words)
+        if words and not all(w.lower() in GENERIC_INSTITUTION_WORDS for w in words) and name not in mentions:
+            mentions.append(name)
+    return mentions
+
+
+def _extract_budget(text: str) -> Optional[int]:
+    match = BUDGET_PATTERN.search(text)
+    if not match:
+        return None
+    amount, unit = (match.group(1), match.group(2)) if match.group(1) else (match.group(3), match.group(4))
+    try:
+        value = float(amount.replace(",", ""))
+    except ValueError:
+        return None
+    if unit in ("k", "thousand"):
+        value *= 1000
+    elif unit == "lakh":
+        value *= 100000 / 83  # INR lakh -> USD, rough
+    # Small bare numbers ("under 3") are not budgets
+    return int(value) if value >= 1000 else None
+
+
+def classify_intent_locally(message: str) -> tuple:
+    """
+    Rule/lexicon based intent classifier.
+    
+    Returns:
+        Tuple of (intent_dict, confidence). The dict has the same shape as the
+        LLM router output; confidence is in [0, 1].
+    """
+    text = " ".join((message or "").lower().split())
+    
+    discipline = _first_match(text, _DISCIPLINES)
+    countries = _all_matches(text, _COUNTRIES)
+    # "US" is only a country when written in capitals ("us" is usually a pronoun)
+    if "USA" not in countries and re.search(r"\bU\.?S\.?A?\b", message or ""):
+        countries.append("USA")
+    degree = _first_match(text, _DEGREES)
+    budget = _extract_budget(text)
+    category = next((c for c, p in _CATEGORIES.items() if p.search(text)), None)
+    
+    matched = [(intent, confidence) for intent, confidence, patterns in _INTENT_RULES
+               if any(p.search(text) for p in patterns)]
+    
+    if any(p.search(text) for p in _FIELD_SWITCH) and discipline:
+        matched.append((IntentType.FIELD_SWITCH, 0.85))
+    
+    # "State University" names a university, it is not a discovery cue
+    mentions = _university_mentions(message)
+    unnamed = text
+    for name in mentions:
+        unnamed = unnamed.replace(name.lower(), " ")
+    
+    has_constraints = bool(discipline or countries or degree or budget)
+    if any(p.search(unnamed) for p in _DISCOVERY):
+        # Alongside a rule match this is a conflict ("GRE 320, which universities?")
+        if discipline:
+            matched.append((IntentType.PROGRAM_SPECIFIC_QUERY, 0.85))
+        else:
+            matched.append((IntentType.UNIVERSITY_DISCOVERY, 0.85))
+    elif not matched and has_constraints:
+        # Bare constraints ("MS in Canada under 30k") read as a specific program search
+        matched.append((IntentType.PROGRAM_SPECIFIC_QUERY if discipline else IntentType.UNIVERSITY_DISCOVERY, 0.7))
+    
+    if matched:
+        intent, confidence = matched[0]
+        if len({m[0] for m in matched}) > 1:
+            # Conflicting signals - let the LLM decide
+            confidence = min(confidence, 0.6)
+    else:
+        intent, confidence = IntentType.UNIVERSITY_DISCOVERY, 0.2
+    
+    # Questions about a named university or shortlist actions need the LLM;
+    # comparisons name universities by design
+    if (mentions and intent != IntentType.COMPARISON) or any(p.search(text) for p in _ACTIONS):
+        confidence = min(confidence, 0.6)
+    
+    # Very long messages carry nuance the rules don't see
+    if len(text.split()) > 40:
+        confidence = min(confidence, 0.5)
+    
+    return {
+        "intent": intent.value,
+        "target_discipline": discipline,
+        "target_degree": degree,
+        "max_budget_usd": budget,
+        "target_countries": countries,
+        "category_preference": category,
+        "explicit_university_mentions": mentions
+    }, confidence
+
+def _unresolved(local_intent: Dict) -> Dict:
+    """No router available: the local constraints, flagged so they aren't stored as session state."""
+    return {**local_intent, "intent": IntentType.OUT_OF_SCOPE.value, "unresolved": True}
+
+
 async def detect_intent(message: str, user_profile: dict) -> Dict[str, Any]:
     """
-    Uses LLM to classify intent and extract constraints.
+    Classify intent and extract constraints.
+    
+    Obvious messages are answered by the local classifier; otherwise results
+    are served from `intent_cache` when the same normalized message was
+    classified recently for an equivalent profile, and only then by the LLM.
     """
+    local_intent, confidence = classify_intent_locally(message)
+    if confidence >= INTENT_LOCAL_CONFIDENCE:
+        logger.info(f"Local intent classification ({confidence:.2f}): {local_intent['intent']}")
+        metrics.inc("intent.local")
+        return local_intent
+    
     if not key_manager.has_keys():
-        return {"intent": IntentType.OUT_OF_SCOPE}
-
+        return _unresolved(local_intent)
+    
+    cache_key = intent_cache_key(message, user_profile)
+    cached = intent_cache.get(cache_key)
+    if cached is not None:
+        metrics.inc("intent.cache")
+        return cached
+    
+    metrics.inc("intent.llm")
     full_prompt = f"{STRICT_INTENT_PROMPT}\n\nUser Message: {message}\nUser Profile Context: {str(user_profile)}"
 
-    client, _ = key_manager.create_client()
+    client, key_index = key_manager.create_client()
     if not client:
-        return {"intent": IntentType.OUT_OF_SCOPE}
+        return _unresolved(local_intent)
 
     try:
-        response = client.models.generate_content(
-            model=key_manager.get_model_name(),
+        response = await generate_content(
+            client,
             contents=full_prompt,
             config=types.GenerateContentConfig(
                 response_mime_type="application/json"
-            )
+            ),
+            key_index=key_index,
+            site="intent"
         )
         data = json.loads(response.text)
         
@@ -86,14 +511,168 @@ async def detect_intent(message: str, user_profile: dict) -> Dict[str, Any]:
         # Validate intent
         if data.get("intent") not in IntentType.__members__:
             data["intent"] = IntentType.UNIVERSITY_DISCOVERY # Fallback
+        
+        intent_cache.set(cache_key, data)
         return data
     except Exception as e:
         logger.error(f"Intent detection failed: {e}")
         return {"intent": IntentType.UNIVERSITY_DISCOVERY}
 
+# ------------------------------------------------------------
+# Intent state across a session
+# ------------------------------------------------------------
+# Each user message stores the merged intent (ChatMessage.intent), so a turn
+# starts from the previous turn's constraints. Short follow-ups ("and in
+# Canada?", "cheaper ones") are merged into that state locally instead of
+# going to the Gemini router; any other message is a fresh request and is
+# classified on its own. "Any country is fine" and the like drop a constraint.
+# Turns resolved without a router (no API keys) are not stored.
+
+FOLLOW_UP_MAX_WORDS = 8
+# "Cheaper" lowers the carried budget by this factor
+CHEAPER_BUDGET_FACTOR = 0.8
+CARRIED_CONSTRAINTS = ("target_discipline", "target_degree", "max_budget_usd", "target_countries", "category_preference")
+INTENT_SOURCES = ("local", "follow_up", "cache", "llm")
+
+_FOLLOW_UP_CUES = [re.compile(p) for p in [
+    r"^(and|also|but|or|so|ok|okay|same)\b", r"^(in|for|with|under|below|only|just)\b",
+    r"\b(what|how) about\b", r"\btell me more\b", r"\bmore (options|like (this|that|these|those))\b",
+    r"\b(ones|those|these) (in|for|under|with)\b", r"\b(instead|too|as well)\b"
+]]
+_CHEAPER = re.compile(r"\b(cheaper|less expensive|more affordable|lower (cost|fees|tuition)|budget[- ]friendly)\b")
+_ADDITIVE = re.compile(r"^(and|also)\b|\b(too|as well|also)\b")
+# Messages that lift a carried constraint
+_CLEARS = {
+    "target_countries": re.compile(
+        r"\b(any (country|countries|location|where)|anywhere|(country|location) (doesn't|does not|don't|do not) matter"
+        r"|no (country|location) preference|open to (all|any) countries)\b"
+    ),
+    "max_budget_usd": re.compile(
+        r"\b(any budget|no budget|budget (doesn't|does not|don't|do not) matter|regardless of (cost|price|budget)"
+        r"|money is no (issue|object|problem)|cost (doesn't|does not) matter)\b"
+    ),
+    "target_degree": re.compile(r"\b(any (degree|level)|(degree|level) (doesn't|does not) matter)\b"),
+    "target_discipline": re.compile(r"\b(any (field|subject|discipline|major)|(field|subject) (doesn't|does not) matter)\b"),
+    "category_preference": re.compile(r"\b(any (category|tier)|all (categories|tiers)|dream,? target (and|or) safe)\b"),
+}
+def _has_constraints(intent: Dict) -> bool:
+    return any(intent.get(field) for field in CARRIED_CONSTRAINTS)
+
+
+def cleared_constraints(message: str) -> List[str]:
+    """Carried constraints the message lifts ("any country is fine", "no budget limit")."""
+    text = " ".join((message or "").lower().split())
+    return [field for field, pattern in _CLEARS.items() if pattern.search(text)]
+
+
+def is_follow_up(message: str, local_intent: Dict) -> bool:
+    """Whether `message` only refines the previous request (short, and a cue or a bare constraint)."""
+    text = " ".join((message or "").lower().split())
+    if not text or len(text.split()) > FOLLOW_UP_MAX_WORDS:
+        return False
+    return bool(
+        _has_constraints(local_intent) or _CHEAPER.search(text) or any(p.search(text) for p in _FOLLOW_UP_CUES)
+        or cleared_constraints(text)
+    )
+
+
+def merge_intent(previous: Optional[Dict], update: Dict, message: str, follow_up: bool = False) -> Dict:
+    """
+    Next intent state: `update`'s constraints, over `previous`'s on a follow-up.
+
+    A fresh request (not `follow_up`) carries nothing over. A follow-up keeps
+    the previous intent type (its own is a low-confidence guess) unless it
+    names a different discipline, which makes it a FIELD_SWITCH. Explicit
+    values replace carried ones: countries unless the message adds them
+    ("and", "also", "too"), a new budget over the old one ("cheaper" lowers
+    the carried budget instead), and `cleared_constraints` drops what the
+    message lifts ("any country is fine").
+    """
+    previous = (previous or {}) if follow_up else {}
+    text = " ".join((message or "").lower().split())
+    intent_type = update.get("intent") or IntentType.UNIVERSITY_DISCOVERY
+    if previous.get("intent") not in (None, IntentType.OUT_OF_SCOPE.value):
+        intent_type = previous["intent"]
+    cleared = cleared_constraints(text)
+    previous = {k: v for k, v in previous.items() if k not in cleared}
+
+    discipline = update.get("target_discipline") or previous.get("target_discipline")
+    if follow_up and update.get("target_discipline") and previous.get("target_discipline") not in (None, discipline):
+        intent_type = IntentType.FIELD_SWITCH
+
+    previous_countries = list(previous.get("target_countries") or [])
+    countries = list(update.get("target_countries") or [])
+    if not countries:
+        countries = previous_countries
+    elif follow_up and _ADDITIVE.search(text):
+        countries = previous_countries + [c for c in countries if c not in previous_countries]
+
+    budget = update.get("max_budget_usd")
+    if not budget and previous.get("max_budget_usd"):
+        budget = previous["max_budget_usd"]
+        if _CHEAPER.search(text):
+            budget = int(budget * CHEAPER_BUDGET_FACTOR)
+
+    try:
+        intent_value = IntentType(intent_type).value
+    except ValueError:
+        intent_value = IntentType.UNIVERSITY_DISCOVERY.value
+
+    return {
+        "intent": intent_value,
+        "target_discipline": discipline,
+        "target_degree": update.get("target_degree") or previous.get("target_degree"),
+        "max_budget_usd": budget,
+        "target_countries": countries,
+        "category_preference": update.get("category_preference") or previous.get("category_preference"),
+        "explicit_university_mentions": list(update.get("explicit_university_mentions") or [])
+    }
+
+
+async def resolve_intent(message: str, user_profile: dict, previous: Optional[Dict] = None) -> Dict[str, Any]:
+    """
+    Intent state for this turn, given the previous user message's state.
+
+    Follow-ups are merged locally without an LLM call; anything else goes
+    through `detect_intent` and starts a new state. Results flagged
+    "unresolved" (no router available) are not meant to be stored, see
+    `storable_intent`.
+    """
+    if previous:
+        local_intent, confidence = classify_intent_locally(message)
+        if confidence < INTENT_LOCAL_CONFIDENCE and is_follow_up(message, local_intent):
+            metrics.inc("intent.follow_up")
+            merged = merge_intent(previous, local_intent, message, follow_up=True)
+            logger.info(f"Follow-up merged into previous intent: {merged['intent']}")
+            return merged
+    detected = await detect_intent(message, user_profile)
+    merged = merge_intent(previous, detected, message)
+    if detected.get("unresolved"):
+        merged["unresolved"] = True
+    return merged
+
+
+def storable_intent(intent: Optional[Dict]) -> Optional[Dict]:
+    """The state to store on the user message, None when the turn shouldn't replace the session's state."""
+    if not intent or intent.get("unresolved"):
+        return None
+    return intent
+
+
+def intent_stats() -> dict:
+    """How each turn's intent was resolved, and the share that skipped the LLM router."""
+    counts = {source: metrics.get_counter(f"intent.{source}") for source in INTENT_SOURCES}
+    turns = sum(counts.values())
+    return {
+        **counts,
+        "turns": turns,
+        "llm_avoided_rate": round(1 - counts["llm"] / turns, 3) if turns else None,
+    }
+
 def check_query_delta(current_intent: Dict, history: List[Dict]) -> Dict:
     """
-    Compares current intent with history to detect repetition or field switches.
+    Compares current intent with the previous user message's stored intent
+    to detect repetition or field switches.
     Returns a 'delta_context' dict explaining what changed.
     """
     if not history:
@@ -108,31 +687,48 @@ def check_query_delta(current_intent: Dict, history: List[Dict]) -> Dict:
     if not last_user_msg:
          return {"is_new_session": True, "change_summary": "Initial Query"}
 
-    # In a real system, we'd store the parsed intent of the last message.
-    # Here we have to infer or rely on the visible text comparison if intent wasn't stored.
-    # ideally we store intent in 'actions_taken' or metadata.
-    
     delta = {
         "is_repetition": False,
         "is_field_switch": False,
         "change_summary": "Follow-up query"
     }
     
-    # 1. Check Field Switch
     current_disc = current_intent.get("target_discipline")
-    # This is a weak check without stored history intent, but better than nothing.
     if current_intent.get("intent") == IntentType.FIELD_SWITCH:
         delta["is_field_switch"] = True
         delta["change_summary"] = f"User switched focus to {current_disc}"
+    
+    previous = last_user_msg.get("intent")
+    if not previous:
+        # Messages from before intents were stored
+        return delta
+    
+    changes = [
+        f"{field}: {previous.get(field) or 'any'} -> {current_intent.get(field) or 'any'}"
+        for field in CARRIED_CONSTRAINTS
+        if (previous.get(field) or None) != (current_intent.get(field) or None)
+    ]
+    previous_disc = previous.get("target_discipline")
+    if previous_disc and current_disc and previous_disc != current_disc:
+        delta["is_field_switch"] = True
+        delta["change_summary"] = f"User switched focus from {previous_disc} to {current_disc}"
+    elif changes:
+        delta["change_summary"] = "Refined constraints (" + "; ".join(changes) + ")"
+    elif previous.get("intent") == current_intent.get("intent"):
+        delta["is_repetition"] = True
+        delta["change_summary"] = "Same request as the previous message"
 
     return delta
 
 def normalize_string(s: str) -> str:
     return s.lower().strip() if s else ""
 
-def filter_programs(universities: List[Dict], intent: Dict, user_profile: Dict) -> List[Dict]:
+def filter_programs_scan(universities: List[Dict], intent: Dict, user_profile: Dict) -> List[Dict]:
     """
     Strictly filters university list based on Intent AND User Profile.
+
+    Reference implementation: scans every program. `filter_programs` gives
+    the same result from a ProgramIndex and uses this for ad-hoc lists.
     """
     filtered_universities = []
     
@@ -196,6 +792,222 @@ def filter_programs(universities: List[Dict], intent: Dict, user_profile: Dict)
 
     return filtered_universities
 
+MASTER_LEVEL_MARKERS = ("master", "ms", "m.sc")
+# What the scan assumes for a program without tuition
+MISSING_TUITION_USD = 999999
+_WORD = re.compile(r"\w+")
+
+
+def _filter_terms(intent: Dict, user_profile: Dict) -> tuple:
+    """(discipline, countries, master_only, max_budget), read the way `filter_programs_scan` reads them."""
+    target_discipline = normalize_string(intent.get("target_discipline"))
+    target_degree = normalize_string(intent.get("target_degree"))
+    countries = {normalize_string(c) for c in intent.get("target_countries", [])}
+    if not target_discipline and intent.get("intent") not in [IntentType.FIELD_SWITCH, IntentType.PROGRAM_SPECIFIC_QUERY]:
+        target_discipline = normalize_string(user_profile.get("field_of_study"))
+    master_only = "master" in target_degree or "ms" in target_degree
+    return target_discipline, countries, master_only, intent.get("max_budget_usd")
+
+
+def _program_column(programs, key: str, default=None) -> list:
+    """`[p.get(key, default) for p in programs]`; columnar catalog programs hand the column over directly."""
+    column = getattr(programs, "column", None)
+    if column is not None:
+        return column(key, default)
+    return [prog.get(key, default) for prog in programs]
+
+
+class ProgramIndex:
+    """
+    Lookups over every program of one catalog, built once so filtering is
+    posting-list intersection instead of a scan.
+
+    Programs are numbered in catalog order (university, then program), so
+    sorted positions regroup into universities in their original order.
+    - discipline: distinct normalized name/discipline strings -> positions,
+      plus word tokens -> those strings. A target is matched as a substring
+      (like the scan) against only the strings sharing its longest word,
+      once per target.
+    - country: normalized country -> universities -> their position ranges
+    - degree: positions of master-level programs
+    - budget: positions sorted by tuition; a budget is a bisect cut
+    """
+
+    def __init__(self, universities):
+        self.universities = tuple(universities)
+        self.programs = []
+        self.uni_of = []
+        self.tuition = []
+        self.ranges = []
+        self.uni_country = []
+        self.by_country: Dict[str, List[int]] = {}
+        self.by_text: Dict[str, List[int]] = {}
+        self.texts_by_word: Dict[str, set] = {}
+        master = []
+        # Names, disciplines and levels repeat a lot: normalize each distinct value once
+        normalized: Dict[Any, str] = {}
+        size = 0
+        for u, uni in enumerate(self.universities):
+            country = normalize_string(uni.get("country"))
+            self.uni_country.append(country)
+            self.by_country.setdefault(country, []).append(u)
+            programs = uni.get("programs", [])
+            self.programs.append(programs)
+            columns = zip(
+                _program_column(programs, "name"),
+                _program_column(programs, "program_discipline"),
+                _program_column(programs, "degree_level"),
+                _program_column(programs, "tuition_per_year_usd", MISSING_TUITION_USD),
+            )
+            start = size
+            for pos, (name, discipline, level, tuition) in enumerate(columns, start):
+                self.uni_of.append(u)
+                self.tuition.append(MISSING_TUITION_USD if tuition is None else tuition)
+                for value in (name, discipline, level):
+                    if value not in normalized:
+                        normalized[value] = normalize_string(value)
+                for text in {normalized[name], normalized[discipline]}:
+                    self.by_text.setdefault(text, []).append(pos)
+                if any(marker in normalized[level] for marker in MASTER_LEVEL_MARKERS):
+                    master.append(pos)
+                size = pos + 1
+            self.ranges.append((start, size))
+        self.size = size
+        for text in self.by_text:
+            for word in _WORD.findall(text):
+                self.texts_by_word.setdefault(word, set()).add(text)
+        self.master = master
+        self.master_set = frozenset(master)
+        self.by_tuition = sorted(range(size), key=self.tuition.__getitem__)
+        self.sorted_tuition = [self.tuition[pos] for pos in self.by_tuition]
+        self._disciplines: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self.size
+
+    def discipline_postings(self, target: str) -> tuple:
+        """(sorted positions, position set) of programs whose name or discipline contains `target`."""
+        postings = self._disciplines.get(target)
+        if postings is not None:
+            return postings
+        words = _WORD.findall(target)
+        if words:
+            # An occurrence of the target puts its longest word inside one word of the string
+            longest = max(words, key=len)
+            texts = set()
+            for word, word_texts in self.texts_by_word.items():
+                if longest in word:
+                    texts |= word_texts
+        else:
+            texts = self.by_text.keys()
+        matched = set()
+        for text in texts:
+            if target in text:
+                matched.update(self.by_text[text])
+        postings = (sorted(matched), frozenset(matched))
+        with self._lock:
+            if len(self._disciplines) >= 1024:
+                self._disciplines.clear()
+            self._disciplines[target] = postings
+        return postings
+
+    def filter(self, discipline: str, countries: set, master_only: bool, max_budget) -> List[Dict]:
+        # (size, positions, membership test) per active constraint; the smallest drives
+        constraints = []
+        if discipline:
+            ordered, matched = self.discipline_postings(discipline)
+            constraints.append((len(ordered), lambda: ordered, matched.__contains__))
+        if countries:
+            unis = sorted(u for country in countries for u in self.by_country.get(country, ()))
+            size = sum(self.ranges[u][1] - self.ranges[u][0] for u in unis)
+            constraints.append((
+                size,
+                lambda: [pos for u in unis for pos in range(*self.ranges[u])],
+                lambda pos: self.uni_country[self.uni_of[pos]] in countries,
+            ))
+        if master_only:
+            constraints.append((len(self.master), lambda: self.master, self.master_set.__contains__))
+        if max_budget:
+            cut = bisect.bisect_right(self.sorted_tuition, max_budget)
+            constraints.append((cut, lambda: sorted(self.by_tuition[:cut]), lambda pos: self.tuition[pos] <= max_budget))
+
+        if constraints:
+            constraints.sort(key=lambda c: c[0])
+            positions = constraints[0][1]()
+            for _, _, test in constraints[1:]:
+                positions = [pos for pos in positions if test(pos)]
+        else:
+            positions = range(self.size)
+
+        filtered_universities = []
+        current = None
+        for pos in positions:
+            u = self.uni_of[pos]
+            if u != current:
+                current = u
+                uni_copy = self.universities[u].copy()
+                uni_copy["programs"] = valid_programs = []
+                filtered_universities.append(uni_copy)
+            valid_programs.append(self.programs[u][pos - self.ranges[u][0]])
+        return filtered_universities
+
+
+class ProgramIndexCache:
+    """
+    The ProgramIndex of the current catalog snapshot.
+
+    Snapshot records are immutable and replaced on every reload, so the
+    identities of the university records pin the index to one catalog
+    version. Lists of plain dicts could change under it and get no index.
+    """
+
+    def __init__(self):
+        self._key: Optional[tuple] = None
+        self._index: Optional[ProgramIndex] = None
+        self._lock = threading.Lock()
+        self.builds = 0
+
+    def get(self, universities) -> Optional[ProgramIndex]:
+        key = tuple(map(id, universities))
+        index = self._index
+        if index is not None and self._key == key:
+            return index
+        if not all(type(uni) is MappingProxyType for uni in universities):
+            return None
+        with self._lock:
+            if self._index is not None and self._key == key:
+                return self._index
+            started = time.perf_counter()
+            index = ProgramIndex(universities)
+            self._key, self._index = key, index
+            self.builds += 1
+            metrics.inc("program_index.builds")
+            logger.info(f"Built program index: {len(index)} programs in {(time.perf_counter() - started) * 1000:.0f}ms")
+            return index
+
+    def clear(self):
+        with self._lock:
+            self._key = self._index = None
+
+
+program_indexes = ProgramIndexCache()
+
+
+def filter_programs(universities: List[Dict], intent: Dict, user_profile: Dict) -> List[Dict]:
+    """
+    Strictly filters university list based on Intent AND User Profile.
+
+    Catalog snapshots are answered from their ProgramIndex; anything else is
+    scanned. Either way the result matches `filter_programs_scan`.
+    """
+    index = program_indexes.get(universities)
+    if index is None:
+        return filter_programs_scan(universities, intent, user_profile)
+    target_discipline, countries, master_only, max_budget = _filter_terms(intent, user_profile)
+    logger.info(f"Filtering -> Discipline: {target_discipline} (Strict: {intent.get('intent') in [IntentType.FIELD_SWITCH, IntentType.PROGRAM_SPECIFIC_QUERY]})")
+    return index.filter(target_discipline, countries, master_only, max_budget)
+
 def compute_response_fingerprint(response_text: str) -> str:
     """hashes response to detect exact duplicates"""
     return hashlib.md5(response_text.encode()).hexdigest()
@@ -10,17 +10,23 @@ from datetime import datetime
 from database import get_db
 from models import User, ShortlistedUniversity, Task, ChatMessage, ChatSession
 from auth import get_current_user
+from admission import Ticket, admit
 from ai_counsellor import transcribe_audio, get_counsellor_response
-from real_universities_data import UNIVERSITIES_DATA
+from recommendation_engine import resolve_intent, storable_intent
+from chat_context import load_chat_context, load_previous_intent, load_profile
+from conversation_summary import schedule_summary
 
 router = APIRouter(prefix="/api/voice", tags=["Voice"])
 
 TEMP_AUDIO_DIR = "temp_audio"
+# Voice turns are short, so keep a little more of the conversation
+VOICE_HISTORY_LIMIT = 10
 os.makedirs(TEMP_AUDIO_DIR, exist_ok=True)
 
 @router.post("/transcribe")
 async def transcribe_only(
-    file: UploadFile = File(...)
+    file: UploadFile = File(...),
+    _ticket: Ticket = Depends(admit("voice"))
 ):
     """
     Dictation Mode: Audio -> Text only.
@@ -48,6 +54,7 @@ async def voice_chat(
     file: UploadFile = File(...),
     language: str = "en",
     session_id: int = None,
+    _ticket: Ticket = Depends(admit("voice")),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -80,6 +87,7 @@ async def voice_chat(
          error_message = f"I encountered a technical issue: {str(e)[:50]}"
 
     # 2. Get AI Response (Only if no error)
+    intent = None
     if 'transcription_error' in locals() and transcription_error:
         ai_response = {
             "message": "I'm sorry, I'm having trouble accessing my hearing services right now. Please try again in a moment.",
@@ -88,27 +96,10 @@ async def voice_chat(
         }
     else:
         # Normal AI Flow
-        profile = current_user.profile.__dict__ if current_user.profile else {}
-        shortlisted_objs = db.query(ShortlistedUniversity).filter(ShortlistedUniversity.user_id == current_user.id).all()
-        shortlisted = [s.__dict__ for s in shortlisted_objs]
-        for s in shortlisted:
-             uni = next((u for u in UNIVERSITIES_DATA if u["id"] == s["university_id"]), {})
-             s["university"] = uni
-             
-        tasks_objs = db.query(Task).filter(Task.user_id == current_user.id).all()
-        tasks = [t.__dict__ for t in tasks_objs]
-        
-        # --- FETCH HISTORY ---
-        history = []
-        if session_id:
-            # Get last 10 messages for context
-            db_messages = db.query(ChatMessage).filter(
-                ChatMessage.session_id == session_id
-            ).order_by(ChatMessage.created_at.desc()).limit(10).all()
-            
-            # Reverse to chronological order and format
-            for msg in reversed(db_messages):
-                history.append({"role": msg.role, "content": msg.content})
+        profile = load_profile(db, current_user.id)
+        context = load_chat_context(db, current_user.id, session_id, history_limit=VOICE_HISTORY_LIMIT)
+        # Classified on the transcript alone, before the voice-mode instructions are prepended
+        intent = await resolve_intent(user_text, profile, load_previous_intent(db, session_id))
         
         # Inject Language Instruction if not English
         context_prefix = ""
@@ -121,17 +112,19 @@ async def voice_chat(
         context_prefix += "[SYSTEM: VOICE MODE ACTIVE. Keep response CONVERSATIONAL, SHORT (max 2-3 sentences), and spoken-style. No markdown lists.] "
 
         # HARD FIX FOR REPETITION
-        if len(history) > 0:
+        if len(context.history) > 0:
              context_prefix += " [SYSTEM: CONVERSATION CONTINUATION. We are already talking. Do NOT say 'Hello', 'Welcome back' or greet the user. Answer the query directly.]"
         
         ai_response = await get_counsellor_response(
             message=context_prefix + user_text,
             user_data=current_user.__dict__,
             profile=profile,
-            universities=UNIVERSITIES_DATA,
-            shortlisted=shortlisted,
-            tasks=tasks,
-            history=history
+            universities=context.universities,
+            shortlisted=context.shortlisted,
+            tasks=context.tasks,
+            history=context.history,
+            intent=intent,
+            summary=context.summary
         )
         
     response_text = ai_response.get("message", "I didn't catch that.")
@@ -156,6 +149,8 @@ async def voice_chat(
                 role="user",
                 content=user_text
             )
+            if storable_intent(intent) is not None:
+                user_msg.intent = intent
             db.add(user_msg)
         
         # 2. Save AI Message
@@ -176,6 +171,8 @@ async def voice_chat(
         if session:
             session.updated_at = datetime.now()
             db.commit()
+        
+        schedule_summary(db, current_user.id, session_id, keep_recent=VOICE_HISTORY_LIMIT)
             
     except Exception as e:
         print(f"Persistence Error: {e}")
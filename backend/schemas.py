@@ -29,6 +29,12 @@ class TaskStatus(str, Enum):
     IN_PROGRESS = "IN_PROGRESS"
     COMPLETED = "COMPLETED"
 
+class JobStatus(str, Enum):
+    PENDING = "PENDING"
+    RUNNING = "RUNNING"
+    COMPLETED = "COMPLETED"
+    FAILED = "FAILED"
+
 class UniversityCategory(str, Enum):
     DREAM = "DREAM"
     TARGET = "TARGET"
@@ -263,6 +269,19 @@ class TaskResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class JobResponse(BaseModel):
+    id: int
+    kind: str
+    status: JobStatus
+    attempts: int
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    created_at: datetime
+    completed_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
 class ChatMessageCreate(BaseModel):
     content: str
     session_id: Optional[int] = None
@@ -308,6 +327,11 @@ class ChatMessageResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class ChatHistoryPage(BaseModel):
+    messages: List[ChatMessageResponse]  # oldest first
+    next_cursor: Optional[int] = None  # pass as `before` (or `after`) for the next page; None at the end
+    has_more: bool
+
 class DashboardResponse(BaseModel):
     user: UserResponse
     profile: Optional[ProfileResponse] = None
@@ -3,6 +3,8 @@ Pytest configuration and shared fixtures for backend tests.
 """
 import pytest
 import os
+import json
+import asyncio
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from fastapi.testclient import TestClient
@@ -205,3 +207,95 @@ def test_task(db_session, test_user):
     db_session.commit()
     db_session.refresh(task)
     return task
+
+
+class FakeLLMResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeLLMModels:
+    """Mimics `client.aio.models` with a fixed network delay and a canned JSON reply."""
+
+    def __init__(self, delay=0.0, payload=None):
+        self.delay = delay
+        self.payload = payload or {
+            "intent": "UNIVERSITY_DISCOVERY",
+            "message": "Here are a few directions worth exploring.",
+            "actions": [],
+            "suggested_universities": [],
+            "suggested_next_questions": []
+        }
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def generate_content(self, model, contents, config=None):
+        self.calls.append({"model": model, "contents": contents, "config": config})
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+        return FakeLLMResponse(json.dumps(self.payload))
+
+    async def generate_content_stream(self, model, contents, config=None, chunk_size=8):
+        """Yields the same reply in small chunks, spreading the delay across them."""
+        self.calls.append({"model": model, "contents": contents, "config": config, "stream": True})
+        text = json.dumps(self.payload)
+        chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+        for chunk in chunks:
+            await asyncio.sleep(self.delay / len(chunks))
+            yield FakeLLMResponse(chunk)
+
+
+class FakeCaches:
+    """Mimics `client.aio.caches`; records every cached-content handle it creates."""
+
+    def __init__(self):
+        self.created = []
+        self.fail = False
+
+    async def create(self, model, config=None):
+        if self.fail:
+            raise RuntimeError("400 INVALID_ARGUMENT: Cached content is too small")
+        name = f"cachedContents/fake-{len(self.created) + 1}"
+        self.created.append({"name": name, "model": model, "config": config})
+        return type("CachedContent", (), {"name": name})()
+
+
+class FakeLLMClient:
+    def __init__(self, models):
+        self.models = models
+        self.caches = FakeCaches()
+        self.aio = type("Aio", (), {"models": models, "caches": self.caches})()
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """Intent results, the catalog snapshot, context renders and prefix handles are process-wide; start every test cold."""
+    from catalog import catalog
+    from prompt_cache import prefix_cache
+    from recommendation_engine import intent_cache
+
+    intent_cache.clear()
+    catalog.invalidate()
+    prefix_cache.clear()
+    yield
+    intent_cache.clear()
+    catalog.invalidate()
+    prefix_cache.clear()
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    """Route every Gemini call to an in-memory fake; returns the fake `models` object."""
+    from gemini_key_manager import key_manager
+
+    models = FakeLLMModels()
+    fake_client = FakeLLMClient(models)
+    monkeypatch.setattr(key_manager, "keys", ["fake-key"])
+    monkeypatch.setattr(key_manager, "create_client", lambda exclude_indices=None: (fake_client, 0))
+    models.client = fake_client
+    return models
@@ -0,0 +1,214 @@
+"""
+Admission control tests - bounded queues, chat priority and fast 503s.
+"""
+import asyncio
+import json
+
+import httpx
+import pytest
+
+import admission as admission_module
+from admission import AdmissionController, AdmissionRejected, Lane
+from auth import create_access_token, get_token_user_id
+from database import get_db
+from main import app
+from metrics import metrics
+
+LANES = {
+    "chat": Lane(priority=0, max_queue=2, max_wait_seconds=1.0),
+    "cold_email": Lane(priority=2, max_queue=2, max_wait_seconds=1.0),
+}
+
+
+def test_chat_overtakes_queued_cold_email():
+    controller = AdmissionController(1, LANES)
+    order = []
+
+    async def request(lane):
+        ticket = await controller.acquire(lane)
+        order.append(lane)
+        await asyncio.sleep(0.01)
+        ticket.release()
+
+    async def run():
+        holder = await controller.acquire("chat")
+        waiting = [asyncio.create_task(request("cold_email"))]
+        await asyncio.sleep(0)
+        waiting.append(asyncio.create_task(request("chat")))
+        await asyncio.sleep(0)
+        holder.release()
+        await asyncio.gather(*waiting)
+
+    asyncio.run(run())
+    assert order == ["chat", "cold_email"]
+    assert controller.stats()["active"] == 0
+
+
+def test_full_queue_sheds_immediately():
+    controller = AdmissionController(1, LANES)
+    metrics.reset()
+
+    async def acquire_and_release():
+        (await controller.acquire("chat")).release()
+
+    async def run():
+        holder = await controller.acquire("chat")
+        queued = [asyncio.create_task(acquire_and_release()) for _ in range(2)]
+        await asyncio.sleep(0)
+        assert metrics.snapshot()["gauges"]["admission.chat.queue_depth"] == 2
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.acquire("chat")
+        holder.release()
+        await asyncio.gather(*queued)
+        return rejected.value
+
+    rejected = asyncio.run(run())
+    assert rejected.reason == "queue_full"
+    assert rejected.retry_after >= 1
+    assert metrics.get_counter("admission.chat.rejected.queue_full") == 1
+    assert metrics.snapshot()["histograms"]["admission.chat.wait_ms"]["count"] == 3
+
+
+def test_waiting_past_the_lane_limit_is_shed():
+    controller = AdmissionController(1, {"chat": Lane(priority=0, max_queue=4, max_wait_seconds=0.05)})
+
+    async def run():
+        holder = await controller.acquire("chat")
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.acquire("chat")
+        holder.release()
+        # The abandoned waiter must not swallow the freed slot
+        (await controller.acquire("chat")).release()
+        return rejected.value
+
+    assert asyncio.run(run()).reason == "timeout"
+    stats = controller.stats()
+    assert (stats["active"], stats["queued"]) == (0, {"chat": 0})
+
+
+def test_saturated_chat_returns_503(client, auth_headers, test_profile, fake_llm, monkeypatch):
+    controller = AdmissionController(1, {"chat": Lane(priority=0, max_queue=0, max_wait_seconds=1.0)})
+    monkeypatch.setattr(admission_module, "admission", controller)
+
+    async def run():
+        holder = await controller.acquire("chat")
+        transport = httpx.ASGITransport(app=client.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+            busy = await async_client.post("/api/chat", json={"content": "Tell me more about that"}, headers=auth_headers)
+            holder.release()
+            ok = await async_client.post("/api/chat", json={"content": "Tell me more about that"}, headers=auth_headers)
+        return busy, ok
+
+    busy, ok = asyncio.run(run())
+
+    assert busy.status_code == 503
+    assert int(busy.headers["Retry-After"]) >= 1
+    assert busy.json()["detail"]["error"] == "OVERLOADED"
+    assert ok.status_code == 200
+    # Only the admitted turn reached the model, and its ticket was returned
+    assert len(fake_llm.calls) == 2
+    assert controller.stats()["active"] == 0
+
+
+@pytest.mark.parametrize("path", ["/api/chat", "/api/chat/stream"])
+def test_queued_request_holds_no_db_session(client, auth_headers, test_profile, fake_llm, monkeypatch, path):
+    controller = AdmissionController(1, {"chat": Lane(priority=0, max_queue=1, max_wait_seconds=5.0)})
+    monkeypatch.setattr(admission_module, "admission", controller)
+    sessions = []
+    override = app.dependency_overrides[get_db]
+
+    def tracking_get_db():
+        sessions.append("opened")
+        yield from override()
+
+    monkeypatch.setitem(app.dependency_overrides, get_db, tracking_get_db)
+
+    async def run():
+        holder = await controller.acquire("chat")
+        transport = httpx.ASGITransport(app=client.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+            request = asyncio.create_task(
+                async_client.post(path, json={"content": "Tell me more about that"}, headers=auth_headers)
+            )
+            while controller.stats()["queued"]["chat"] == 0:
+                await asyncio.sleep(0.01)
+            opened_while_queued = len(sessions)
+            holder.release()
+            return opened_while_queued, await request
+
+    opened_while_queued, response = asyncio.run(run())
+
+    assert opened_while_queued == 0
+    assert response.status_code == 200 and sessions
+    assert controller.stats()["active"] == 0
+
+
+@pytest.mark.parametrize("path", ["/api/chat", "/api/chat/stream"])
+def test_invalid_token_is_rejected_before_queueing(client, monkeypatch, path):
+    controller = AdmissionController(1, {"chat": Lane(priority=0, max_queue=0, max_wait_seconds=1.0)})
+    monkeypatch.setattr(admission_module, "admission", controller)
+    admitted_before = metrics.get_counter("admission.chat.admitted")
+
+    async def run():
+        holder = await controller.acquire("chat")
+        transport = httpx.ASGITransport(app=client.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+            # The lane is full, but a bad token fails auth instead of being queued or shed
+            response = await async_client.post(path, json={"content": "Hi"}, headers={"Authorization": "Bearer not-a-token"})
+        holder.release()
+        return response
+
+    response = asyncio.run(run())
+
+    assert response.status_code == 401
+    assert metrics.get_counter("admission.chat.admitted") - admitted_before == 1
+    assert controller.stats()["active"] == 0
+
+
+def test_stream_ticket_released_when_user_is_missing(client, monkeypatch):
+    controller = AdmissionController(1, {"chat": Lane(priority=0, max_queue=0, max_wait_seconds=1.0)})
+    monkeypatch.setattr(admission_module, "admission", controller)
+    token = create_access_token({"sub": 999999})
+
+    response = client.post("/api/chat/stream", json={"content": "Hi"}, headers={"Authorization": f"Bearer {token}"})
+
+    assert response.status_code == 401
+    assert controller.stats()["active"] == 0
+
+
+def test_stream_ticket_released_when_client_leaves_before_the_body(client, auth_headers, test_profile, fake_llm, monkeypatch):
+    controller = AdmissionController(1, {"chat": Lane(priority=0, max_queue=0, max_wait_seconds=1.0)})
+    monkeypatch.setattr(admission_module, "admission", controller)
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST", "scheme": "http",
+        "path": "/api/chat/stream", "raw_path": b"/api/chat/stream", "root_path": "", "query_string": b"",
+        "headers": [(b"content-type", b"application/json"), (b"authorization", auth_headers["Authorization"].encode())],
+        "client": ("testclient", 50000), "server": ("testserver", 80),
+    }
+    messages = [{"type": "http.request", "body": json.dumps({"content": "Tell me more about that"}).encode()}]
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            # The client is gone: the headers are never delivered, so the body is never iterated
+            await asyncio.Event().wait()
+
+    asyncio.run(app(scope, receive, send))
+
+    assert len(fake_llm.calls) == 0
+    assert controller.stats()["active"] == 0
+
+
+def test_admission_resolves_before_other_dependencies():
+    admitted = [
+        route for route in app.routes
+        if any(dep.call.__module__ == "admission" for dep in getattr(getattr(route, "dependant", None), "dependencies", []))
+    ]
+    assert {"/api/chat", "/api/chat/stream", "/api/voice/chat"} <= {route.path for route in admitted}
+    for route in admitted:
+        admit = route.dependant.dependencies[0]
+        assert admit.call.__module__ == "admission", route.path
+        # Only the token is checked before queueing, without a database session
+        assert [dep.call for dep in admit.dependencies] == [get_token_user_id], route.path
@@ -0,0 +1,127 @@
+"""
+Background job tests - locking returns at once and the checklist arrives via a job.
+"""
+import asyncio
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from job_queue import JobWorkerPool, job_pool
+from models import BackgroundJob, JobStatus, Task, TaskStatus
+
+CHECKLIST = [
+    {"title": "Request transcripts", "description": "Official copies", "priority": 1},
+    {"title": "Book TOEFL", "description": "Score above 100", "priority": 2},
+]
+
+
+@pytest.fixture
+def job_db(db_engine, monkeypatch):
+    """Point the global pool at the test database."""
+    monkeypatch.setattr(job_pool, "session_factory", sessionmaker(bind=db_engine))
+    return job_pool
+
+
+def lock(client, auth_headers, shortlist_id):
+    response = client.post(f"/api/shortlist/{shortlist_id}/lock", headers=auth_headers)
+    assert response.status_code == 200
+    return response.json()["job_id"]
+
+
+def shortlist_task_titles(db_session, shortlist_id):
+    db_session.expire_all()
+    return {t.title for t in db_session.query(Task).filter(Task.shortlisted_university_id == shortlist_id)}
+
+
+def test_lock_returns_before_checklist_generation(client, auth_headers, test_profile, test_shortlist, db_session, fake_llm):
+    fake_llm.payload = CHECKLIST
+
+    job_id = lock(client, auth_headers, test_shortlist.id)
+
+    assert len(fake_llm.calls) == 0
+    assert "Prepare SOP for University of Michigan" in shortlist_task_titles(db_session, test_shortlist.id)
+    job = client.get(f"/api/jobs/{job_id}", headers=auth_headers).json()
+    assert job["status"] == "PENDING"
+    assert job["kind"] == "checklist"
+
+
+def test_job_replaces_placeholders(client, auth_headers, test_profile, test_shortlist, db_session, fake_llm, job_db):
+    fake_llm.payload = CHECKLIST
+    job_id = lock(client, auth_headers, test_shortlist.id)
+    started = db_session.query(Task).filter(Task.title.like("Prepare SOP%")).one()
+    started.status = TaskStatus.IN_PROGRESS
+    db_session.commit()
+
+    assert asyncio.run(job_db.run_job(job_id)) == JobStatus.COMPLETED
+
+    titles = shortlist_task_titles(db_session, test_shortlist.id)
+    # The placeholder the user already started is kept
+    assert titles == {"Request transcripts", "Book TOEFL", "Prepare SOP for University of Michigan"}
+    job = client.get(f"/api/jobs/{job_id}", headers=auth_headers).json()
+    assert job["status"] == "COMPLETED"
+    assert job["result"] == {"tasks_created": 2, "placeholders_replaced": 3}
+
+
+def test_failed_generation_retries_then_keeps_placeholders(client, auth_headers, test_profile, test_shortlist, db_session, fake_llm, job_db, monkeypatch):
+    fake_llm.payload = []
+    monkeypatch.setattr(job_db, "max_attempts", 2)
+    job_id = lock(client, auth_headers, test_shortlist.id)
+
+    assert asyncio.run(job_db.run_job(job_id)) == JobStatus.PENDING
+    assert asyncio.run(job_db.run_job(job_id)) == JobStatus.FAILED
+
+    job = db_session.get(BackgroundJob, job_id)
+    assert job.attempts == 2
+    assert "No checklist generated" in job.error
+    assert len(shortlist_task_titles(db_session, test_shortlist.id)) == 4
+
+
+def test_unlocked_before_job_runs_is_skipped(client, auth_headers, test_profile, test_shortlist, db_session, fake_llm, job_db):
+    fake_llm.payload = CHECKLIST
+    job_id = lock(client, auth_headers, test_shortlist.id)
+    client.post(f"/api/shortlist/{test_shortlist.id}/unlock?confirm=true", headers=auth_headers)
+
+    assert asyncio.run(job_db.run_job(job_id)) == JobStatus.COMPLETED
+
+    assert len(fake_llm.calls) == 0
+    assert shortlist_task_titles(db_session, test_shortlist.id) == set()
+
+
+def test_other_users_jobs_are_hidden(client, auth_headers, db_session):
+    job = BackgroundJob(user_id=None, kind="checklist", status=JobStatus.PENDING, attempts=0, payload={})
+    db_session.add(job)
+    db_session.commit()
+
+    assert client.get(f"/api/jobs/{job.id}", headers=auth_headers).status_code == 404
+
+
+def test_pool_recovers_unfinished_jobs_with_bounded_workers(db_engine, db_session):
+    SessionFactory = sessionmaker(bind=db_engine)
+    in_flight = {"now": 0, "max": 0}
+
+    async def slow_handler(db, payload):
+        in_flight["now"] += 1
+        in_flight["max"] = max(in_flight["max"], in_flight["now"])
+        await asyncio.sleep(0.02)
+        in_flight["now"] -= 1
+        return {"n": payload["n"]}
+
+    # One job was mid-run when the previous process died
+    statuses = [JobStatus.PENDING] * 4 + [JobStatus.RUNNING, JobStatus.COMPLETED]
+    db_session.add_all([
+        BackgroundJob(kind="slow", status=status, attempts=0, payload={"n": n}) for n, status in enumerate(statuses)
+    ])
+    db_session.commit()
+
+    async def run_pool():
+        pool = JobWorkerPool(SessionFactory, size=2, max_attempts=3, retry_delay_seconds=0)
+        pool.register("slow", slow_handler)
+        recovered = await pool.start()
+        await pool._queue.join()
+        await pool.stop()
+        return recovered
+
+    assert asyncio.run(run_pool()) == 5
+    assert in_flight["max"] == 2
+    db_session.expire_all()
+    assert db_session.query(BackgroundJob).filter(BackgroundJob.status == JobStatus.COMPLETED).count() == 6
@@ -0,0 +1,73 @@
+"""
+Catalog snapshot tests - one eager load, read-only records, reload on invalidate.
+"""
+import pytest
+from sqlalchemy import event
+
+from catalog import catalog
+from models import Program, ProgramCategory, University
+
+
+@pytest.fixture
+def catalog_queries(db_engine):
+    """SQL statements that read the universities or programs tables."""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        lowered = statement.lower()
+        if "from universities" in lowered or "from programs" in lowered:
+            statements.append(statement)
+
+    event.listen(db_engine, "before_cursor_execute", capture)
+    yield statements
+    event.remove(db_engine, "before_cursor_execute", capture)
+
+
+@pytest.fixture
+def mit_program(db_session, test_universities):
+    program = Program(
+        university_id=test_universities[0].id, name="MS Computer Science", degree_level="Master's",
+        program_category=ProgramCategory.STEM, program_discipline="Computer Science", tuition_per_year_usd=55000
+    )
+    db_session.add(program)
+    db_session.commit()
+    return program
+
+
+def test_snapshot_is_read_only_and_indexed(db_session, test_universities, mit_program, catalog_queries):
+    snapshot = catalog.get(db_session)
+
+    assert len(catalog_queries) == 2  # universities, then all programs at once
+    mit = snapshot.find("mit")
+    assert snapshot.get(mit["id"]) is mit
+    assert mit in snapshot.in_country("USA")
+    assert [p["name"] for p in mit["programs"]] == ["MS Computer Science"]
+    assert "_sa_instance_state" not in mit
+    with pytest.raises(TypeError):
+        mit["name"] = "Changed"
+    assert catalog.get(db_session) is snapshot
+
+
+def test_invalidate_reloads_changed_catalog(db_session, test_universities):
+    before = catalog.get(db_session)
+    db_session.add(University(name="ETH Zurich", country="Switzerland"))
+    db_session.commit()
+
+    assert catalog.get(db_session) is before
+    catalog.invalidate()
+    after = catalog.get(db_session)
+
+    assert after.version > before.version
+    assert after.find("ETH Zurich")["country"] == "Switzerland"
+
+
+def test_chat_turn_issues_no_catalog_queries(client, auth_headers, test_profile, test_universities, mit_program, fake_llm, catalog_queries):
+    client.post("/api/chat", json={"content": "Suggest universities"}, headers=auth_headers)
+    catalog_queries.clear()
+
+    response = client.post("/api/chat", json={"content": "Tell me more about that"}, headers=auth_headers)
+
+    assert response.status_code == 200
+    assert catalog_queries == []
+    counsellor_prompt = fake_llm.calls[-1]["config"].system_instruction
+    assert "MS Computer Science" in counsellor_prompt
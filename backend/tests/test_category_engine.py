@@ -0,0 +1,66 @@
+"""
+Category engine tests - one vectorized pass, rows identical to categorize_university.
+"""
+import itertools
+
+from ai_counsellor import categorize_university
+from catalog import catalog
+from category_engine import CategoryEngine
+
+GPAS = [None, 0, 2, 2.8, 3.0, 3.2, 3.3, 3.5, 3.7, 4]
+TUITIONS = [None, 0, 9999, 15000, 30000, 39999.5, 40000, 48000, 60000, 60001, 95000]
+RATES = [None, 0, 0.05, 0.1, 0.3, 0.4, 0.9]
+PROFILES = [
+    {},
+    {"gpa": 3.2, "budget_per_year": 50000},
+    {"gpa": 3.5, "budget_per_year": 40000},
+    {"gpa": 2, "budget_per_year": 0},
+    {"gpa": 3.8, "budget_per_year": 12345.5},
+    {"gpa": None, "budget_per_year": 100000},
+]
+
+
+def grid_universities():
+    return [
+        {"id": i, "min_gpa": gpa, "tuition_per_year": tuition, "acceptance_rate": rate}
+        for i, (gpa, tuition, rate) in enumerate(itertools.product(GPAS, TUITIONS, RATES))
+    ]
+
+
+def test_rows_match_scalar_across_boundaries():
+    universities = grid_universities()
+    engine = CategoryEngine(universities)
+    seen = set()
+
+    for profile in PROFILES:
+        categories = engine.categorize(profile)
+        rows = [categories.row(i) for i in range(len(universities))]
+        assert rows == [categorize_university(uni, profile) for uni in universities], profile
+        seen.update((row[0], row[3], row[4]) for row in rows)
+    assert {s[0] for s in seen} == {"DREAM", "TARGET", "SAFE"}
+    assert {s[1] for s in seen} == {s[2] for s in seen} == {"Low", "Medium", "High"}
+
+
+def test_lookup_by_id():
+    universities = grid_universities()[:5] + [{"name": "No id"}]
+    categories = CategoryEngine(universities).categorize({"gpa": 3.4})
+
+    assert categories.for_id(3) == categorize_university(universities[3], {"gpa": 3.4})
+    assert categories.for_id(999) is None
+    assert len(categories) == 6
+
+
+def test_endpoints_match_scalar(client, auth_headers, db_session, test_profile, test_universities):
+    profile = {"gpa": test_profile.gpa, "budget_per_year": test_profile.budget_per_year}
+    expected = {
+        uni.id: categorize_university({c.name: getattr(uni, c.name) for c in uni.__table__.columns}, profile)
+        for uni in test_universities
+    }
+
+    listed = client.get("/api/universities", headers=auth_headers).json()
+    for uni in listed:
+        assert (uni["category"], uni["fit_reason"], uni["risk_reason"], uni["acceptance_chance"], uni["cost_level"]) == expected[uni["id"]]
+
+    compared = client.get(f"/api/universities/compare?ids={test_universities[0].id},{test_universities[1].id}", headers=auth_headers).json()
+    assert [u["fit_reason"] for u in compared["universities"]] == [expected[test_universities[i].id][1] for i in (0, 1)]
+    assert catalog.get(db_session).categories is catalog.get(db_session).categories  # built once per version
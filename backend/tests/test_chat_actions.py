@@ -0,0 +1,112 @@
+"""
+Chat action executor tests - in-order semantics, same summary, constant round-trips.
+"""
+from sqlalchemy import event
+
+from catalog import catalog
+from chat_actions import execute_chat_actions
+from models import ShortlistedUniversity, Task, University, UserStage
+
+
+def shortlist(uni_id, category="TARGET"):
+    return {"type": "shortlist_university", "params": {"university_id": uni_id, "category": category}}
+
+
+def test_actions_see_earlier_actions(db_session, test_user, test_universities):
+    mit, michigan, state = (u.id for u in test_universities)
+
+    summary = execute_chat_actions(db_session, test_user, [
+        shortlist(mit),
+        shortlist(michigan, "SAFE"),
+        shortlist(mit),
+        shortlist(9999),
+        {"type": "lock_university", "params": {"university_id": michigan}},
+        shortlist(state),
+        {"type": "create_task", "params": {"title": "Book IELTS"}},
+        {"type": "update_task", "params": {"task_id": 12345, "status": "COMPLETED"}},
+    ])
+
+    executed = summary["executed"]
+    assert [a["type"] for a in executed] == ["shortlist_university", "shortlist_university", "lock_university", "create_task"]
+    assert executed[1]["shortlist_id"] is not None and executed[3]["task_id"] is not None
+    assert executed[2]["university_name"] == "University of Michigan"
+    assert [b["reason"] for b in summary["blocked"]] == [
+        "Already shortlisted", "University not found", "Cannot modify shortlist after locking", "Task not found"
+    ]
+    assert summary["final_stage"] == "APPLICATION"
+    assert test_user.current_stage == UserStage.APPLICATION
+
+    locked = db_session.query(ShortlistedUniversity).filter_by(university_id=michigan).one()
+    assert locked.is_locked and len(locked.tasks) == 4
+    assert db_session.query(Task).filter_by(user_id=test_user.id).count() == 5
+
+
+def test_unlock_deletes_lock_tasks_and_regresses_stage(db_session, test_user, test_universities):
+    mit = test_universities[0].id
+    execute_chat_actions(db_session, test_user, [shortlist(mit), {"type": "lock_university", "params": {"university_id": mit}}])
+    task_id = db_session.query(Task).filter_by(user_id=test_user.id).first().id
+
+    summary = execute_chat_actions(db_session, test_user, [
+        {"type": "update_task", "params": {"task_id": task_id, "status": "COMPLETED"}},
+        {"type": "unlock_university", "params": {"university_id": mit}},
+        {"type": "update_task", "params": {"task_id": task_id, "status": "PENDING"}},
+    ])
+
+    unlock = summary["executed"][1]
+    assert (unlock["tasks_deleted"], unlock["stage_regressed"], unlock["new_stage"]) == (4, True, "DISCOVERY")
+    assert summary["blocked"] == [{"type": "update_task", "reason": "Task not found"}]
+    assert db_session.query(Task).filter_by(user_id=test_user.id).count() == 0
+
+
+def test_lock_then_unlock_in_one_reply_writes_no_tasks(db_session, test_user, test_universities):
+    mit = test_universities[0].id
+
+    summary = execute_chat_actions(db_session, test_user, [
+        shortlist(mit),
+        {"type": "lock_university", "params": {"university_id": mit}},
+        {"type": "unlock_university", "params": {"university_id": mit}},
+    ])
+
+    assert summary["executed"][2]["tasks_deleted"] == 4
+    assert db_session.query(Task).count() == 0
+    assert db_session.query(ShortlistedUniversity).one().is_locked is False
+
+
+def test_string_university_ids_are_accepted(db_session, test_user, test_universities):
+    mit, michigan = (str(u.id) for u in test_universities[:2])
+
+    summary = execute_chat_actions(db_session, test_user, [
+        shortlist(mit),
+        shortlist(michigan),
+        {"type": "lock_university", "params": {"university_id": mit}},
+        shortlist("MIT"),
+        {"type": "lock_university", "params": {"university_id": None}},
+    ])
+
+    assert [a["type"] for a in summary["executed"]] == ["shortlist_university", "shortlist_university", "lock_university"]
+    assert summary["executed"][0]["university_id"] == int(mit)
+    assert [b["reason"] for b in summary["blocked"]] == ["Invalid university_id: 'MIT'", "Invalid university_id: None"]
+    assert db_session.query(ShortlistedUniversity).filter_by(university_id=int(mit)).one().is_locked
+
+
+def test_round_trips_do_not_grow_with_action_count(db_engine, db_session, test_user):
+    db_session.add_all([University(name=f"University {i}", country="Germany") for i in range(9)])
+    db_session.commit()
+    catalog.invalidate()
+    ids = [u.id for u in db_session.query(University).order_by(University.id)]
+    catalog.get(db_session)
+    user_id = test_user.id
+
+    statements = []
+    event.listen(db_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    counts = []
+    for batch in (ids[:1], ids[1:]):
+        assert test_user.current_stage == UserStage.DISCOVERY  # reloads the expired user outside the window
+        statements.clear()
+        summary = execute_chat_actions(db_session, test_user, [shortlist(uni_id) for uni_id in batch])
+        assert len(summary["executed"]) == len(batch)
+        counts.append(len(statements))
+
+    assert counts[0] == counts[1]
+    assert db_session.query(ShortlistedUniversity).filter_by(user_id=user_id).count() == 9
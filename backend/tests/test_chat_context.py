@@ -0,0 +1,80 @@
+"""
+Chat context loader tests - a fixed number of queries however much the user has.
+"""
+import pytest
+from sqlalchemy import event
+
+from catalog import catalog
+from chat_context import history_window, load_chat_context, load_profile
+from models import ChatMessage, ChatSession, ShortlistedUniversity, Task, TaskStatus, University, UniversityCategory
+
+
+@pytest.fixture
+def count_queries(db_engine):
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db_engine, "before_cursor_execute", capture)
+    yield statements
+    event.remove(db_engine, "before_cursor_execute", capture)
+
+
+def grow(db_session, user, count):
+    """Add `count` shortlisted universities and tasks for the user."""
+    start = db_session.query(University).count()
+    universities = [University(name=f"University {start + i}", country="Germany") for i in range(count)]
+    db_session.add_all(universities)
+    db_session.flush()
+    for uni in universities:
+        db_session.add(ShortlistedUniversity(user_id=user.id, university_id=uni.id, category=UniversityCategory.TARGET))
+        db_session.add(Task(user_id=user.id, title=f"Apply to {uni.name}", status=TaskStatus.PENDING))
+    db_session.commit()
+    catalog.invalidate()
+
+
+def test_loader_returns_plain_context(db_session, test_user, test_profile):
+    grow(db_session, test_user, 2)
+    session = ChatSession(user_id=test_user.id, title="t")
+    db_session.add(session)
+    db_session.flush()
+    messages = [ChatMessage(user_id=test_user.id, session_id=session.id, role="user", content=f"m{i}") for i in range(history_window(2) + 2)]
+    db_session.add_all(messages)
+    db_session.commit()
+
+    context = load_chat_context(db_session, test_user.id, session.id, messages[-1].id, history_limit=2)
+
+    assert [s["university"]["name"] for s in context.shortlisted] == ["University 0", "University 1"]
+    assert [t["status"] for t in context.tasks] == ["PENDING", "PENDING"]
+    # Up to the limit plus a batch the summary has not folded yet
+    assert [m["content"] for m in context.history] == [f"m{i}" for i in range(1, history_window(2) + 1)]
+    assert "_sa_instance_state" not in load_profile(db_session, test_user.id)
+
+
+def test_loader_query_count_is_constant(db_session, test_user, test_profile, count_queries):
+    user_id = test_user.id
+    counts = []
+    for added in (1, 10):
+        grow(db_session, test_user, added)
+        catalog.get(db_session)
+        count_queries.clear()
+        load_profile(db_session, user_id)
+        load_chat_context(db_session, user_id, session_id=1)
+        counts.append(len(count_queries))
+
+    # profile, shortlist, tasks, session summary, history
+    assert counts == [5, 5]
+
+
+def test_chat_turn_query_count_is_constant(client, auth_headers, test_user, test_profile, fake_llm, db_session, count_queries):
+    counts = []
+    for added in (1, 10):
+        grow(db_session, test_user, added)
+        client.post("/api/chat", json={"content": "Tell me more about that"}, headers=auth_headers)
+        count_queries.clear()
+        response = client.post("/api/chat", json={"content": "Tell me more about that"}, headers=auth_headers)
+        assert response.status_code == 200
+        counts.append(len(count_queries))
+
+    assert counts[0] == counts[1]
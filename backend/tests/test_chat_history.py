@@ -0,0 +1,107 @@
+"""
+Chat history tests - keyset pages, catalog hydration, constant cost per page.
+"""
+import pytest
+from sqlalchemy import event
+
+from models import ChatMessage, ChatSession, ShortlistedUniversity, UniversityCategory
+
+
+def make_session(db_session, user, count, suggested=None):
+    session = ChatSession(user_id=user.id, title="History")
+    db_session.add(session)
+    db_session.flush()
+    db_session.add_all([
+        ChatMessage(
+            user_id=user.id, session_id=session.id, role="assistant" if i % 2 else "user",
+            content=f"m{i}", suggested_universities=suggested
+        )
+        for i in range(count)
+    ])
+    db_session.commit()
+    return session.id
+
+
+def contents(response):
+    return [m["content"] for m in response.json()["messages"]]
+
+
+def test_latest_page_then_scroll_back(client, auth_headers, db_session, test_user):
+    session_id = make_session(db_session, test_user, 7)
+
+    page = client.get(f"/api/chat/history/{session_id}?limit=3", headers=auth_headers)
+    assert contents(page) == ["m4", "m5", "m6"]
+    assert page.json()["has_more"] is True
+
+    seen = contents(page)
+    while page.json()["has_more"]:
+        cursor = page.json()["next_cursor"]
+        page = client.get(f"/api/chat/history/{session_id}?limit=3&before={cursor}", headers=auth_headers)
+        seen = contents(page) + seen
+
+    assert seen == [f"m{i}" for i in range(7)]
+    assert page.json()["next_cursor"] is None
+
+
+def test_after_cursor_fetches_newer_messages(client, auth_headers, db_session, test_user):
+    session_id = make_session(db_session, test_user, 5)
+    ids = [m.id for m in db_session.query(ChatMessage.id).order_by(ChatMessage.id)]
+
+    page = client.get(f"/api/chat/history/{session_id}?limit=2&after={ids[0]}", headers=auth_headers)
+    assert contents(page) == ["m1", "m2"]
+    assert page.json()["next_cursor"] == ids[2]
+
+    page = client.get(f"/api/chat/history/{session_id}?limit=2&after={ids[2]}", headers=auth_headers)
+    assert contents(page) == ["m3", "m4"]
+    assert page.json()["has_more"] is False
+
+
+def test_both_cursors_rejected(client, auth_headers, db_session, test_user):
+    session_id = make_session(db_session, test_user, 1)
+
+    response = client.get(f"/api/chat/history/{session_id}?before=5&after=1", headers=auth_headers)
+
+    assert response.status_code == 400
+
+
+def test_suggestions_hydrated_from_catalog(client, auth_headers, db_session, test_user, test_universities):
+    mit, michigan, _ = test_universities
+    db_session.add(ShortlistedUniversity(user_id=test_user.id, university_id=mit.id, category=UniversityCategory.TARGET))
+    db_session.commit()
+    session_id = make_session(db_session, test_user, 1, suggested=[
+        {"university_id": mit.id}, {"university_id": michigan.id, "name": "Stale name"}
+    ])
+
+    suggestions = client.get(f"/api/chat/history/{session_id}", headers=auth_headers).json()["messages"][0]["suggested_universities"]
+
+    assert [s["name"] for s in suggestions] == ["MIT", "University of Michigan"]
+    assert [s["is_shortlisted"] for s in suggestions] == [True, False]
+    stored = db_session.query(ChatMessage).one()
+    db_session.refresh(stored)
+    assert stored.suggested_universities[1]["name"] == "Stale name"
+
+
+@pytest.fixture
+def count_queries(db_engine):
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db_engine, "before_cursor_execute", capture)
+    yield statements
+    event.remove(db_engine, "before_cursor_execute", capture)
+
+
+def test_page_cost_does_not_grow_with_session(client, auth_headers, db_session, test_user, test_universities, count_queries):
+    suggested = [{"university_id": u.id} for u in test_universities]
+    counts = []
+    for size in (5, 60):
+        session_id = make_session(db_session, test_user, size, suggested=suggested)
+        client.get(f"/api/chat/history/{session_id}?limit=5", headers=auth_headers)
+        count_queries.clear()
+        response = client.get(f"/api/chat/history/{session_id}?limit=5", headers=auth_headers)
+        assert len(response.json()["messages"]) == 5
+        counts.append(len(count_queries))
+
+    assert counts[0] == counts[1]
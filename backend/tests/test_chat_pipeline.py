@@ -0,0 +1,38 @@
+"""
+Chat turn pipelining tests - intent detection overlaps context loading.
+"""
+import gc
+import time
+
+import main
+from metrics import metrics
+
+MODEL_DELAY_SECONDS = 0.3
+CONTEXT_DELAY_SECONDS = 0.3
+
+
+def test_intent_overlaps_context_loading(client, auth_headers, test_profile, fake_llm, monkeypatch):
+    """A turn costs ~intent|context + generate, not intent + context + generate."""
+    fake_llm.delay = MODEL_DELAY_SECONDS
+    original_loader = main.load_chat_context
+
+    def slow_loader(*args, **kwargs):
+        time.sleep(CONTEXT_DELAY_SECONDS)
+        return original_loader(*args, **kwargs)
+
+    monkeypatch.setattr(main, "load_chat_context", slow_loader)
+    metrics.reset()
+    # Keep a full collection of earlier tests' garbage out of the timed window
+    gc.collect()
+
+    started = time.perf_counter()
+    response = client.post("/api/chat", json={"content": "Tell me more about that"}, headers=auth_headers)
+    elapsed = time.perf_counter() - started
+
+    assert response.status_code == 200
+    sequential = 2 * MODEL_DELAY_SECONDS + CONTEXT_DELAY_SECONDS
+    assert elapsed < sequential - 0.15, f"turn was not pipelined: {elapsed:.2f}s"
+
+    histograms = metrics.snapshot()["histograms"]
+    for stage in ("session", "intent", "context", "intent_wait", "generate", "actions", "persist", "total"):
+        assert histograms[f"chat.{stage}_ms"]["count"] == 1
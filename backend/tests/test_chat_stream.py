@@ -0,0 +1,84 @@
+"""
+Streaming chat tests - SSE framing, incremental message text and single persistence.
+"""
+import json
+
+from ai_counsellor import JsonStringFieldStreamer
+from metrics import metrics
+from models import ChatMessage, ShortlistedUniversity
+
+
+def parse_sse(body: str) -> list:
+    events = []
+    for frame in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in frame.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_streamer_decodes_escapes_split_across_chunks():
+    text = json.dumps({"message": 'Line one\nSay "hi" to München \U0001F393', "actions": []})
+    streamer = JsonStringFieldStreamer("message")
+
+    decoded = "".join(streamer.feed(text[i:i + 3]) for i in range(0, len(text), 3))
+
+    assert decoded == 'Line one\nSay "hi" to München \U0001F393'
+    assert streamer.done
+    assert json.loads(streamer.buffer)["actions"] == []
+
+
+def test_stream_emits_deltas_then_done(client, auth_headers, test_profile, fake_llm, db_session):
+    fake_llm.payload = {
+        "message": "Here are a few directions worth exploring for your Masters.",
+        "actions": [],
+        "suggested_universities": [],
+        "suggested_next_questions": ["What about Canada?"]
+    }
+    metrics.reset()
+
+    response = client.post("/api/chat/stream", json={"content": "Tell me more about that"}, headers=auth_headers)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = parse_sse(response.text)
+    kinds = [kind for kind, _ in events]
+    assert kinds[0] == "session"
+    assert kinds[-1] == "done"
+    assert kinds.count("delta") > 1
+
+    streamed = "".join(data["text"] for kind, data in events if kind == "delta")
+    done = events[-1][1]
+    assert streamed == fake_llm.payload["message"] == done["content"]
+    assert done["suggested_next_questions"] == ["What about Canada?"]
+
+    session_id = events[0][1]["session_id"]
+    assistant_messages = db_session.query(ChatMessage).filter(
+        ChatMessage.session_id == session_id, ChatMessage.role == "assistant"
+    ).all()
+    assert len(assistant_messages) == 1
+    assert metrics.snapshot()["histograms"]["chat_stream.ttft_ms"]["count"] == 1
+
+
+def test_stream_executes_actions_before_done(client, auth_headers, test_profile, test_universities, fake_llm, db_session, test_user):
+    university_id = test_universities[0].id
+    fake_llm.payload = {
+        "message": "Added it to your shortlist.",
+        "actions": [{"type": "shortlist_university", "params": {"university_id": university_id, "category": "TARGET"}}],
+        "suggested_universities": [{"university_id": university_id, "category": "TARGET"}],
+        "suggested_next_questions": []
+    }
+
+    response = client.post("/api/chat/stream", json={"content": "Tell me more about that"}, headers=auth_headers)
+
+    done = parse_sse(response.text)[-1]
+    assert done[0] == "done"
+    assert done[1]["actions_taken"][0]["executed"][0]["university_id"] == university_id
+    assert done[1]["suggested_universities"][0]["is_shortlisted"] is True
+    assert db_session.query(ShortlistedUniversity).filter(
+        ShortlistedUniversity.user_id == test_user.id
+    ).count() == 1
+
+
+def test_stream_unknown_session_is_404(client, auth_headers, fake_llm):
+    response = client.post("/api/chat/stream", json={"content": "Hi", "session_id": 9999}, headers=auth_headers)
+    assert response.status_code == 404
@@ -0,0 +1,126 @@
+"""
+Checklist store tests - locking reads persisted checklists instead of calling the LLM.
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.orm import sessionmaker
+
+from checklist_store import CHECKLIST_VERSION, get_cached_checklist, get_or_generate_checklist, save_checklist, warm_checklists
+from job_queue import job_pool
+from models import BackgroundJob, ChecklistCache, Task, University
+
+CHECKLIST = [
+    {"title": "Request transcripts", "description": "Official copies", "priority": 1},
+    {"title": "Book TOEFL", "description": "Score above 100", "priority": 2},
+]
+
+
+def test_checklist_job_persists_generated_checklist(client, auth_headers, test_profile, test_shortlist, db_engine, db_session, fake_llm, monkeypatch):
+    fake_llm.payload = CHECKLIST
+    monkeypatch.setattr(job_pool, "session_factory", sessionmaker(bind=db_engine))
+
+    response = client.post(f"/api/shortlist/{test_shortlist.id}/lock", headers=auth_headers)
+    asyncio.run(job_pool.run_job(response.json()["job_id"]))
+
+    assert len(fake_llm.calls) == 1
+    titles = {t.title for t in db_session.query(Task).filter(Task.shortlisted_university_id == test_shortlist.id)}
+    assert titles == {"Request transcripts", "Book TOEFL"}
+    row = db_session.query(ChecklistCache).one()
+    assert (row.university_id, row.country, row.degree_level) == (test_shortlist.university_id, "USA", "masters")
+    assert row.version == CHECKLIST_VERSION
+
+
+def test_lock_with_stored_checklist_creates_tasks_without_a_job(client, auth_headers, test_profile, test_shortlist, db_session, fake_llm):
+    uni = db_session.get(University, test_shortlist.university_id)
+    save_checklist(db_session, uni.id, uni.country, test_profile.intended_degree, CHECKLIST)
+    db_session.commit()
+
+    response = client.post(f"/api/shortlist/{test_shortlist.id}/lock", headers=auth_headers)
+
+    assert response.status_code == 200
+    assert response.json()["job_id"] is None
+    db_session.expire_all()
+    titles = {t.title for t in db_session.query(Task).filter(Task.shortlisted_university_id == test_shortlist.id)}
+    assert titles == {"Request transcripts", "Book TOEFL"}
+    assert db_session.query(BackgroundJob).count() == 0
+    assert len(fake_llm.calls) == 0
+
+
+def test_cached_checklist_skips_llm(db_session, test_universities, fake_llm):
+    fake_llm.payload = CHECKLIST
+    uni = test_universities[0]
+
+    first = asyncio.run(get_or_generate_checklist(db_session, uni, "Master's"))
+    db_session.commit()
+    db_session.commit()
+    # Different spelling of the same degree level hits the same row
+    second = asyncio.run(get_or_generate_checklist(db_session, uni, "MASTERS"))
+
+    assert first == second == CHECKLIST
+    assert len(fake_llm.calls) == 1
+
+
+def test_expired_or_outdated_checklist_regenerates(db_session, test_universities, fake_llm):
+    fake_llm.payload = CHECKLIST
+    uni = test_universities[0]
+    asyncio.run(get_or_generate_checklist(db_session, uni))
+    db_session.commit()
+
+    row = db_session.query(ChecklistCache).one()
+    row.expires_at = datetime.utcnow() - timedelta(minutes=1)
+    db_session.commit()
+    assert get_cached_checklist(db_session, uni.id, uni.country, "Master's") is None
+
+    asyncio.run(get_or_generate_checklist(db_session, uni))
+    db_session.commit()
+    assert len(fake_llm.calls) == 2
+    assert db_session.query(ChecklistCache).count() == 1
+
+    row = db_session.query(ChecklistCache).one()
+    row.version = CHECKLIST_VERSION - 1
+    db_session.commit()
+    assert get_cached_checklist(db_session, uni.id, uni.country, "Master's") is None
+
+
+def test_aware_expiry_is_compared_in_utc(db_session, test_universities, fake_llm):
+    fake_llm.payload = CHECKLIST
+    uni = test_universities[0]
+    asyncio.run(get_or_generate_checklist(db_session, uni))
+    db_session.commit()
+    row = db_session.query(ChecklistCache).one()
+
+    # Flushed, not committed: the row keeps the aware value, as Postgres returns it
+    row.expires_at = datetime.now(timezone(timedelta(hours=5))) + timedelta(minutes=1)
+    db_session.flush()
+    assert get_cached_checklist(db_session, uni.id, uni.country, "Master's") == CHECKLIST
+
+    row.expires_at = datetime.now(timezone(timedelta(hours=-5))) - timedelta(minutes=1)
+    db_session.flush()
+    assert get_cached_checklist(db_session, uni.id, uni.country, "Master's") is None
+
+
+def test_failed_generation_is_not_stored(db_session, test_universities, fake_llm):
+    fake_llm.payload = []
+
+    assert asyncio.run(get_or_generate_checklist(db_session, test_universities[0])) == []
+    assert db_session.query(ChecklistCache).count() == 0
+
+
+def test_warm_up_bounds_concurrency(db_engine, db_session, fake_llm):
+    fake_llm.delay = 0.05
+    fake_llm.payload = CHECKLIST
+    names = [f"Warm University {i}" for i in range(6)]
+    db_session.add_all([University(name=name, country="Germany") for name in names])
+    db_session.commit()
+    SessionFactory = sessionmaker(bind=db_engine)
+
+    summary = asyncio.run(warm_checklists(SessionFactory, names + ["Unseeded University"], concurrency=2))
+
+    assert summary == {"generated": 6, "skipped": 0, "failed": 0, "missing": ["Unseeded University"]}
+    assert fake_llm.max_in_flight == 2
+    assert db_session.query(ChecklistCache).count() == 6
+
+    again = asyncio.run(warm_checklists(SessionFactory, names, concurrency=2))
+    assert again["skipped"] == 6
+    assert len(fake_llm.calls) == 6
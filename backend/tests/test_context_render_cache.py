@@ -0,0 +1,97 @@
+"""
+build_context render cache tests - cached output matches a fresh render.
+"""
+from ai_counsellor import build_context, context_render_cache, invalidate_context_cache
+
+USER = {"full_name": "Test User", "current_stage": "DISCOVERY", "onboarding_completed": True}
+
+
+def make_universities():
+    return [
+        {
+            "id": 1, "name": "MIT", "country": "USA", "city": "Cambridge", "qs_ranking": 1, "is_public": False,
+            "min_gpa": 3.9, "tuition_per_year": 55000, "acceptance_rate": 0.04,
+            "programs": [
+                {"id": 10, "name": "MS CS", "degree_level": "Masters", "tuition_per_year_usd": 55000, "min_gpa": 3.7},
+                {"id": 11, "name": "MBA", "degree_level": "Masters", "tuition_per_year_usd": 80000,
+                 "gmat_required": True, "requires_work_experience": True, "min_work_experience_years": 2},
+            ],
+        },
+        {
+            "id": 2, "name": "State University", "country": "USA", "city": "Springfield", "qs_ranking": 400,
+            "is_public": True, "min_gpa": 3.0, "tuition_per_year": 20000, "acceptance_rate": 0.6,
+            "programs": [{"id": 20, "name": "MS Data Science", "degree_level": "Masters", "tuition_per_year_usd": 20000}],
+        },
+    ]
+
+
+def render_uncached(profile, universities):
+    context_render_cache.clear()
+    result = build_context(USER, profile, universities, [], [])
+    context_render_cache.clear()
+    return result
+
+
+def test_warm_cache_matches_fresh_render():
+    universities = make_universities()
+    strong = {"gpa": 3.9, "budget_per_year": 90000, "work_experience_years": 3, "gre_gmat_status": "COMPLETED"}
+    weak = {"gpa": 3.0, "budget_per_year": 20000, "work_experience_years": 0, "gre_gmat_status": "NOT_STARTED"}
+    expected_strong = render_uncached(strong, universities)
+    expected_weak = render_uncached(weak, universities)
+    assert expected_strong != expected_weak
+
+    # Interleave profiles so each render is served from the other's warm cache
+    for _ in range(2):
+        assert build_context(USER, strong, universities, [], []) == expected_strong
+        assert build_context(USER, weak, universities, [], []) == expected_weak
+
+    assert "[INELIGIBLE] MBA" in expected_weak
+    assert "[INELIGIBLE]" not in expected_strong
+    assert context_render_cache.stats()["hits"] > 0
+
+
+def test_filtered_program_subsets_are_cached_separately():
+    universities = make_universities()
+    profile = {"gpa": 3.5, "budget_per_year": 60000}
+    build_context(USER, profile, universities, [], [])
+
+    filtered = make_universities()
+    filtered[0]["programs"] = filtered[0]["programs"][:1]
+    assert build_context(USER, profile, filtered, [], []) == render_uncached(profile, filtered)
+
+
+def test_invalidation_picks_up_catalog_changes():
+    universities = make_universities()
+    profile = {"gpa": 3.5, "budget_per_year": 60000}
+    build_context(USER, profile, universities, [], [])
+
+    universities[1]["name"] = "Renamed University"
+    invalidate_context_cache()
+    assert "Renamed University" in build_context(USER, profile, universities, [], [])
+
+
+def test_dicts_without_ids_render_uncached():
+    universities = make_universities()
+    for uni in universities:
+        del uni["id"]
+    profile = {"gpa": 3.5, "budget_per_year": 60000}
+    context_render_cache.clear()
+
+    first = build_context(USER, profile, universities, [], [])
+    assert "[ID: N/A] MIT" in first
+    assert context_render_cache.stats()["size"] == 0
+
+
+def test_snapshot_records_are_categorized_by_the_catalog_engine(db_session, test_universities, monkeypatch):
+    import ai_counsellor
+    from catalog import catalog
+
+    snapshot = catalog.get(db_session)
+    profile = {"gpa": 3.4, "budget_per_year": 40000}
+    expected = render_uncached(profile, [dict(uni) for uni in snapshot.universities])
+
+    def no_new_engine(universities):
+        raise AssertionError("snapshot records should use snapshot.categories")
+
+    monkeypatch.setattr(ai_counsellor, "CategoryEngine", no_new_engine)
+    assert render_uncached(profile, list(snapshot.universities)) == expected
@@ -0,0 +1,155 @@
+"""
+Conversation summary tests - folded off the request path, constant prompt size.
+"""
+import asyncio
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from chat_context import HISTORY_LIMIT, history_window, load_chat_context
+from conversation_summary import SUMMARY_JOB, schedule_summary
+from gemini_key_manager import key_manager
+from job_queue import job_pool
+from models import BackgroundJob, ChatMessage, ChatSession, JobStatus
+
+REPLY = {"message": "Noted.", "summary": "Wants a CS Masters in Germany under $20k; shortlisted TU Munich."}
+
+
+@pytest.fixture
+def summary_jobs(db_engine, monkeypatch):
+    monkeypatch.setattr(job_pool, "session_factory", sessionmaker(bind=db_engine))
+    return job_pool
+
+
+def make_session(db_session, user, count):
+    session = ChatSession(user_id=user.id, title="Long chat")
+    db_session.add(session)
+    db_session.flush()
+    db_session.add_all([
+        ChatMessage(user_id=user.id, session_id=session.id, role="assistant" if i % 2 else "user", content=f"old message {i}")
+        for i in range(count)
+    ])
+    db_session.commit()
+    return session.id
+
+
+def chat(client, auth_headers, session_id):
+    response = client.post("/api/chat", json={"content": "What next?", "session_id": session_id}, headers=auth_headers)
+    assert response.status_code == 200
+
+
+def queued_jobs(db_session):
+    db_session.expire_all()
+    return db_session.query(BackgroundJob).filter(BackgroundJob.kind == SUMMARY_JOB).all()
+
+
+def test_summary_queued_once_enough_messages_pile_up(client, auth_headers, db_session, test_user, test_profile, fake_llm):
+    fake_llm.payload = REPLY
+    session_id = make_session(db_session, test_user, history_window(HISTORY_LIMIT) - 4)
+
+    chat(client, auth_headers, session_id)
+    assert queued_jobs(db_session) == []
+
+    chat(client, auth_headers, session_id)
+    chat(client, auth_headers, session_id)
+
+    jobs = queued_jobs(db_session)
+    assert len(jobs) == 1  # not queued again while the first is pending
+    assert jobs[0].payload == {"session_id": session_id, "keep_recent": HISTORY_LIMIT}
+    assert not any("running summary" in str(call["contents"]) for call in fake_llm.calls)
+
+
+def test_job_folds_all_but_recent_messages(db_session, test_user, fake_llm, summary_jobs):
+    fake_llm.payload = REPLY
+    session_id = make_session(db_session, test_user, 30)
+    job = job_pool.create_job(db_session, SUMMARY_JOB, {"session_id": session_id}, user_id=test_user.id)
+    db_session.commit()
+
+    assert asyncio.run(summary_jobs.run_job(job.id)) == JobStatus.COMPLETED
+
+    db_session.expire_all()
+    session = db_session.get(ChatSession, session_id)
+    ids = [m.id for m in db_session.query(ChatMessage.id).order_by(ChatMessage.id)]
+    assert session.summary == REPLY["summary"]
+    assert session.summary_message_id == ids[-HISTORY_LIMIT - 1]
+    prompt = fake_llm.calls[-1]["contents"]
+    assert "Student: old message 0" in prompt and f"old message {30 - HISTORY_LIMIT}" not in prompt
+
+    again = job_pool.create_job(db_session, SUMMARY_JOB, {"session_id": session_id}, user_id=test_user.id)
+    db_session.commit()
+    asyncio.run(summary_jobs.run_job(again.id))
+    db_session.expire_all()
+    assert db_session.get(BackgroundJob, again.id).result == {"folded": 0}
+
+
+def test_failed_summary_is_retried_and_keeps_old_summary(db_session, test_user, fake_llm, summary_jobs):
+    fake_llm.payload = {"summary": ""}
+    session_id = make_session(db_session, test_user, 30)
+    job = job_pool.create_job(db_session, SUMMARY_JOB, {"session_id": session_id}, user_id=test_user.id)
+    db_session.commit()
+
+    assert asyncio.run(summary_jobs.run_job(job.id)) == JobStatus.PENDING
+
+    db_session.expire_all()
+    assert db_session.get(ChatSession, session_id).summary_message_id is None
+
+
+def test_prompt_uses_summary_and_stays_flat(client, auth_headers, db_session, test_user, test_profile, fake_llm, summary_jobs):
+    fake_llm.payload = REPLY
+    sizes = []
+    for count in (20, 200):
+        session_id = make_session(db_session, test_user, count)
+        job = job_pool.create_job(db_session, SUMMARY_JOB, {"session_id": session_id}, user_id=test_user.id)
+        db_session.commit()
+        asyncio.run(summary_jobs.run_job(job.id))
+
+        chat(client, auth_headers, session_id)
+        prompt = fake_llm.calls[-1]["contents"]
+        sizes.append(len(prompt))
+
+        assert REPLY["summary"] in prompt
+        assert f"old message {count - 1}" in prompt
+        assert "old message 0\n" not in prompt
+
+    assert abs(sizes[1] - sizes[0]) < 50
+
+
+@pytest.mark.parametrize("job_lag", [0, 1])
+def test_every_message_is_in_summary_or_history(client, auth_headers, db_session, test_user, test_profile, fake_llm, summary_jobs, job_lag):
+    fake_llm.payload = REPLY
+    session_id = make_session(db_session, test_user, 0)
+    queued_on = {}
+
+    for turn in range(1, 21):
+        chat(client, auth_headers, session_id)
+        for job in queued_jobs(db_session):
+            queued_on.setdefault(job.id, turn)
+        # With a lag the fold runs only after the next turn was answered
+        for job_id, queued_turn in list(queued_on.items()):
+            if queued_turn + job_lag == turn:
+                asyncio.run(summary_jobs.run_job(job_id))
+
+        db_session.expire_all()
+        session = db_session.get(ChatSession, session_id)
+        uncovered = db_session.query(ChatMessage).filter(
+            ChatMessage.session_id == session_id, ChatMessage.id > (session.summary_message_id or 0)
+        ).count()
+        context = load_chat_context(db_session, test_user.id, session_id)
+        assert len(context.history) == uncovered >= min(HISTORY_LIMIT, 2 * turn)
+
+    assert db_session.get(ChatSession, session_id).summary_message_id is not None
+
+
+def test_no_keys_no_summary_jobs(db_session, test_user, fake_llm, summary_jobs, monkeypatch):
+    session_id = make_session(db_session, test_user, 30)
+    monkeypatch.setattr(key_manager, "keys", [])
+
+    assert schedule_summary(db_session, test_user.id, session_id) is None
+
+    job = job_pool.create_job(db_session, SUMMARY_JOB, {"session_id": session_id}, user_id=test_user.id)
+    db_session.commit()
+    assert asyncio.run(summary_jobs.run_job(job.id)) == JobStatus.COMPLETED
+    db_session.expire_all()
+    assert db_session.get(BackgroundJob, job.id).result == {"skipped": "no API keys configured"}
+    assert db_session.get(ChatSession, session_id).summary_message_id is None
+    assert fake_llm.calls == []
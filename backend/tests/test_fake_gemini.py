@@ -0,0 +1,103 @@
+"""
+Fake Gemini backend tests - schema-valid canned replies and injected faults.
+"""
+import asyncio
+import json
+
+import pytest
+
+import fake_gemini
+from ai_counsellor import is_quota_error
+from fake_gemini import FakeBackend, FakeBackendConfig, FakeGeminiClient
+from gemini_key_manager import GeminiKeyManager, key_manager
+from metrics import metrics
+from schemas import ColdEmailResponse, SOPReviewResponse
+
+FAST = FakeBackendConfig(latency_ms=0, latency_sigma=0)
+
+
+def generate(client, contents, config=None):
+    return asyncio.run(client.aio.models.generate_content(model="fake", contents=contents, config=config)).text
+
+
+def test_fake_backend_replaces_sdk_clients(monkeypatch):
+    for name in ("AI_INTEGRATIONS_GEMINI_API_KEY", "AI_INTEGRATIONS_GEMINI_BASE_URL", "GEMINI_API_KEYS", "GEMINI_API_KEY"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("GEMINI_BACKEND", "fake")
+    monkeypatch.setenv("GEMINI_FAKE_KEYS", "4")
+
+    manager = GeminiKeyManager()
+    client, key_index = manager.create_client()
+
+    assert len(manager.keys) == 4
+    assert isinstance(client, FakeGeminiClient)
+    assert manager.get_stats()["backend"] == "fake"
+
+
+def test_replies_match_each_callers_schema():
+    client = FakeGeminiClient(FakeBackend(FAST))
+
+    sop = generate(client, "Review this.\n## Student SOP\nI have always loved robots.")
+    SOPReviewResponse(**json.loads(sop))
+    email = generate(client, 'Output JSON:\n{"subject_line": "..."}\nTarget Professor: Dr. Ada Lovelace (MIT)')
+    assert json.loads(email)["email_body"].startswith("Dear Dr. Ada Lovelace,")
+    ColdEmailResponse(**json.loads(email))
+    checklist = json.loads(generate(client, "Checklist of application documents\nTarget Country: Germany"))
+    assert {"title", "description", "priority"} <= set(checklist[0])
+    assert any("APS" in item["title"] for item in checklist)
+    intent = json.loads(generate(client, "Intent Detection Router\n\nUser Message: Masters in Canada\nUser Profile Context: {}"))
+    assert "Canada" in intent["target_countries"]
+    turn = json.loads(generate(client, "## User Message\nWhich exams do I need?"))
+    assert "Which exams do I need?" in turn["message"]
+    assert turn["actions"] == []
+
+
+def test_same_seed_gives_same_latencies_and_faults():
+    config = FakeBackendConfig(latency_ms=100, latency_sigma=0.5, quota_rate=0.3, seed=7)
+    first, second = FakeBackend(config), FakeBackend(config)
+
+    assert [first.sample()[0] for _ in range(20)] == [second.sample()[0] for _ in range(20)]
+
+
+def test_injected_quota_errors_look_like_429s():
+    client = FakeGeminiClient(FakeBackend(FAST._replace(quota_rate=1.0)))
+
+    with pytest.raises(Exception) as error:
+        generate(client, "## User Message\nhello")
+
+    assert is_quota_error(error.value)
+
+
+def test_stream_reassembles_to_valid_json_with_usage():
+    client = FakeGeminiClient(FakeBackend(FAST))
+
+    async def consume():
+        return [chunk async for chunk in client.aio.models.generate_content_stream(model="fake", contents="## User Message\nhi")]
+
+    chunks = asyncio.run(consume())
+    assert len(chunks) > 1
+    assert json.loads("".join(chunk.text for chunk in chunks))["message"]
+    assert chunks[-1].usage_metadata.prompt_token_count > 0
+
+
+def test_chat_rotates_keys_through_injected_429s(client, auth_headers, test_profile, monkeypatch):
+    backend = FakeBackend(FAST._replace(quota_rate=0.5, seed=3))
+    monkeypatch.setattr(fake_gemini, "_backend", backend)
+    monkeypatch.setattr(key_manager, "backend", "fake")
+    monkeypatch.setattr(key_manager, "keys", ["fake-key-1", "fake-key-2", "fake-key-3"])
+    monkeypatch.setattr(key_manager, "_clients", {})
+    monkeypatch.setattr(key_manager, "_health", {})
+
+    metrics.reset()
+
+    replies = [
+        client.post("/api/chat", json={"content": f"Which exams do I need for country {i}?"}, headers=auth_headers)
+        for i in range(3)
+    ]
+
+    assert [reply.status_code for reply in replies] == [200] * 3
+    assert "You asked" in replies[0].json()["content"]
+    assert backend.stats()["quota_errors"] > 0
+    # A 429 sent the turn to another key, which answered
+    assert metrics.get_counter("llm.counsellor.retries") > 0
+    assert metrics.get_counter("llm.counsellor.outcome.quota") > 0
@@ -0,0 +1,123 @@
+"""
+Gemini key manager tests - pooled clients and key selection.
+"""
+import asyncio
+
+import pytest
+
+from ai_counsellor import _generate_checklist, _review_sop, summarize_conversation
+from gemini_key_manager import MAX_IN_FLIGHT_PER_KEY, GeminiKeyManager, key_manager
+from llm_client import KeysExhausted, generate_content, is_quota_error
+from metrics import metrics
+
+
+def make_manager(monkeypatch, keys="key-one,key-two"):
+    monkeypatch.delenv("AI_INTEGRATIONS_GEMINI_API_KEY", raising=False)
+    monkeypatch.delenv("AI_INTEGRATIONS_GEMINI_BASE_URL", raising=False)
+    monkeypatch.setenv("GEMINI_API_KEYS", keys)
+    return GeminiKeyManager()
+
+
+def test_clients_are_reused_per_key(monkeypatch):
+    """Repeated calls for the same key return the same pooled client."""
+    manager = make_manager(monkeypatch)
+
+    first = manager.get_client(0)
+    second = manager.get_client(0)
+    other = manager.get_client(1)
+
+    assert first is second
+    assert first is not other
+    stats = manager.get_stats()
+    assert stats["clients_created"] == 2
+    assert stats["client_reuse_hits"] == 1
+    assert stats["pooled_clients"] == 2
+
+
+def test_create_client_uses_pool(monkeypatch):
+    """create_client hands out pooled clients instead of building new ones."""
+    manager = make_manager(monkeypatch, keys="only-key")
+
+    for _ in range(5):
+        client, key_index = manager.create_client()
+        assert client is not None
+        assert key_index == 0
+
+    assert manager.get_stats()["clients_created"] == 1
+    assert manager.get_stats()["client_reuse_hits"] == 4
+
+
+def test_aclose_empties_pool(monkeypatch):
+    """Shutdown closes pooled clients and a later call lazily recreates one."""
+    manager = make_manager(monkeypatch)
+    manager.get_client(0)
+
+    asyncio.run(manager.aclose())
+
+    assert manager.get_stats()["pooled_clients"] == 0
+    manager.get_client(0)
+    assert manager.get_stats()["clients_created"] == 2
+
+
+def test_quota_error_puts_key_in_cooldown(monkeypatch):
+    """A key that returned 429 is skipped until its cooldown expires."""
+    manager = make_manager(monkeypatch)
+    manager.record_quota_error(0)
+
+    picks = {manager.get_random_key()[1] for _ in range(50)}
+    assert picks == {1}
+
+    health = manager.get_health()
+    assert health[0]["state"] == "cooldown"
+    assert health[0]["recent_quota_errors"] == 1
+    assert health[1]["state"] == "healthy"
+
+
+def test_all_keys_cooling_fails_fast(monkeypatch):
+    """With every key cooling down, no client is handed out."""
+    manager = make_manager(monkeypatch)
+    manager.record_quota_error(0)
+    manager.record_quota_error(1)
+
+    client, key_index = manager.create_client()
+    assert client is None
+    assert key_index == -1
+
+
+def test_cooling_keys_surface_as_quota_errors(fake_llm, monkeypatch):
+    """Callers handed no client get the quota error they already handle, not an AttributeError."""
+    monkeypatch.setattr(key_manager, "create_client", lambda exclude_indices=None: (None, -1))
+    exhausted = metrics.get_counter("llm.sop_review.keys_exhausted")
+
+    with pytest.raises(KeysExhausted) as error:
+        asyncio.run(generate_content(None, contents="Hi", site="other"))
+    assert is_quota_error(error.value)
+
+    assert "RESOURCE_EXHAUSTED" in asyncio.run(_review_sop("My SOP"))["weaknesses"][0]
+    assert asyncio.run(_generate_checklist("Checklist prompt")) == []
+    assert asyncio.run(summarize_conversation(None, [{"role": "user", "content": "Hi"}])) is None
+    assert metrics.get_counter("llm.sop_review.keys_exhausted") - exhausted == 1
+    assert fake_llm.calls == []
+
+
+def test_selection_prefers_fast_keys(monkeypatch):
+    """Rolling latency biases selection toward the faster key."""
+    manager = make_manager(monkeypatch)
+    manager.record_success(0, 0.1)
+    manager.record_success(1, 5.0)
+
+    picks = [manager.get_random_key()[1] for _ in range(500)]
+    assert picks.count(0) > picks.count(1) * 5
+
+
+def test_busy_key_is_passed_over(monkeypatch):
+    """A key at its in-flight limit is skipped while another has room."""
+    manager = make_manager(monkeypatch)
+    for _ in range(MAX_IN_FLIGHT_PER_KEY):
+        manager.call_started(0)
+
+    assert {manager.get_random_key()[1] for _ in range(50)} == {1}
+    assert manager.get_health()[0]["in_flight"] == MAX_IN_FLIGHT_PER_KEY
+
+    manager.call_finished(0)
+    assert 0 in {manager.get_random_key()[1] for _ in range(200)}
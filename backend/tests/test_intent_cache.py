@@ -0,0 +1,71 @@
+"""
+Intent cache tests - LRU bound, TTL expiry and detect_intent integration.
+"""
+import asyncio
+
+import recommendation_engine
+from recommendation_engine import IntentCache, detect_intent, intent_cache
+
+PROFILE = {"field_of_study": "Computer Science", "budget_per_year": 40000, "preferred_countries": ["USA"]}
+
+
+def test_cache_evicts_least_recently_used():
+    """Oldest untouched entry is evicted once the cache is full."""
+    cache = IntentCache(max_size=2, ttl_seconds=60)
+    cache.set("a", {"intent": "NEXT_STEPS"})
+    cache.set("b", {"intent": "COMPARISON"})
+    cache.get("a")
+    cache.set("c", {"intent": "EXAM_STRATEGY"})
+
+    assert cache.get("b") is None
+    assert cache.get("a") == {"intent": "NEXT_STEPS"}
+    assert cache.stats()["evictions"] == 1
+
+
+def test_cache_entries_expire(monkeypatch):
+    """Entries older than the TTL are treated as misses."""
+    now = [1000.0]
+    monkeypatch.setattr(recommendation_engine.time, "monotonic", lambda: now[0])
+    cache = IntentCache(max_size=10, ttl_seconds=30)
+    cache.set("a", {"intent": "NEXT_STEPS"})
+
+    now[0] += 31
+    assert cache.get("a") is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_disabled_cache_stores_nothing():
+    """A size of zero disables caching."""
+    cache = IntentCache(max_size=0, ttl_seconds=60)
+    cache.set("a", {"intent": "NEXT_STEPS"})
+    assert cache.get("a") is None
+    assert cache.stats()["enabled"] is False
+
+
+def test_cached_results_are_copies():
+    """Callers mutating a returned intent must not poison the cache."""
+    cache = IntentCache(max_size=10, ttl_seconds=60)
+    cache.set("a", {"intent": "NEXT_STEPS", "target_countries": ["USA"]})
+    cache.get("a")["target_countries"].append("UK")
+    assert cache.get("a")["target_countries"] == ["USA"]
+
+
+def test_detect_intent_hits_cache_for_normalized_repeats(fake_llm):
+    """Whitespace/case/punctuation variants share one LLM call."""
+    fake_llm.payload = {"intent": "UNIVERSITY_DISCOVERY", "target_discipline": "Computer Science"}
+
+    first = asyncio.run(detect_intent("Tell me more about that", PROFILE))
+    second = asyncio.run(detect_intent("  tell me MORE about   that?", PROFILE))
+
+    assert first == second
+    assert len(fake_llm.calls) == 1
+    assert intent_cache.stats()["hits"] == 1
+
+
+def test_detect_intent_misses_when_relevant_profile_changes(fake_llm):
+    """A different budget changes the cache key."""
+    asyncio.run(detect_intent("Tell me more about that", PROFILE))
+    asyncio.run(detect_intent("Tell me more about that", {**PROFILE, "budget_per_year": 20000}))
+    asyncio.run(detect_intent("Tell me more about that", {**PROFILE, "gpa": 3.9}))
+
+    assert len(fake_llm.calls) == 2
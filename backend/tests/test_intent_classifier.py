@@ -0,0 +1,106 @@
+"""
+Local intent classifier tests - rule fast path and LLM fallback.
+"""
+import asyncio
+
+import pytest
+
+from recommendation_engine import classify_intent_locally, detect_intent
+
+
+@pytest.mark.parametrize("message,expected", [
+    ("Compare MIT and Stanford", "COMPARISON"),
+    ("Compare MIT and State University", "COMPARISON"),
+    ("Is TUM better than RWTH?", "COMPARISON"),
+    ("Do I need IELTS for Canada?", "EXAM_STRATEGY"),
+    ("What do I do now?", "NEXT_STEPS"),
+    ("Are my chances good?", "PROFILE_ANALYSIS"),
+    ("What about Data Science instead?", "FIELD_SWITCH"),
+    ("Suggest universities", "UNIVERSITY_DISCOVERY"),
+    ("MBA programs in Canada", "PROGRAM_SPECIFIC_QUERY"),
+    ("Write me a poem", "OUT_OF_SCOPE"),
+])
+def test_obvious_messages_are_classified_confidently(message, expected):
+    intent, confidence = classify_intent_locally(message)
+    assert intent["intent"] == expected
+    assert confidence >= 0.8
+
+
+def test_constraints_are_extracted():
+    intent, _ = classify_intent_locally("Suggest MS Data Science programs in the UK or Germany under $40k")
+    assert intent["target_discipline"] == "Data Science"
+    assert intent["target_degree"] == "Masters"
+    assert intent["target_countries"] == ["UK", "Germany"]
+    assert intent["max_budget_usd"] == 40000
+
+
+def test_lowercase_us_is_not_a_country():
+    intent, _ = classify_intent_locally("Can you help us pick universities?")
+    assert intent["target_countries"] == []
+    intent, _ = classify_intent_locally("Suggest universities in the US")
+    assert intent["target_countries"] == ["USA"]
+
+
+@pytest.mark.parametrize("message", [
+    "Can you say that again?",
+    "More details please",
+    "I like the design of this page",
+    "How do I finance my studies?",
+    "Any time management tips?",
+    "The AI gave me a weird answer",
+    "I want to master the GRE",
+    "It states that I need a visa",
+    "What states should I consider?",
+    "I grew up in Latin America",
+])
+def test_everyday_words_are_not_constraints(message):
+    intent, _ = classify_intent_locally(message)
+    assert (intent["target_discipline"], intent["target_countries"], intent["target_degree"]) == (None, [], None)
+
+
+@pytest.mark.parametrize("message,discipline,countries", [
+    ("I want to study AI", "Artificial Intelligence", []),
+    ("AI programs in the States", "Artificial Intelligence", ["USA"]),
+    ("Masters in finance in America", "Finance", ["USA"]),
+    ("Design programs in the UK", "Design", ["UK"]),
+])
+def test_qualified_aliases_still_match(message, discipline, countries):
+    intent, _ = classify_intent_locally(message)
+    assert (intent["target_discipline"], intent["target_countries"]) == (discipline, countries)
+
+
+def test_ambiguous_messages_have_low_confidence():
+    for message in ["Tell me more about that", "Hmm ok", "Compare my chances for the exam next steps"]:
+        _, confidence = classify_intent_locally(message)
+        assert confidence < 0.8, message
+
+
+@pytest.mark.parametrize("message", [
+    "What is the application deadline for University of Toronto?",
+    "lock University of Toronto",
+    "Is Stanford a good university for me?",
+    "I scored 320 in GRE, which universities should I apply to?",
+    "Am I good enough for CMU?",
+])
+def test_named_universities_actions_and_conflicts_go_to_llm(message):
+    _, confidence = classify_intent_locally(message)
+    assert confidence < 0.8
+
+
+def test_university_mentions_are_extracted():
+    intent, _ = classify_intent_locally("Is University of Toronto better than Stanford University?")
+    assert intent["explicit_university_mentions"] == ["University of Toronto", "Stanford University"]
+    intent, _ = classify_intent_locally("Which Universities in Canada take MS students?")
+    assert intent["explicit_university_mentions"] == []
+
+
+def test_detect_intent_skips_llm_for_confident_messages(fake_llm):
+    result = asyncio.run(detect_intent("Compare MIT and Stanford", {}))
+    assert result["intent"] == "COMPARISON"
+    assert len(fake_llm.calls) == 0
+
+
+def test_detect_intent_falls_back_to_llm(fake_llm):
+    result = asyncio.run(detect_intent("Tell me more about that", {}))
+    assert result["intent"] == "UNIVERSITY_DISCOVERY"
+    assert len(fake_llm.calls) == 1
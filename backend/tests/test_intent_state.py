@@ -0,0 +1,129 @@
+"""
+Intent state tests - constraints carried across turns, follow-ups merged without the LLM.
+"""
+import asyncio
+
+from metrics import metrics
+from models import ChatMessage
+from recommendation_engine import check_query_delta, merge_intent, resolve_intent
+
+PREVIOUS = {
+    "intent": "PROGRAM_SPECIFIC_QUERY",
+    "target_discipline": "Computer Science",
+    "target_degree": "Masters",
+    "max_budget_usd": 30000,
+    "target_countries": ["Germany"],
+    "category_preference": None,
+    "explicit_university_mentions": [],
+}
+
+
+def resolve(message, previous=PREVIOUS):
+    return asyncio.run(resolve_intent(message, {}, previous))
+
+
+def test_follow_ups_merge_into_previous_state(fake_llm):
+    added = resolve("and in Canada?")
+    assert added["target_countries"] == ["Germany", "Canada"]
+    assert (added["intent"], added["target_discipline"], added["max_budget_usd"]) == ("PROGRAM_SPECIFIC_QUERY", "Computer Science", 30000)
+
+    assert resolve("what about the UK")["target_countries"] == ["UK"]
+    assert resolve("cheaper ones")["max_budget_usd"] == 24000
+    assert resolve("only safe ones")["category_preference"] == "SAFE"
+    assert resolve("and for a PhD?")["target_degree"] == "PhD"
+    assert len(fake_llm.calls) == 0
+
+
+def test_new_discipline_in_follow_up_is_a_field_switch(fake_llm):
+    switched = merge_intent(PREVIOUS, {"target_discipline": "Data Science"}, "and data science?", follow_up=True)
+
+    assert switched["intent"] == "FIELD_SWITCH"
+    assert switched["target_countries"] == ["Germany"]
+
+
+def test_fresh_requests_start_from_a_clean_state(fake_llm):
+    fake_llm.payload = {"intent": "UNIVERSITY_DISCOVERY", "target_countries": []}
+
+    result = resolve("Hmm, which of them would you pick then?")
+
+    assert len(fake_llm.calls) == 1
+    assert result["intent"] == "UNIVERSITY_DISCOVERY"
+    assert not any(result[field] for field in ("target_discipline", "target_degree", "max_budget_usd", "target_countries"))
+    compared = resolve("Compare MIT and Stanford")
+    assert compared["intent"] == "COMPARISON"
+    assert (compared["target_discipline"], compared["target_countries"], compared["max_budget_usd"]) == (None, [], None)
+    assert resolve("suggest universities")["target_countries"] == []
+
+
+def test_follow_ups_to_out_of_scope_take_their_own_intent(fake_llm):
+    followed = resolve("and in Germany?", previous={"intent": "OUT_OF_SCOPE", "target_countries": []})
+    assert followed["intent"] != "OUT_OF_SCOPE"
+    assert followed["target_countries"] == ["Germany"]
+
+
+def test_unresolved_turns_keep_local_constraints_and_are_not_stored(monkeypatch, db_session, test_user):
+    from chat_context import load_previous_intent
+    from llm_client import key_manager
+    from models import ChatSession
+    from recommendation_engine import storable_intent
+
+    monkeypatch.setattr(key_manager, "keys", [])
+    result = resolve("Would Germany work for an MS?", previous=None)
+
+    assert result["intent"] == "OUT_OF_SCOPE" and result["unresolved"] is True
+    assert (result["target_countries"], result["target_degree"]) == (["Germany"], "Masters")
+    assert storable_intent(result) is None
+
+    session = ChatSession(user_id=test_user.id, title="t")
+    db_session.add(session)
+    db_session.flush()
+    db_session.add(ChatMessage(user_id=test_user.id, session_id=session.id, role="user", content="a", intent=PREVIOUS))
+    db_session.add(ChatMessage(user_id=test_user.id, session_id=session.id, role="user", content="b"))
+    db_session.commit()
+    assert load_previous_intent(db_session, session.id) == PREVIOUS
+
+
+def test_explicit_values_replace_carried_ones(fake_llm):
+    rebudgeted = merge_intent(PREVIOUS, {"intent": "PROGRAM_SPECIFIC_QUERY", "max_budget_usd": 45000}, "CS masters under $45k")
+    assert rebudgeted["max_budget_usd"] == 45000
+
+    anywhere = resolve("any country is fine")
+    assert anywhere["target_countries"] == []
+    assert (anywhere["intent"], anywhere["max_budget_usd"]) == ("PROGRAM_SPECIFIC_QUERY", 30000)
+
+    unlimited = resolve("budget doesn't matter")
+    assert unlimited["max_budget_usd"] is None and unlimited["target_countries"] == ["Germany"]
+    assert resolve("any degree level")["target_degree"] is None
+    assert len(fake_llm.calls) == 0
+
+
+def test_first_message_has_nothing_to_follow(fake_llm):
+    resolve("and in Canada?", previous=None)
+    assert len(fake_llm.calls) == 1
+
+
+def test_delta_compares_against_stored_intent():
+    history = [{"role": "user", "content": "MS CS in Germany", "intent": PREVIOUS}, {"role": "assistant", "content": "..."}]
+
+    refined = check_query_delta({**PREVIOUS, "target_countries": ["Germany", "Canada"]}, history)
+    assert refined["change_summary"].startswith("Refined constraints (target_countries")
+    switched = check_query_delta({**PREVIOUS, "target_discipline": "Data Science"}, history)
+    assert switched["is_field_switch"] and "from Computer Science to Data Science" in switched["change_summary"]
+    assert check_query_delta(dict(PREVIOUS), history)["is_repetition"] is True
+
+
+def test_chat_turns_store_intent_and_skip_router_on_follow_ups(client, auth_headers, db_session, test_profile, fake_llm):
+    follow_ups_before = metrics.get_counter("intent.follow_up")
+    first = client.post("/api/chat", json={"content": "MS Computer Science programs in Germany under $30k"}, headers=auth_headers)
+    session_id = first.json()["session_id"]
+
+    client.post("/api/chat", json={"content": "and in Canada?", "session_id": session_id}, headers=auth_headers)
+    client.post("/api/chat", json={"content": "cheaper ones", "session_id": session_id}, headers=auth_headers)
+
+    # Only counsellor calls: the first message is classified locally, the rest are follow-ups
+    assert all("Intent Detection Router" not in call["contents"] for call in fake_llm.calls)
+    assert "- Max Budget: $24,000" in fake_llm.calls[-1]["contents"]
+    stored = [m.intent for m in db_session.query(ChatMessage).filter_by(role="user").order_by(ChatMessage.id)]
+    assert [s["target_countries"] for s in stored] == [["Germany"], ["Germany", "Canada"], ["Germany", "Canada"]]
+    assert metrics.get_counter("intent.follow_up") - follow_ups_before == 2
+    assert client.get("/api/metrics").json()["intent"]["llm_avoided_rate"] is not None
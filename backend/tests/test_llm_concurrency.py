@@ -0,0 +1,32 @@
+"""
+Async LLM call path tests - concurrent chats must not serialize on the event loop.
+"""
+import asyncio
+import time
+
+import httpx
+
+MODEL_DELAY_SECONDS = 0.4
+
+
+def test_concurrent_chats_overlap(client, auth_headers, test_profile, fake_llm):
+    """Two /api/chat calls against a slow model should take ~1 turn, not 2."""
+    fake_llm.delay = MODEL_DELAY_SECONDS
+
+    async def run_two_chats():
+        transport = httpx.ASGITransport(app=client.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+            started = time.perf_counter()
+            responses = await asyncio.gather(
+                async_client.post("/api/chat", json={"content": "Tell me more about that"}, headers=auth_headers),
+                async_client.post("/api/chat", json={"content": "Hmm, and the other one?"}, headers=auth_headers),
+            )
+            return responses, time.perf_counter() - started
+
+    responses, elapsed = asyncio.run(run_two_chats())
+
+    assert all(r.status_code == 200 for r in responses)
+    # Each chat turn makes two sequential model calls (intent + counsellor).
+    single_turn = 2 * MODEL_DELAY_SECONDS
+    assert elapsed < single_turn * 1.75, f"chats serialized: {elapsed:.2f}s"
+    assert fake_llm.max_in_flight >= 2
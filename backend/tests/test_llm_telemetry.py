@@ -0,0 +1,114 @@
+"""
+LLM instrumentation tests - every Gemini call is recorded per call site.
+"""
+import asyncio
+import logging
+
+import pytest
+from google.genai import types
+
+from llm_client import generate_content, generate_content_stream
+from metrics import metrics
+
+JSON_CONFIG = types.GenerateContentConfig(response_mime_type="application/json")
+
+
+class Usage:
+    prompt_token_count = 120
+    candidates_token_count = 30
+    cached_content_token_count = 100
+
+
+class Reply:
+    def __init__(self, text, usage=None):
+        self.text = text
+        self.usage_metadata = usage
+
+
+class ScriptedModels:
+    """Returns `text` (or raises `error`) from both the plain and streaming calls."""
+
+    def __init__(self, text="{}", error=None):
+        self.text = text
+        self.error = error
+
+    async def generate_content(self, model, contents, config=None):
+        if self.error:
+            raise self.error
+        return Reply(self.text, Usage())
+
+    async def generate_content_stream(self, model, contents, config=None):
+        yield Reply(self.text[:3])
+        yield Reply(self.text[3:], Usage())
+
+
+def scripted_client(**kwargs):
+    models = ScriptedModels(**kwargs)
+    return type("Client", (), {"aio": type("Aio", (), {"models": models})()})()
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics():
+    metrics.reset()
+
+
+def test_successful_call_records_size_tokens_and_outcome():
+    client = scripted_client(text='{"ok": true}')
+
+    asyncio.run(generate_content(client, "x" * 400, config=JSON_CONFIG, key_index=0, site="probe", attempt=2))
+
+    snapshot = metrics.snapshot()
+    assert snapshot["counters"]["llm.probe.outcome.ok"] == 1
+    assert snapshot["counters"]["llm.probe.retries"] == 1
+    assert snapshot["counters"]["llm.probe.cached_tokens"] == 100
+    assert snapshot["histograms"]["llm.probe.prompt_tokens"]["sum"] == 120
+    assert snapshot["histograms"]["llm.probe.response_tokens"]["sum"] == 30
+    assert snapshot["histograms"]["llm.probe.duration_ms"]["count"] == 1
+
+
+def test_invalid_json_is_a_parse_error():
+    client = scripted_client(text="Sure! Here is your answer")
+
+    asyncio.run(generate_content(client, "prompt", config=JSON_CONFIG, key_index=0, site="probe"))
+
+    assert metrics.get_counter("llm.probe.outcome.parse_error") == 1
+    assert metrics.get_counter("llm.probe.outcome.ok") == 0
+
+
+def test_quota_and_other_errors_are_told_apart():
+    quota = scripted_client(error=RuntimeError("429 RESOURCE_EXHAUSTED"))
+    broken = scripted_client(error=RuntimeError("500 INTERNAL"))
+
+    for client in (quota, broken):
+        with pytest.raises(RuntimeError):
+            asyncio.run(generate_content(client, "prompt", key_index=0, site="probe"))
+
+    assert metrics.get_counter("llm.probe.outcome.quota") == 1
+    assert metrics.get_counter("llm.probe.outcome.error") == 1
+
+
+def test_stream_is_recorded_once_with_final_usage():
+    client = scripted_client(text='{"message": "hello"}')
+
+    async def consume():
+        return "".join([chunk async for chunk in generate_content_stream(client, "prompt", config=JSON_CONFIG, key_index=0, site="probe")])
+
+    assert asyncio.run(consume()) == '{"message": "hello"}'
+    assert metrics.get_counter("llm.probe.calls") == 1
+    assert metrics.get_counter("llm.probe.outcome.ok") == 1
+    assert metrics.snapshot()["histograms"]["llm.probe.prompt_tokens"]["sum"] == 120
+
+
+def test_chat_turn_reports_call_sites_and_logs_summary(client, auth_headers, test_profile, fake_llm, caplog):
+    with caplog.at_level(logging.INFO, logger="llm_telemetry"):
+        response = client.post("/api/chat", json={"content": "Tell me more about that"}, headers=auth_headers)
+    assert response.status_code == 200
+
+    call_sites = client.get("/api/metrics/llm").json()["call_sites"]
+    assert call_sites["intent"]["outcomes"]["ok"] == 1
+    assert call_sites["counsellor"]["calls"] == 1
+    assert call_sites["counsellor"]["duration_ms"]["count"] == 1
+    summary = [r.getMessage() for r in caplog.records if r.getMessage().startswith("POST /api/chat:")]
+    assert len(summary) == 1
+    assert "2 LLM calls" in summary[0]
+    assert "counsellor ok" in summary[0]
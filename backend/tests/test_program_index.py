@@ -0,0 +1,84 @@
+"""
+Program index tests - same output as the scan, built once per catalog version.
+"""
+import itertools
+from types import MappingProxyType
+
+import pytest
+
+from catalog import catalog
+from models import Program, ProgramCategory
+from real_universities_data import UNIVERSITIES_DATA
+from recommendation_engine import filter_programs, filter_programs_scan, program_indexes
+
+LEVELS = ["Masters", "MS", "M.Sc", "Master of Engineering", "Bachelors", "PhD", "MBA", None]
+DISCIPLINES = ["Computer Science", "Data Science", "Physics", "Business Analytics", "Public Health", None]
+
+
+def frozen_catalog():
+    """Seed universities with varied programs, frozen like catalog snapshot records."""
+    universities = []
+    for i, base in enumerate(UNIVERSITIES_DATA[:20]):
+        programs = []
+        for j in range(4):
+            n = i * 4 + j
+            discipline = DISCIPLINES[n % len(DISCIPLINES)]
+            program = {**base["programs"][0], "name": f"{LEVELS[n % 3]} {discipline or 'Analytics'}"}
+            program.update(degree_level=LEVELS[n % len(LEVELS)], program_discipline=discipline,
+                           tuition_per_year_usd=8000 + (n * 3571) % 50000)
+            if n % 11 == 0:
+                del program["tuition_per_year_usd"]
+            programs.append(MappingProxyType(program))
+        universities.append(MappingProxyType({**base, "programs": tuple(programs)}))
+    return universities
+
+
+INTENTS = [
+    {"intent": intent, "target_discipline": discipline, "target_degree": degree,
+     "max_budget_usd": budget, "target_countries": countries}
+    for intent, discipline, degree, budget, countries in itertools.product(
+        ["PROGRAM_SPECIFIC_QUERY", "UNIVERSITY_DISCOVERY"],
+        [None, "Computer Science", "science", "c", " Data ", "MS Physics", "zoology", "-"],
+        [None, "Masters", "MS", "PhD"],
+        [None, 0, 20000, 42000.5],
+        [[], ["USA"], ["germany", " UK ", "Canada"]],
+    )
+]
+
+
+@pytest.mark.parametrize("profile", [{}, {"field_of_study": "Computer Science"}, {"field_of_study": "Data"}])
+def test_index_matches_scan(profile):
+    universities = frozen_catalog()
+
+    for intent in INTENTS:
+        assert filter_programs(universities, intent, profile) == filter_programs_scan(universities, intent, profile), intent
+    assert program_indexes.get(universities) is not None  # answered from the index, not the scan fallback
+
+
+def test_plain_dicts_are_scanned():
+    universities = [dict(uni, programs=[dict(p) for p in uni["programs"]]) for uni in frozen_catalog()]
+    intent = {"intent": "PROGRAM_SPECIFIC_QUERY", "target_discipline": "science", "max_budget_usd": 30000}
+    builds = program_indexes.builds
+
+    assert filter_programs(universities, intent, {}) == filter_programs_scan(universities, intent, {})
+    assert program_indexes.builds == builds
+
+
+def test_index_built_once_per_catalog_version(db_session, test_universities):
+    intent = {"intent": "PROGRAM_SPECIFIC_QUERY", "target_discipline": "Computer Science"}
+    builds = program_indexes.builds
+
+    for _ in range(3):
+        assert filter_programs(list(catalog.get(db_session).universities), intent, {}) == []
+    assert program_indexes.builds == builds + 1
+
+    db_session.add(Program(
+        university_id=test_universities[0].id, name="MS Computer Science", degree_level="Master's",
+        program_category=ProgramCategory.STEM, program_discipline="Computer Science", tuition_per_year_usd=55000
+    ))
+    db_session.commit()
+    catalog.invalidate()
+
+    matched = filter_programs(list(catalog.get(db_session).universities), intent, {})
+    assert [p["name"] for uni in matched for p in uni["programs"]] == ["MS Computer Science"]
+    assert program_indexes.builds == builds + 2
@@ -0,0 +1,66 @@
+"""
+Program store tests - columnar catalog programs read back exactly as the rows they came from.
+"""
+import numpy as np
+import pytest
+
+from catalog import catalog
+from models import Program, ProgramCategory
+from program_store import PROGRAM_COLUMNS
+from recommendation_engine import filter_programs, filter_programs_scan
+
+
+@pytest.fixture
+def programs(db_session, test_universities):
+    mit, michigan, _ = test_universities
+    rows = [
+        Program(university_id=mit.id, name="MS Computer Science", degree_level="Masters", program_category=ProgramCategory.STEM,
+                program_discipline="Computer Science", tuition_per_year_usd=58000, min_gpa=3.5, ielts_min=7.0, toefl_min=100,
+                gre_required=True, intake_terms=["Fall"], specializations=["AI/ML", "Systems"]),
+        Program(university_id=mit.id, name="MBA", degree_level="MBA", program_category=ProgramCategory.BUSINESS,
+                program_discipline="Management", tuition_per_year_usd=80000, gmat_required=True, requires_work_experience=True,
+                min_work_experience_years=3, intake_terms=["Fall"]),
+        Program(university_id=michigan.id, name="MS Data Science", degree_level="MS", program_category=ProgramCategory.STEM,
+                program_discipline="Data Science", tuition_per_year_usd=28000, min_gpa=3, intake_terms=["Fall", "Spring"]),
+    ]
+    db_session.add_all(rows)
+    db_session.commit()
+    return rows
+
+
+def test_rows_read_back_like_the_orm(db_session, programs):
+    snapshot = catalog.get(db_session)
+    rows = [p for uni in snapshot.universities for p in uni["programs"]]
+
+    assert [dict(row) for row in rows] == [{key: getattr(p, key) for key in PROGRAM_COLUMNS} for p in programs]
+    assert rows[0]["tuition_per_year_usd"].__class__ is int and rows[1]["min_gpa"] is None
+    assert repr(rows[2]["min_gpa"]) == repr(programs[2].min_gpa)  # rendered in prompts as stored
+    assert rows[0].get("not_a_column", "default") == "default"
+
+
+def test_store_is_columnar_and_read_only(db_session, programs):
+    snapshot = catalog.get(db_session)
+    store = snapshot.programs
+    mit = snapshot.find("MIT")
+
+    assert isinstance(store.columns["tuition_per_year_usd"].values, np.ndarray)
+    assert store.columns["program_discipline"].vocabulary == ["Computer Science", "Management", "Data Science"]
+    assert [(row["name"], row["university_id"]) for row in mit["programs"]] == [("MS Computer Science", mit["id"]), ("MBA", mit["id"])]
+    with pytest.raises(TypeError):
+        mit["programs"][0]["name"] = "Changed"
+    terms = mit["programs"][0]["intake_terms"]
+    terms.append("Spring")
+    assert mit["programs"][1]["intake_terms"] == ["Fall"] and mit["programs"][0]["intake_terms"] == ["Fall"]
+
+
+def test_filtering_reads_the_store(db_session, programs):
+    universities = list(catalog.get(db_session).universities)
+    frozen = [dict(uni, programs=[dict(p) for p in uni["programs"]]) for uni in universities]
+
+    for intent in (
+        {"intent": "PROGRAM_SPECIFIC_QUERY", "target_discipline": "science", "target_degree": "MS", "max_budget_usd": 60000},
+        {"intent": "UNIVERSITY_DISCOVERY", "target_countries": ["usa"]},
+    ):
+        indexed = filter_programs(universities, intent, {})
+        assert indexed == filter_programs_scan(universities, intent, {}) == filter_programs_scan(frozen, intent, {})
+        assert indexed
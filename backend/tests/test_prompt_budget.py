@@ -0,0 +1,85 @@
+"""
+Prompt budget tests - counsellor prompts stay under the token ceiling.
+"""
+import asyncio
+
+import prompt_budget
+from ai_counsellor import build_budgeted_context, build_counsellor_prompt
+from metrics import metrics
+from prompt_budget import PromptBudget, estimate_tokens
+
+USER = {"full_name": "Test User", "current_stage": "DISCOVERY", "onboarding_completed": True}
+PROFILE = {"gpa": 3.5, "budget_per_year": 50000, "field_of_study": "Computer Science"}
+TASKS = [{"title": f"Task {i}", "status": "PENDING"} for i in range(5)]
+INTENT = {"intent": "UNIVERSITY_DISCOVERY", "target_countries": []}
+
+
+def make_catalog(size):
+    return [
+        {
+            "id": i + 1, "name": f"University {i + 1}", "country": "USA", "city": "Somewhere",
+            "qs_ranking": i + 1, "is_public": i % 2 == 0, "min_gpa": 3.0, "tuition_per_year": 30000,
+            "acceptance_rate": 0.3,
+            "programs": [
+                {"id": (i + 1) * 10 + j, "name": f"MS Computer Science Track {j}", "degree_level": "Masters",
+                 "program_discipline": "Computer Science", "tuition_per_year_usd": 30000, "min_gpa": 3.0}
+                for j in range(3)
+            ],
+        }
+        for i in range(size)
+    ]
+
+
+def prompt_tokens(catalog_size):
+    prompt = asyncio.run(build_counsellor_prompt(
+        "Suggest universities", USER, PROFILE, make_catalog(catalog_size), [], TASKS, [], INTENT
+    ))
+    return estimate_tokens(prompt.system_instruction) + estimate_tokens(prompt.contents)
+
+
+def test_larger_catalog_stays_under_budget(monkeypatch):
+    monkeypatch.setattr(prompt_budget, "PROMPT_TOKEN_BUDGET", 6000)
+
+    small = prompt_tokens(20)
+    large = prompt_tokens(1000)
+
+    assert small < 6000
+    assert large <= 6000
+    assert metrics.snapshot()["histograms"]["counsellor.prompt_tokens"]["max"] <= 6000
+
+
+def test_untrimmed_when_within_budget():
+    catalog = make_catalog(5)
+    budget = PromptBudget(100000)
+
+    context = build_budgeted_context(USER, PROFILE, catalog, [], TASKS, budget)
+
+    assert budget.trimmed == []
+    assert all(f"University {i + 1}:" in context for i in range(5))
+    assert context.count("MS Computer Science Track") == 15
+
+
+def test_catalog_tail_is_trimmed_before_tasks():
+    catalog = make_catalog(100)
+    full_tokens = estimate_tokens(build_budgeted_context(USER, PROFILE, catalog, [], TASKS, PromptBudget(100000)))
+    budget = PromptBudget(full_tokens // 2)
+
+    context = build_budgeted_context(USER, PROFILE, catalog, [], TASKS, budget)
+
+    assert [t["step"] for t in budget.trimmed] == ["catalog_tail"]
+    assert "Task 0" in context
+    assert "University 1:" in context
+    assert "University 100:" not in context
+    assert estimate_tokens(context) <= budget.ceiling
+
+
+def test_trim_order_under_tight_budget():
+    catalog = make_catalog(100)
+    budget = PromptBudget(500)
+
+    context = build_budgeted_context(USER, PROFILE, catalog, [], TASKS, budget)
+
+    steps = [t["step"] for t in budget.trimmed]
+    assert steps[:3] == ["catalog_tail", "older_tasks", "program_detail"]
+    assert "MS Computer Science Track" not in context
+    assert budget.total <= budget.ceiling
@@ -0,0 +1,138 @@
+"""
+Prompt layout tests - stable system instruction and cached-content reuse.
+"""
+from ai_counsellor import PREFIX_BUDGET_SHARE, render_stable_prefix, render_university_fits
+from catalog import catalog
+from metrics import metrics
+from models import University, UserProfile
+from prompt_budget import PromptBudget, estimate_tokens
+from prompt_cache import prefix_cache
+from real_universities_data import UNIVERSITIES_DATA
+
+# Classified locally, so every model call below is a counsellor call
+MESSAGES = ["Suggest universities", "Compare MIT and State University", "What do I do now?"]
+
+
+def counsellor_configs(fake_llm):
+    return [call["config"] for call in fake_llm.calls if call["config"] is not None]
+
+
+def chat(client, auth_headers, message):
+    response = client.post("/api/chat", json={"content": message}, headers=auth_headers)
+    assert response.status_code == 200
+    return response
+
+
+def test_prefix_is_byte_identical_across_turns(client, auth_headers, test_profile, test_universities, fake_llm, db_session):
+    chat(client, auth_headers, MESSAGES[0])
+    # A profile change only affects the per-turn suffix
+    db_session.query(UserProfile).filter(UserProfile.id == test_profile.id).update({"gpa": 2.9})
+    db_session.commit()
+    chat(client, auth_headers, MESSAGES[1])
+    chat(client, auth_headers, MESSAGES[2])
+
+    configs = counsellor_configs(fake_llm)
+    assert len(configs) == 3
+    prefixes = {config.system_instruction for config in configs}
+    assert len(prefixes) == 1
+    prefix = prefixes.pop()
+    assert "University Catalog Reference" in prefix and "MIT" in prefix
+    assert "Test User" not in prefix
+
+    contents = [call["contents"] for call in fake_llm.calls]
+    assert len(set(contents)) == 3
+    assert all("RNG Seed" not in c and "Session ID" not in c for c in contents)
+    assert all(c.count("MIT") < prefix.count("MIT") + 2 for c in contents)
+
+
+def test_cached_content_handle_is_reused(client, auth_headers, test_profile, test_universities, fake_llm, monkeypatch):
+    monkeypatch.setattr(prefix_cache, "min_tokens", 0)
+    creates = metrics.get_counter("llm.prompt_cache.calls")
+
+    for message in MESSAGES:
+        chat(client, auth_headers, message)
+
+    created = fake_llm.client.caches.created
+    assert len(created) == 1
+    configs = counsellor_configs(fake_llm)
+    assert all(config.cached_content == created[0]["name"] for config in configs)
+    assert all(config.system_instruction is None for config in configs)
+    assert prefix_cache.stats()["reused"] == 2
+    # Creation is an LLM call like any other: limited, tracked and recorded
+    assert metrics.get_counter("llm.prompt_cache.calls") - creates == 1
+
+
+def test_catalog_change_refreshes_handle(client, auth_headers, test_profile, test_universities, fake_llm, monkeypatch, db_session):
+    monkeypatch.setattr(prefix_cache, "min_tokens", 0)
+    chat(client, auth_headers, MESSAGES[0])
+
+    db_session.query(University).filter(University.name == "MIT").update({"data_source": "QS 2025"})
+    db_session.commit()
+    catalog.invalidate()
+    chat(client, auth_headers, MESSAGES[0])
+
+    created = fake_llm.client.caches.created
+    assert len(created) == 2
+    assert created[0]["config"].system_instruction != created[1]["config"].system_instruction
+    assert counsellor_configs(fake_llm)[-1].cached_content == created[1]["name"]
+
+
+def test_falls_back_inline_when_caching_fails(client, auth_headers, test_profile, test_universities, fake_llm, monkeypatch):
+    monkeypatch.setattr(prefix_cache, "min_tokens", 0)
+    fake_llm.client.caches.fail = True
+    failed_creates = metrics.get_counter("llm.prompt_cache.outcome.error")
+
+    chat(client, auth_headers, MESSAGES[0])
+    chat(client, auth_headers, MESSAGES[1])
+
+    configs = counsellor_configs(fake_llm)
+    assert all(config.cached_content is None and config.system_instruction for config in configs)
+    # The failed create is not retried on every turn
+    assert prefix_cache.stats()["failures"] == 1
+    assert metrics.get_counter("llm.prompt_cache.outcome.error") - failed_creates == 1
+
+
+def test_rejected_handle_is_retried_inline(client, auth_headers, test_profile, test_universities, fake_llm, monkeypatch):
+    monkeypatch.setattr(prefix_cache, "min_tokens", 0)
+    original = fake_llm.generate_content
+
+    async def reject_cached(model, contents, config=None):
+        if config is not None and config.cached_content:
+            raise RuntimeError("404 NOT_FOUND: CachedContent not found")
+        return await original(model, contents, config)
+
+    monkeypatch.setattr(fake_llm, "generate_content", reject_cached)
+
+    response = chat(client, auth_headers, MESSAGES[0])
+
+    assert response.json()["content"] == fake_llm.payload["message"]
+    assert prefix_cache.stats()["handles"] == 0
+
+
+def test_seeded_catalog_prefix_is_cacheable():
+    universities = [
+        dict(uni, id=i + 1, programs=[dict(p, id=(i + 1) * 100 + j) for j, p in enumerate(uni.get("programs", []))])
+        for i, uni in enumerate(UNIVERSITIES_DATA)
+    ]
+
+    prefix = render_stable_prefix(universities, int(PromptBudget().ceiling * PREFIX_BUDGET_SHARE))
+
+    assert estimate_tokens(prefix.text) >= prefix_cache.min_tokens
+
+
+def test_matches_cut_from_the_prefix_carry_their_facts():
+    universities = [
+        {"id": i + 1, "name": f"University {i + 1}", "country": "USA", "min_gpa": 3.0, "tuition_per_year": 30000,
+         "programs": [{"id": (i + 1) * 10, "name": "MS Computer Science", "degree_level": "Masters",
+                       "tuition_per_year_usd": 30000, "min_gpa": 3.0}]}
+        for i in range(40)
+    ]
+    prefix = render_stable_prefix(universities, 1500)
+    assert 0 < len(prefix.university_ids) < 40
+
+    fits = render_university_fits(universities, {"gpa": 3.5}, prefix.university_ids)
+
+    for uni, fit in zip(universities, fits):
+        assert fit.startswith(f"- [ID: {uni['id']}] {uni['name']}")
+        assert ("$30,000/yr" in fit) == (uni["id"] not in prefix.university_ids)
+        assert "Category: " in fit
@@ -0,0 +1,99 @@
+"""
+Request coalescing tests - identical concurrent LLM calls share one request.
+"""
+import asyncio
+
+import pytest
+
+from ai_counsellor import analyze_sop, checklist_flight, generate_application_checklist
+from llm_client import SingleFlight
+from metrics import metrics
+
+CHECKLIST = [{"title": "APS Certificate", "description": "Apply early"}]
+
+
+def test_concurrent_identical_checklists_share_one_call(fake_llm):
+    fake_llm.delay = 0.1
+    fake_llm.payload = CHECKLIST
+    metrics.reset()
+    calls_before = checklist_flight.calls
+
+    async def lock_five_times():
+        return await asyncio.gather(*[
+            generate_application_checklist("TU Munich", "Germany", "Masters") for _ in range(5)
+        ])
+
+    results = asyncio.run(lock_five_times())
+
+    assert len(fake_llm.calls) == 1
+    assert all(result == CHECKLIST for result in results)
+    # Every caller gets its own copy
+    results[0].append({"title": "mutated"})
+    assert results[1] == CHECKLIST
+    assert checklist_flight.calls - calls_before == 1
+    assert metrics.get_counter("singleflight.checklist.coalesced") == 4
+
+
+def test_different_prompts_are_not_coalesced(fake_llm):
+    fake_llm.delay = 0.05
+    fake_llm.payload = CHECKLIST
+
+    async def two_universities():
+        return await asyncio.gather(
+            generate_application_checklist("TU Munich", "Germany"),
+            generate_application_checklist("University of Toronto", "Canada"),
+        )
+
+    asyncio.run(two_universities())
+    assert len(fake_llm.calls) == 2
+
+
+def test_sequential_calls_are_not_cached(fake_llm):
+    fake_llm.payload = {"overall_score": 70, "strengths": [], "weaknesses": []}
+
+    async def review_twice():
+        await analyze_sop("My SOP text")
+        await analyze_sop("My SOP text")
+
+    asyncio.run(review_twice())
+    assert len(fake_llm.calls) == 2
+
+
+def test_errors_fan_out_to_all_waiters():
+    flight = SingleFlight("test")
+    attempts = []
+
+    async def failing_call():
+        attempts.append(1)
+        await asyncio.sleep(0.05)
+        raise RuntimeError("boom")
+
+    async def run():
+        return await asyncio.gather(
+            *[flight.do("key", failing_call) for _ in range(3)], return_exceptions=True
+        )
+
+    results = asyncio.run(run())
+    assert len(attempts) == 1
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert flight.stats() == {"calls": 1, "coalesced": 2, "in_flight": 0}
+
+
+def test_cancelled_leader_does_not_cancel_followers():
+    flight = SingleFlight("test")
+
+    async def slow_call():
+        await asyncio.sleep(0.05)
+        return {"ok": True}
+
+    async def run():
+        leader = asyncio.ensure_future(flight.do("key", slow_call))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do("key", slow_call))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(run()) == {"ok": True}
@@ -0,0 +1,54 @@
+"""
+Pre-generate application checklists for every university in UNIVERSITIES_DATA.
+
+Locking a university then reads its checklist from the database instead of
+waiting on the LLM. Universities must already be seeded (the API seeds them
+on startup). Rows that are still fresh are skipped unless --force is given.
+
+Usage: python warm_checklists.py [--concurrency 4] [--degree-level "Master's"] [--force]
+"""
+import os
+import sys
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database import Base, SessionLocal, engine  # noqa: E402
+from checklist_store import DEFAULT_DEGREE_LEVEL, DEFAULT_WARM_CONCURRENCY, warm_checklists  # noqa: E402
+from gemini_key_manager import key_manager  # noqa: E402
+from real_universities_data import UNIVERSITIES_DATA  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_WARM_CONCURRENCY,
+                        help="maximum simultaneous LLM calls")
+    parser.add_argument("--degree-level", default=DEFAULT_DEGREE_LEVEL)
+    parser.add_argument("--force", action="store_true", help="regenerate fresh checklists too")
+    args = parser.parse_args()
+
+    if not key_manager.has_keys():
+        print("No Gemini API keys configured; nothing to generate.")
+        sys.exit(1)
+
+    Base.metadata.create_all(bind=engine)
+    names = [uni["name"] for uni in UNIVERSITIES_DATA]
+    print(f"Warming checklists for {len(names)} universities (concurrency={args.concurrency})")
+
+    summary = asyncio.run(warm_checklists(
+        SessionLocal,
+        names,
+        degree_level=args.degree_level,
+        concurrency=args.concurrency,
+        force=args.force
+    ))
+
+    print(f"Generated: {summary['generated']}  Skipped (fresh): {summary['skipped']}  Failed: {summary['failed']}")
+    if summary["missing"]:
+        print(f"Not seeded yet ({len(summary['missing'])}): {', '.join(summary['missing'])}")
+    sys.exit(1 if summary["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
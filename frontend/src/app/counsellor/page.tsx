@@ -1,6 +1,6 @@
 "use client";
 
-import { useEffect, useState, useRef } from "react";
+import { useEffect, useLayoutEffect, useState, useRef } from "react";
 import { useRouter } from "next/navigation";
 import Image from "next/image";
 import { Send, User, Loader2, CheckCircle, Building2, Mic, MicOff, ArrowRight, Trash2, MapPin, DollarSign, GraduationCap, Volume2, VolumeX, StopCircle, Menu } from "lucide-react";
@@ -76,6 +76,12 @@ export default function CounsellorPage() {
   const messagesEndRef = useRef<HTMLDivElement>(null);
   const scrollContainerRef = useRef<HTMLDivElement>(null);
   const [currentSessionId, setCurrentSessionId] = useState<number | null>(null);
+  // Cursor for the page before the oldest loaded message (null: nothing older)
+  const [olderCursor, setOlderCursor] = useState<number | null>(null);
+  const [loadingOlder, setLoadingOlder] = useState(false);
+  const sessionIdRef = useRef<number | null>(null);
+  // Scroll height before older messages were prepended, to keep the view in place
+  const prependScrollHeightRef = useRef<number | null>(null);
   const [userIsManuallyScrolling, setUserIsManuallyScrolling] = useState(false);
   const [isVoiceEnabled, setIsVoiceEnabled] = useState(false);
   const [isSpeaking, setIsSpeaking] = useState(false);
@@ -96,6 +102,11 @@ export default function CounsellorPage() {
 
       // Only update state if it actually changed to prevent render loops
       setUserIsManuallyScrolling(!isAtBottom);
+
+      // Near the top: fetch the previous page of the conversation
+      if (scrollTop < 80) {
+        loadOlderMessages();
+      }
     }
   };
 
@@ -108,12 +119,15 @@ export default function CounsellorPage() {
   // Auto-scroll effect: ONLY scroll if user was ALREADY at the bottom (not manually scrolling)
   // AND a new message just arrived (not on loading state change to prevent jumps during typing)
   const prevMessagesLengthRef = useRef(messages.length);
+  const prevLastMessageIdRef = useRef<number | undefined>(undefined);
   useEffect(() => {
-    // Only trigger scroll when messages count actually increases (new message arrived)
-    if (messages.length > prevMessagesLengthRef.current && !userIsManuallyScrolling) {
+    // Only trigger scroll when a new message arrived at the end (not when older ones were prepended)
+    const lastId = messages[messages.length - 1]?.id;
+    if (messages.length > prevMessagesLengthRef.current && lastId !== prevLastMessageIdRef.current && !userIsManuallyScrolling) {
       scrollToBottom("smooth");
     }
     prevMessagesLengthRef.current = messages.length;
+    prevLastMessageIdRef.current = lastId;
   }, [messages]);
 
   useEffect(() => {
@@ -138,6 +152,8 @@ export default function CounsellorPage() {
 
   // Fetch messages when session changes
   useEffect(() => {
+    sessionIdRef.current = currentSessionId;
+    setOlderCursor(null);
     if (currentSessionId) {
       fetchHistory(currentSessionId);
     } else {
@@ -145,6 +161,15 @@ export default function CounsellorPage() {
     }
   }, [currentSessionId]);
 
+  // After older messages are prepended, keep the messages that were on screen where they were
+  useLayoutEffect(() => {
+    const container = scrollContainerRef.current;
+    if (container && prependScrollHeightRef.current !== null) {
+      container.scrollTop += container.scrollHeight - prependScrollHeightRef.current;
+      prependScrollHeightRef.current = null;
+    }
+  }, [messages]);
+
   // Removed old simple effect that lacked manual check
   // useEffect(() => {
   //   scrollToBottom();
@@ -160,7 +185,9 @@ export default function CounsellorPage() {
     try {
       const response = await chatApi.getHistory(sessionId);
       console.log("Session data:", response.data);
-      setMessages(response.data);
+      if (sessionIdRef.current !== sessionId) return; // switched sessions meanwhile
+      setMessages(response.data.messages);
+      setOlderCursor(response.data.has_more ? response.data.next_cursor : null);
     } catch (error) {
       console.error("Failed to load chat history", error);
       toast.error("Could not load chat history");
@@ -169,6 +196,27 @@ export default function CounsellorPage() {
     }
   };
 
+  // History is paginated (latest page first); older pages load on scroll-up or via the button
+  const loadOlderMessages = async () => {
+    const sessionId = currentSessionId;
+    if (!sessionId || olderCursor === null || loadingOlder) return;
+    setLoadingOlder(true);
+    try {
+      const response = await chatApi.getHistory(sessionId, olderCursor);
+      if (sessionIdRef.current !== sessionId) return;
+      const loadedIds = new Set(messages.map((m) => m.id));
+      const older = response.data.messages.filter((m) => !loadedIds.has(m.id));
+      prependScrollHeightRef.current = scrollContainerRef.current?.scrollHeight ?? null;
+      setMessages((prev) => [...older, ...prev]);
+      setOlderCursor(response.data.has_more ? response.data.next_cursor : null);
+    } catch (error) {
+      console.error("Failed to load older messages", error);
+      toast.error("Could not load older messages");
+    } finally {
+      setLoadingOlder(false);
+    }
+  };
+
   const speakResponse = (text: string) => {
     if ('speechSynthesis' in window) {
       window.speechSynthesis.cancel();
@@ -414,6 +462,19 @@ export default function CounsellorPage() {
             onScroll={handleScroll}
           >
             <div className="max-w-4xl mx-auto w-full">
+              {olderCursor !== null && messages.length > 0 && (
+                <div className="flex justify-center mb-4">
+                  <button
+                    onClick={loadOlderMessages}
+                    disabled={loadingOlder}
+                    className="flex items-center gap-2 px-4 py-2 bg-gray-100 dark:bg-slate-800 text-gray-700 dark:text-slate-300 rounded-full text-xs font-medium hover:bg-gray-200 dark:hover:bg-slate-700 transition disabled:opacity-60"
+                  >
+                    {loadingOlder && <Loader2 className="w-3 h-3 animate-spin" />}
+                    {loadingOlder ? "Loading older messages..." : "Load older messages"}
+                  </button>
+                </div>
+              )}
+
               {messages.length === 0 && (
                 <div className="text-center py-10">
                   <div className="w-16 h-16 mx-auto mb-5 relative">
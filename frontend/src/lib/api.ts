@@ -171,8 +171,31 @@ export const universityApi = {
 export interface LockResponse {
   message: string;
   stage: string;
+  // null when the checklist was already stored and the tasks are in place
+  job_id: number | null;
 }
 
+export interface ChatHistoryPage {
+  messages: ChatMessage[];
+  next_cursor: number | null;
+  has_more: boolean;
+}
+
+export interface BackgroundJob {
+  id: number;
+  kind: string;
+  status: 'PENDING' | 'RUNNING' | 'COMPLETED' | 'FAILED';
+  attempts: number;
+  result?: Record<string, any>;
+  error?: string;
+  created_at: string;
+  completed_at?: string;
+}
+
+export const jobApi = {
+  get: (id: number) => api.get<BackgroundJob>(`/api/jobs/${id}`),
+};
+
 export interface UnlockResponse {
   message: string;
   stage: string;
@@ -212,7 +235,8 @@ export const sessionApi = {
 };
 
 export const chatApi = {
-  getHistory: (sessionId: number) => api.get<ChatMessage[]>(`/api/chat/history/${sessionId}`),
+  getHistory: (sessionId: number, before?: number) =>
+    api.get<ChatHistoryPage>(`/api/chat/history/${sessionId}`, { params: { before } }),
   send: (content: string, sessionId?: number) =>
     api.post<ChatMessage>('/api/chat', { content, session_id: sessionId }),
   sendVoice: (formData: FormData, language: string = 'en') =>